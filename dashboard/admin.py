@@ -1,14 +1,24 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Household, Appliance, ElectricityBill
+from django.core.exceptions import PermissionDenied
+from django.db.models import F, Max, Sum
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+from .admin_utils import CursorPaginationMixin, FullTextSearchMixin, HouseholdLookupFilter
+from .models import User, Household, Appliance, ElectricityBill, BillAnomaly, CohortBaseline, BillForecast, ConsumptionRating, TipJob, HouseholdTip, GeminiUsage
 
 # Register your models here.
 
 @admin.register(User)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(FullTextSearchMixin, UserAdmin):
     list_display = ('email', 'username', 'first_name', 'last_name', 'is_staff', 'is_active')
     list_filter = ('is_staff', 'is_superuser', 'is_active', 'groups')
     search_fields = ('email', 'username', 'first_name', 'last_name')
+    search_index_lookups = {'users': 'pk'}
     ordering = ('email',)
     
     fieldsets = UserAdmin.fieldsets + (
@@ -19,22 +29,144 @@ class CustomUserAdmin(UserAdmin):
     )
 
 @admin.register(Household)
-class HouseholdAdmin(admin.ModelAdmin):
+class HouseholdAdmin(FullTextSearchMixin, CursorPaginationMixin, admin.ModelAdmin):
     list_display = ('user', 'members', 'rooms', 'created_at')
     list_filter = ('members', 'rooms', 'created_at')
     search_fields = ('user__email', 'user__username')
-    ordering = ('-created_at',)
+    search_index_lookups = {'users': 'user_id'}
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    ordering = ('-id',)  # Same order as -created_at, but served by the primary key
 
 @admin.register(Appliance)
-class ApplianceAdmin(admin.ModelAdmin):
+class ApplianceAdmin(FullTextSearchMixin, CursorPaginationMixin, admin.ModelAdmin):
     list_display = ('appliance_type', 'custom_name', 'household', 'wattage', 'hours_used')
-    list_filter = ('appliance_type', 'household')
+    list_filter = ('appliance_type', HouseholdLookupFilter)
     search_fields = ('custom_name', 'household__user__email')
-    ordering = ('appliance_type',)
+    search_index_lookups = {'appliances': 'pk'}
+    list_select_related = ('household__user',)
+    autocomplete_fields = ('household',)
+    ordering = ('appliance_type', 'id')  # Matches the appliance_type_id index
 
 @admin.register(ElectricityBill)
-class ElectricityBillAdmin(admin.ModelAdmin):
+class ElectricityBillAdmin(FullTextSearchMixin, CursorPaginationMixin, admin.ModelAdmin):
     list_display = ('household', 'amount', 'month', 'units_consumed')
-    list_filter = ('month', 'household')
+    list_filter = ('month', HouseholdLookupFilter)
+    search_fields = ('household__user__email',)
+    search_index_lookups = {'users': 'household__user_id'}
+    list_select_related = ('household__user',)
+    autocomplete_fields = ('household',)
+    ordering = ('-month', '-id')  # Matches the bill_month_id index
+
+@admin.register(BillAnomaly)
+class BillAnomalyAdmin(admin.ModelAdmin):
+    list_display = ('bill', 'flags', 'history_score', 'cohort_score', 'gap_score', 'scored_at')
+    list_filter = ('scored_at',)
+    search_fields = ('flags', 'bill__household__user__email')
+    list_select_related = ('bill__household__user',)
+    raw_id_fields = ('bill',)
+    ordering = ('-scored_at',)
+
+@admin.register(CohortBaseline)
+class CohortBaselineAdmin(admin.ModelAdmin):
+    list_display = ('members', 'rooms', 'median_kwh', 'mad_kwh', 'bills', 'updated_at')
+    ordering = ('members', 'rooms')
+
+@admin.register(BillForecast)
+class BillForecastAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    list_display = ('household', 'month', 'kwh', 'kwh_lower', 'kwh_upper', 'amount', 'method', 'fitted_at')
+    list_filter = ('method', 'month')
     search_fields = ('household__user__email',)
-    ordering = ('-month',)
+    search_index_lookups = {'users': 'household__user_id'}
+    list_select_related = ('household__user',)
+    raw_id_fields = ('household',)
+
+@admin.register(ConsumptionRating)
+class ConsumptionRatingAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    list_display = ('household', 'total_kwh', 'per_person', 'rating', 'consumption_source', 'computed_at')
+    list_filter = ('rating', 'consumption_source')
+    search_fields = ('household__user__email',)
+    search_index_lookups = {'users': 'household__user_id'}
+    list_select_related = ('household__user',)
+    raw_id_fields = ('household',)
+
+@admin.register(TipJob)
+class TipJobAdmin(admin.ModelAdmin):
+    list_display = ('household', 'status', 'attempts', 'run_after', 'updated_at')
+    list_filter = ('status',)
+    search_fields = ('household__user__email', 'last_error')
+    list_select_related = ('household__user',)
+    raw_id_fields = ('household',)
+    ordering = ('-updated_at',)
+
+@admin.register(HouseholdTip)
+class HouseholdTipAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    list_display = ('household', 'generated_at')
+    search_fields = ('household__user__email',)
+    search_index_lookups = {'users': 'household__user_id'}
+    list_select_related = ('household__user',)
+    raw_id_fields = ('household',)
+
+@admin.register(GeminiUsage)
+class GeminiUsageAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    list_display = ('user', 'day', 'requests', 'prompt_tokens', 'completion_tokens', 'cost')
+    list_filter = ('day',)
+    search_fields = ('user__email',)
+    search_index_lookups = {'users': 'user_id'}
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    ordering = ('-day', '-cost')
+    change_list_template = 'admin/gemini_usage_change_list.html'
+    report_days = (1, 7, 30, 90)
+    report_size = 50
+
+    # Rows are written by usage.flush only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('top-consumers/', self.admin_site.admin_view(self.top_consumers_view),
+                 name='dashboard_geminiusage_top_consumers'),
+        ] + super().get_urls()
+
+    def top_consumers_view(self, request):
+        """The users with the highest Gemini cost over the last ?days= days"""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        try:
+            days = int(request.GET.get('days', 7))
+        except ValueError:
+            days = 7
+        if days not in self.report_days:
+            days = 7
+        since = timezone.localdate() - timedelta(days=days - 1)
+        usage = GeminiUsage.objects.filter(day__gte=since)
+
+        totals = usage.aggregate(requests=Sum('requests'), prompt_tokens=Sum('prompt_tokens'),
+                                 completion_tokens=Sum('completion_tokens'), cost=Sum('cost'))
+        rows = list(
+            usage.values('user_id', 'user__email')
+            .annotate(total_requests=Sum('requests'), total_prompt_tokens=Sum('prompt_tokens'),
+                      total_completion_tokens=Sum('completion_tokens'), total_cost=Sum('cost'),
+                      peak_tokens=Max(F('prompt_tokens') + F('completion_tokens')))
+            .order_by('-total_cost', '-total_requests')[:self.report_size]
+        )
+        for row in rows:
+            row['share'] = 100 * row['total_cost'] / totals['cost'] if totals['cost'] else 0
+
+        return TemplateResponse(request, 'admin/gemini_usage_report.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': f'Top Gemini consumers, last {days} day{"s" if days > 1 else ""}',
+            'days': days,
+            'day_choices': self.report_days,
+            'since': since,
+            'totals': totals,
+            'rows': rows,
+            'quota': getattr(settings, 'GEMINI_DAILY_TOKEN_QUOTA', 0),
+            'flush_seconds': getattr(settings, 'USAGE_FLUSH_SECONDS', 30),
+        })
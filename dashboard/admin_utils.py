@@ -0,0 +1,206 @@
+"""
+Admin changelists for very large tables.
+
+- HouseholdLookupFilter: filter by household id or owner email from a text box
+  instead of rendering every household in the sidebar
+- CursorPaginationMixin: "next page" links carry the sort key of the last row
+  (keyset pagination), so every page is an index seek rather than an OFFSET
+  scan; the total is a cached table estimate instead of COUNT(*)
+- FullTextSearchMixin: answers the search box from the FTS5 index in
+  search.py instead of LIKE '%term%' scans across joins
+"""
+import hashlib
+
+from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections, router
+from django.utils.functional import cached_property
+
+from . import search
+from .pagination import decode_cursor, encode_cursor, keyset_after
+
+CURSOR_VAR = 'cursor'
+COUNT_LIMIT = 10000      # Filtered changelists count at most this many rows
+COUNT_CACHE_TTL = 300    # Seconds a count or estimate is reused
+
+
+def estimated_count(model):
+    """
+    Approximate row count of a model's table without scanning it: planner
+    statistics where the database keeps them, else an exact count that is
+    cached for COUNT_CACHE_TTL seconds.
+    """
+    table = model._meta.db_table
+    key = f'admin-estimated-count:{table}'
+    count = cache.get(key)
+    if count is not None:
+        return count
+
+    alias = router.db_for_read(model)
+    connection = connections[alias]
+    count = None
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            # Filled in by ANALYZE (run by `PRAGMA optimize`); the first number is the row count
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone():
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+                row = cursor.fetchone()
+                count = int(row[0].split()[0]) if row else None
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            row = cursor.fetchone()
+            count = row[0] if row and row[0] >= 0 else None
+    if count is None:
+        count = model._default_manager.using(alias).count()
+    cache.set(key, count, COUNT_CACHE_TTL)
+    return count
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator whose count is cached per query for COUNT_CACHE_TTL seconds"""
+
+    @cached_property
+    def count(self):
+        # A stable digest, not hash(): str hashes differ per process, and the cache may be shared
+        digest = hashlib.blake2b(str(self.object_list.query).encode(), digest_size=16).hexdigest()
+        key = f'admin-count:{digest}'
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, COUNT_CACHE_TTL)
+        return count
+
+
+class HouseholdLookupFilter(admin.SimpleListFilter):
+    """Household filter typed in by id or owner email; renders no list of choices"""
+    title = 'household (id or email)'
+    parameter_name = 'household'
+    template = 'admin/lookup_filter.html'
+    field_path = 'household'  # Override for models that reach the household through a relation
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        value = (self.value() or '').strip()
+        if not value:
+            return queryset
+        if value.isdigit():
+            return queryset.filter(**{f'{self.field_path}_id': int(value)})
+        return queryset.filter(**{f'{self.field_path}__user__email__iexact': value})
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'display': 'All',
+            'value': self.value() or '',
+            'hidden': [(k, v) for k, v in changelist.params.items() if k != self.parameter_name],
+        }
+
+
+class CursorChangeList(ChangeList):
+    """ChangeList paginated by keyset when the ordering allows it, offset pages otherwise"""
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR)
+        if self.cursor is not None:
+            # Keep the cursor out of the filters and of every link built from the query string
+            request.GET = request.GET.copy()
+            del request.GET[CURSOR_VAR]
+        super().__init__(request, *args, **kwargs)
+
+    def keyset_fields(self):
+        """[(field, descending)] of the queryset ordering, or None when keyset paging cannot be used"""
+        fields = []
+        for item in self.queryset.query.order_by:
+            if not isinstance(item, str):
+                return None
+            descending = item.startswith('-')
+            name = item.lstrip('-')
+            field = self.lookup_opts.pk if name == 'pk' else None
+            if field is None:
+                try:
+                    field = self.lookup_opts.get_field(name)
+                except Exception:
+                    return None
+            if field.is_relation or field.null or not field.concrete:
+                return None
+            if all(field != seen for seen, _ in fields):  # Admin orderings can repeat a field
+                fields.append((field, descending))
+        if not fields or fields[-1][0] != self.lookup_opts.pk:
+            return None  # Needs the primary key last to be a total order
+        return fields
+
+    def get_results(self, request):
+        fields = self.keyset_fields()
+        if fields is None:
+            return super().get_results(request)
+
+        queryset = self.queryset
+        values = decode_cursor(self.cursor) if self.cursor else None
+        if values is not None and len(values) == len(fields):
+            ordering = [(field.attname, descending) for field, descending in fields]
+            queryset = queryset.filter(keyset_after(ordering, values))
+
+        # Find the page by its sort keys alone, then load those rows with their joins: with the
+        # joins in the first query SQLite may drive from the joined table and sort everything
+        keys = list(queryset.select_related(None).values_list(
+            *[field.attname for field, _ in fields])[:self.list_per_page + 1])
+        self.has_next = len(keys) > self.list_per_page
+        keys = keys[:self.list_per_page]
+        by_pk = {row.pk: row for row in queryset.filter(pk__in=[key[-1] for key in keys])}
+        rows = [by_pk[key[-1]] for key in keys if key[-1] in by_pk]
+        self.next_cursor = encode_cursor(list(keys[-1])) if self.has_next else None
+        self.is_first_page = values is None
+
+        # Unfiltered totals come from the table estimate; filtered ones are counted up to a limit
+        filtered = bool(self.has_active_filters or self.query)
+        if filtered:
+            count = self.queryset.order_by()[:COUNT_LIMIT + 1].count()
+            self.result_count_capped = count > COUNT_LIMIT
+            self.result_count = min(count, COUNT_LIMIT)
+        else:
+            self.result_count_capped = False
+            self.result_count = estimated_count(self.model)
+        self.full_result_count = estimated_count(self.model)
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.result_list = rows
+        self.can_show_all = False
+        self.multi_page = self.has_next or not self.is_first_page
+        self.paginator = None
+        self.first_page_query = self.get_query_string()
+        self.next_page_query = self.get_query_string({CURSOR_VAR: self.next_cursor}) if self.has_next else None
+
+
+class CursorPaginationMixin:
+    """ModelAdmin mixin for tables too large to count or page by offset"""
+    change_list_template = 'admin/cursor_change_list.html'
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return CursorChangeList
+
+
+class FullTextSearchMixin:
+    """
+    ModelAdmin mixin searching through the FTS5 index. `search_index_lookups`
+    maps an index name from search.py to the field holding its row ids; it
+    should cover everything in search_fields. Falls back to the LIKE search
+    for short terms or when the index is not installed.
+    """
+    search_index_lookups = {}
+
+    def get_search_results(self, request, queryset, search_term):
+        terms = search.usable_terms(search_term)
+        if not terms or not self.search_index_lookups or not search.is_installed(connections[queryset.db]):
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(search.search_filter(terms, self.search_index_lookups)), False
@@ -0,0 +1,152 @@
+"""
+Read-only JSON API for the mobile app: the signed-in user's appliances, bill
+history and consumption summary.
+
+- Lists are keyset-paginated: pass the response's `next_cursor` back as
+  ?cursor= for the next page (?limit=, at most MAX_LIMIT)
+- ?fields=a,b returns only those fields
+- Responses carry an ETag built from the household's data_version and the
+  query; a matching If-None-Match gets a 304 before anything is queried or
+  computed beyond the household row
+"""
+import functools
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+
+from .models import Appliance, ElectricityBill
+from .pagination import decode_cursor, encode_cursor, keyset_after
+from .routers import replica_reads
+from .utils import calculate_consumption
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 100
+COMPACT_JSON = {'separators': (',', ':')}
+
+APPLIANCE_FIELDS = ('id', 'appliance_type', 'custom_name', 'wattage', 'hours_used')
+BILL_FIELDS = ('id', 'month', 'amount', 'units_consumed')
+CONSUMPTION_FIELDS = (
+    'total_kwh', 'per_person', 'rating', 'color', 'appliance_data', 'appliance_based_kwh', 'bill_based_kwh',
+    'consumption_source', 'avg_consumption', 'low_threshold', 'high_threshold', 'usage_percentage',
+)
+
+
+class APIError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def api_view(view_func):
+    """
+    Signed-in GET endpoint of the user's household: passes the household to
+    the view, answers If-None-Match with 304 and turns APIError into a JSON
+    error response.
+    """
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return JsonResponse({'error': 'Method not allowed.'}, status=405)
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required.'}, status=401)
+        household = request.household
+        if not household:
+            return JsonResponse({'error': 'Please enter your household information first.'}, status=400)
+
+        # Different queries of the same data are different representations
+        query = '&'.join(sorted(f'{k}={v}' for k, v in request.GET.items()))
+        digest = hashlib.blake2b(f'{request.path}?{query}'.encode(), digest_size=8).hexdigest()
+        etag = quote_etag(f'{household.id}-{household.data_version.hex}-{digest}')
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            try:
+                response = JsonResponse(view_func(request, household, *args, **kwargs),
+                                        json_dumps_params=COMPACT_JSON)
+            except APIError as e:
+                return JsonResponse({'error': str(e)}, status=e.status)
+            response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)  # Cache, but revalidate every time
+        return response
+
+    return replica_reads(wrapper)
+
+
+def selected_fields(request, allowed):
+    """The ?fields= subset of `allowed`, in the order given, or all of them"""
+    requested = request.GET.get('fields')
+    if not requested:
+        return allowed
+    fields = tuple(dict.fromkeys(name.strip() for name in requested.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in allowed]
+    if unknown or not fields:
+        raise APIError(f"Unknown fields: {', '.join(unknown) or requested}. Available: {', '.join(allowed)}")
+    return fields
+
+
+def page_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise APIError('limit must be an integer')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def keyset_page(request, queryset, ordering, fields):
+    """
+    One page of `queryset` in `ordering` [(field, descending)], as dicts of
+    `fields`, and the cursor of the next page (None on the last one).
+    """
+    limit = page_limit(request)
+    if request.GET.get('cursor'):
+        values = decode_cursor(request.GET['cursor'])
+        if values is None or len(values) != len(ordering):
+            raise APIError('Invalid cursor')
+        try:
+            queryset = queryset.filter(keyset_after(ordering, values))
+        except (ValidationError, ValueError, TypeError):
+            raise APIError('Invalid cursor')  # Values of the wrong type for their fields
+
+    # Fetch plain tuples (no model instances); the sort keys ride along for the cursor
+    keys = [name for name, _ in ordering]
+    columns = list(fields) + [name for name in keys if name not in fields]
+    order_by = [f'-{name}' if descending else name for name, descending in ordering]
+    rows = list(queryset.order_by(*order_by).values_list(*columns)[:limit + 1])
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = dict(zip(columns, rows[-1]))
+        next_cursor = encode_cursor([last[name] for name in keys])
+    width = len(fields)
+    return [dict(zip(fields, row[:width])) for row in rows], next_cursor
+
+
+@api_view
+def appliances(request, household):
+    """The household's appliances in creation order"""
+    fields = selected_fields(request, APPLIANCE_FIELDS)
+    results, next_cursor = keyset_page(request, Appliance.objects.filter(household=household),
+                                       [('id', False)], fields)
+    return {'results': results, 'next_cursor': next_cursor}
+
+
+@api_view
+def bills(request, household):
+    """The household's bills, latest month first"""
+    fields = selected_fields(request, BILL_FIELDS)
+    results, next_cursor = keyset_page(request, ElectricityBill.objects.filter(household=household),
+                                       [('month', True), ('id', True)], fields)
+    return {'results': results, 'next_cursor': next_cursor}
+
+
+@api_view
+def consumption(request, household):
+    """calculate_consumption for the household's appliances and latest bill"""
+    fields = selected_fields(request, CONSUMPTION_FIELDS)
+    appliances = list(Appliance.objects.filter(household=household)
+                      .only('appliance_type', 'custom_name', 'wattage', 'hours_used'))
+    bill = ElectricityBill.objects.filter(household=household).order_by('-month').first()
+    data = calculate_consumption(household, appliances, bill)
+    return {name: data[name] for name in fields}
@@ -0,0 +1,94 @@
+"""
+Async versions of the results and tips pages, routed instead of the sync
+views in views.py when ASYNC_VIEWS is on (serve enersave.asgi under an ASGI
+server; under WSGI every async view costs an extra event loop hop).
+
+- Lookups that only need the household run concurrently with asyncio.gather
+  through the async ORM.
+- The CPU-bound part of the results page (views.results_context:
+  consumption, neighbours, load profile) runs on a worker thread, overlapping
+  the remaining lookups instead of holding up the request's database thread.
+- Templates render through sync_to_async: rendering may still touch lazy
+  objects such as request.user, which must not query on the event loop.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import redirect, render
+
+from .auth import aget_household
+from .forecasting import current_forecasts
+from .models import Appliance, BillAnomaly, ElectricityBill, HouseholdTip
+from .neighbours import get_index
+from .routers import replica_reads
+from .views import results_context
+
+arender = sync_to_async(render)
+
+
+@login_required
+@replica_reads
+async def results(request):
+    household = await aget_household(request)
+    if not household:
+        messages.warning(request, "Please enter your household information first.")
+        return redirect('household')
+
+    # Step 1: everything keyed on the household at once; get_index may (re)build from the database,
+    # so it runs here on the database thread rather than later on the worker thread
+    bill, appliances, forecast, tip, _ = await asyncio.gather(
+        ElectricityBill.objects.filter(household=household).order_by('-month').afirst(),
+        alist(Appliance.objects.filter(household=household)),
+        current_forecasts().filter(household=household).afirst(),
+        HouseholdTip.objects.filter(household=household).afirst(),
+        sync_to_async(get_index)(),
+    )
+    if not bill:
+        messages.warning(request, "Please enter your bill information first.")
+        return redirect('bill')
+    if not appliances:
+        messages.warning(request, "Please add some appliances to your household.")
+        return redirect('appliances')
+
+    # Step 2: compute on a worker thread while the bill's anomaly is fetched
+    computed, anomaly = await asyncio.gather(
+        sync_to_async(results_context, thread_sensitive=False)(household, appliances, bill),
+        BillAnomaly.objects.filter(bill=bill).afirst(),
+    )
+
+    return await arender(request, 'results.html', {
+        'household': household,
+        'bill': bill,
+        **computed,
+        'anomaly': anomaly,
+        'forecast': forecast,
+        'tip': tip,
+    })
+
+
+@login_required
+@replica_reads
+async def tips(request):
+    """The tips page with its chat, personalized when the user has entered household data"""
+    household = await aget_household(request)
+    appliances = []
+    tip = None
+
+    if household:
+        # Precomputed by the tip worker; None until the first job has run
+        appliances, tip = await asyncio.gather(
+            alist(Appliance.objects.filter(household=household)),
+            HouseholdTip.objects.filter(household=household).afirst(),
+        )
+
+    return await arender(request, 'tips.html', {
+        'household': household,
+        'appliances': appliances,
+        'tip': tip,
+    })
+
+
+async def alist(queryset):
+    return [obj async for obj in queryset]
@@ -0,0 +1,90 @@
+"""
+Cache-first request context.
+
+- CachedModelBackend: the signed-in user is read from the cache instead of
+  the user table on every request; saving or deleting a user drops the entry
+  (see signals.py). With the cached_db session engine a page view then
+  usually needs no query before the view runs. Both are only enabled with a
+  shared cache (SHARED_CACHE in settings), which every worker must see.
+- HouseholdMiddleware: `request.household` is the user's household, fetched
+  at most once per request and only when something uses it (None for
+  anonymous users and users without one; test it with `if household:`).
+  Async views use `await aget_household(request)`.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+from .models import Household
+
+
+def user_cache_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose get_user (run on every authenticated request) is served from the cache"""
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, getattr(settings, 'USER_CACHE_TIMEOUT', 300))
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = await cache.aget(key)
+        if user is None:
+            user = await super().aget_user(user_id)
+            if user is not None:
+                await cache.aset(key, user, getattr(settings, 'USER_CACHE_TIMEOUT', 300))
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+
+def get_household(request):
+    """The request user's household or None, memoized on the request"""
+    if not hasattr(request, '_cached_household'):
+        household = None
+        if request.user.is_authenticated:
+            household = Household.objects.filter(user=request.user).first()
+            if household:
+                household.user = request.user  # str(household) shows the owner's email
+        request._cached_household = household
+    return request._cached_household
+
+
+async def aget_household(request):
+    """get_household for async views, sharing its memo"""
+    if not hasattr(request, '_cached_household'):
+        user = await request.auser()
+        household = None
+        if user.is_authenticated:
+            household = await Household.objects.filter(user=user).afirst()
+            if household:
+                household.user = user
+        request._cached_household = household
+    return request._cached_household
+
+
+class HouseholdMiddleware:
+    """
+    Sets request.household lazily; must come after AuthenticationMiddleware.
+    Async views must not touch it (its first use queries): they await
+    aget_household(request) instead.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.household = SimpleLazyObject(lambda: get_household(request))
+        return self.get_response(request)
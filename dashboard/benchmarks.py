@@ -0,0 +1,180 @@
+"""
+Shared pieces of the benchmark and load-test commands.
+
+- generate_dataset: bulk-creates synthetic users, households, appliances and
+  bill histories with a seeded RNG, so every run sees the same data
+- latency_summary: mean and percentiles of a list of timings
+- compare_results: regressions of one JSON result file against another
+- MockGeminiServer: a local HTTP server answering like generateContent
+"""
+import datetime
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from .models import Appliance, ElectricityBill, Household, User
+from .tariffs import TARIFF_SLABS, get_tariff
+
+BENCH_EMAIL = 'bench{}@example.com'
+BENCH_PASSWORD = 'bench-password'
+
+# (low, high) wattage and (low, high) daily hours per appliance type, and how
+# likely a household is to own one
+APPLIANCE_PROFILES = {
+    'AC': ((1000, 2000), (2, 10), 0.4),
+    'WM': ((400, 800), (1, 2), 0.7),
+    'FR': ((100, 300), (24, 24), 0.95),
+    'WH': ((1500, 3000), (1, 2), 0.5),
+    'TV': ((60, 150), (2, 6), 0.9),
+    'MO': ((800, 1200), (1, 1), 0.4),
+    'CF': ((50, 80), (6, 14), 0.95),
+    'LT': ((20, 100), (4, 8), 1.0),
+    'PC': ((50, 200), (2, 8), 0.6),
+}
+
+
+def generate_dataset(households, months=12, seed=42, batch_size=5000, start_index=0, log=None):
+    """
+    Create `households` synthetic users with a household, appliances and
+    `months` monthly bills each, in batches of bulk inserts. Users get the
+    emails BENCH_EMAIL.format(i) and the password BENCH_PASSWORD.
+    Returns the number of (appliances, bills) created.
+    """
+    rng = np.random.default_rng(seed)
+    password = make_password(BENCH_PASSWORD)  # Hash once; hashing per user would dominate the run
+    tariff_codes = list(TARIFF_SLABS)
+    types = list(APPLIANCE_PROFILES)
+    first_month = datetime.date(2024, 1, 1)
+    bill_months = [datetime.date(first_month.year + (first_month.month - 1 + m) // 12,
+                                 (first_month.month - 1 + m) % 12 + 1, 1) for m in range(months)]
+    season = 1 + 0.25 * np.sin(2 * np.pi * (np.array([d.month for d in bill_months]) - 3) / 12)
+    totals = [0, 0]
+
+    for lo in range(start_index, start_index + households, batch_size):
+        hi = min(lo + batch_size, start_index + households)
+        n = hi - lo
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(email=BENCH_EMAIL.format(i), username=f'bench{i}', password=password) for i in range(lo, hi)
+            ])
+            members = rng.integers(1, 9, n)
+            rooms = rng.integers(1, 7, n)
+            tariffs = rng.choice(tariff_codes, n)
+            homes = Household.objects.bulk_create([
+                Household(user=user, members=int(members[j]), rooms=int(rooms[j]), tariff=str(tariffs[j]))
+                for j, user in enumerate(users)
+            ])
+
+            appliances = []
+            daily_kwh = np.zeros(n)
+            for code in types:
+                (w_lo, w_hi), (h_lo, h_hi), owned = APPLIANCE_PROFILES[code]
+                owners = np.flatnonzero(rng.random(n) < owned)
+                wattage = rng.integers(w_lo, w_hi + 1, len(owners))
+                hours = rng.integers(h_lo, h_hi + 1, len(owners))
+                daily_kwh[owners] += wattage * hours / 1000
+                appliances.extend(
+                    Appliance(household=homes[j], appliance_type=code, wattage=int(w), hours_used=int(h))
+                    for j, w, h in zip(owners.tolist(), wattage.tolist(), hours.tolist())
+                )
+            Appliance.objects.bulk_create(appliances, batch_size=1000)
+
+            # Bills follow the appliances with seasonality and noise; ~30% carry only the amount
+            kwh = daily_kwh[:, None] * 30 * 0.4 * season[None, :] * rng.lognormal(0, 0.15, (n, months))
+            amounts = np.empty_like(kwh)
+            for code in tariff_codes:
+                mask = tariffs == code
+                if mask.any():
+                    amounts[mask] = get_tariff(code).kwh_to_amount(kwh[mask].ravel()).reshape(-1, months)
+            has_units = rng.random((n, months)) > 0.3
+            bills = [
+                ElectricityBill(
+                    household=homes[j], month=bill_months[m], amount=round(float(amounts[j, m]), 2),
+                    units_consumed=round(float(kwh[j, m]), 2) if has_units[j, m] else None,
+                )
+                for j in range(n) for m in range(months)
+            ]
+            ElectricityBill.objects.bulk_create(bills, batch_size=1000)
+
+        totals[0] += len(appliances)
+        totals[1] += len(bills)
+        if log:
+            log(f"Generated {hi - start_index:,} of {households:,} households")
+    return tuple(totals)
+
+
+def latency_summary(seconds):
+    """Count, mean and p50/p95/p99/max in milliseconds of a list of timings in seconds"""
+    if not len(seconds):
+        return {'n': 0}
+    ms = np.asarray(seconds, dtype=np.float64) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        'n': len(ms),
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'max_ms': round(float(ms.max()), 3),
+    }
+
+
+def compare_results(baseline, current, tolerance=0.2):
+    """
+    Benchmarks whose p50 got slower than baseline by more than `tolerance`
+    (a fraction). Returns [(name, baseline p50, current p50, ratio)].
+    """
+    regressions = []
+    for name, result in current.get('benchmarks', {}).items():
+        before = baseline.get('benchmarks', {}).get(name, {}).get('p50_ms')
+        after = result.get('p50_ms')
+        if before and after and after > before * (1 + tolerance):
+            regressions.append((name, before, after, round(after / before, 2)))
+    return regressions
+
+
+class MockGeminiServer:
+    """
+    Local stand-in for the Gemini generateContent endpoint, with a fixed
+    answer and an optional delay. Use as a context manager; `url` is the
+    endpoint to point GeminiAPI.API_URL (or settings.GEMINI_API_URL) at.
+    """
+
+    def __init__(self, latency=0.0, answer="1. **Lighting**\n   • Switch to LED bulbs", port=0):
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                request = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                # Token counts roughly as Gemini reports them, about four characters per token
+                prompt_tokens, answer_tokens = len(request) // 4, len(answer) // 4 + 1
+                body = json.dumps({
+                    'candidates': [{'content': {'parts': [{'text': answer}]}}],
+                    'usageMetadata': {'promptTokenCount': prompt_tokens, 'candidatesTokenCount': answer_tokens,
+                                      'totalTokenCount': prompt_tokens + answer_tokens},
+                }).encode()
+                if latency:
+                    time.sleep(latency)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # Keep benchmark output clean
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_port}/v1/models/mock:generateContent'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
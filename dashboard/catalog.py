@@ -0,0 +1,142 @@
+"""
+In-memory appliance catalog with prefix search.
+
+The catalog CSV is loaded once per process into a sorted array of normalized
+search keys so autocomplete is a binary search plus a short scan. The file's
+modification time is re-checked periodically and the catalog is swapped in
+place when it changes, so edits take effect without a restart. A file that
+does not parse is logged and the last good catalog kept.
+"""
+import csv
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(__file__), 'data', 'appliance_catalog.csv')
+RELOAD_CHECK_INTERVAL = 2.0  # Seconds between modification-time checks
+
+
+def normalize(text):
+    """Lower-case and collapse whitespace so lookups ignore formatting"""
+    return ' '.join(str(text).lower().split())
+
+
+class ApplianceCatalog:
+    """Appliance models, typical wattages and star ratings indexed for prefix search"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._failed_mtime = None  # Of a file that did not parse, so it is not re-read every check
+        self._checked_at = 0.0
+        self._index = ([], [], [])  # (sorted keys, entry index per key, entries)
+        self.reload()
+
+    def reload(self):
+        """Rebuild the index from the CSV file and swap it in atomically; raises if it does not parse"""
+        mtime = os.path.getmtime(self.path)  # Before reading, so a write during the read is picked up later
+        entries = []
+        with open(self.path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                entries.append({
+                    'name': f"{row['brand']} {row['model']}",
+                    'brand': row['brand'],
+                    'model': row['model'],
+                    'appliance_type': row['appliance_type'],
+                    'wattage': int(row['wattage']),
+                    'star_rating': int(row['star_rating'] or 0),
+                })
+
+        # Every entry is reachable by "brand model" and by "model" alone
+        pairs = []
+        for i, entry in enumerate(entries):
+            pairs.append((normalize(entry['name']), i))
+            pairs.append((normalize(entry['model']), i))
+        pairs.sort()
+
+        self._index = ([key for key, _ in pairs], [i for _, i in pairs], entries)
+        self._mtime = mtime
+        self._checked_at = time.monotonic()
+
+    def reload_if_changed(self):
+        """Reload when the file changed; the stat call is throttled"""
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_CHECK_INTERVAL:
+            return False
+        with self._lock:
+            if now - self._checked_at < RELOAD_CHECK_INTERVAL:
+                return False
+            self._checked_at = now
+            mtime = None
+            try:
+                mtime = os.path.getmtime(self.path)
+                if mtime in (self._mtime, self._failed_mtime):
+                    return False
+                self.reload()
+            except (OSError, KeyError, TypeError, ValueError, csv.Error):
+                # Missing, half-written or malformed: keep serving the last good catalog
+                logger.exception("Reloading the appliance catalog failed", extra={'path': self.path})
+                self._failed_mtime = mtime
+                return False
+            return True
+
+    def __len__(self):
+        return len(self._index[2])
+
+    def search(self, query, limit=10):
+        """Entries whose name or model starts with the query, in alphabetical order"""
+        keys, positions, entries = self._index
+        prefix = normalize(query)
+        if not prefix:
+            return []
+
+        seen = set()
+        results = []
+        i = bisect_left(keys, prefix)
+        while i < len(keys) and keys[i].startswith(prefix) and len(results) < limit:
+            entry_idx = positions[i]
+            if entry_idx not in seen:
+                seen.add(entry_idx)
+                results.append(entries[entry_idx])
+            i += 1
+        return results
+
+    def lookup(self, name):
+        """Exact (normalized) match on "brand model" or model, else None"""
+        keys, positions, entries = self._index
+        key = normalize(name)
+        i = bisect_left(keys, key)
+        if key and i < len(keys) and keys[i] == key:
+            return entries[positions[i]]
+        return None
+
+    def best_match(self, name):
+        """Exact match if there is one, otherwise the first prefix match"""
+        entry = self.lookup(name)
+        if entry is None:
+            matches = self.search(name, limit=1)
+            entry = matches[0] if matches else None
+        return entry
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """Process-wide catalog, loaded on first use and hot-reloaded on change"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = ApplianceCatalog(getattr(settings, 'APPLIANCE_CATALOG_PATH', DEFAULT_CATALOG_PATH))
+    else:
+        _catalog.reload_if_changed()
+    return _catalog
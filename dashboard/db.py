@@ -0,0 +1,51 @@
+"""
+Serialized database writes.
+
+SQLite allows one writer at a time. Web threads in this process take a shared
+lock before writing, so they queue here instead of racing for the database
+lock, and a write that still hits "database is locked" (another process held
+it past busy_timeout) is retried a bounded number of times with backoff.
+"""
+import functools
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+
+logger = logging.getLogger(__name__)
+
+_write_lock = threading.RLock()  # Re-entrant: a serialized write may call another
+
+
+def is_locked_error(error):
+    return isinstance(error, OperationalError) and 'locked' in str(error).lower()
+
+
+def serialized_write(func, *args, using=None, **kwargs):
+    """
+    Run func(*args, **kwargs) in a transaction while holding the process-wide
+    write lock, retrying on "database is locked". Returns func's result.
+    """
+    retries = getattr(settings, 'DB_WRITE_RETRIES', 5)
+    delay = getattr(settings, 'DB_WRITE_RETRY_DELAY', 0.05)
+    for attempt in range(retries):
+        try:
+            with _write_lock, transaction.atomic(using=using):
+                return func(*args, **kwargs)
+        except OperationalError as e:
+            # Inside an outer transaction the whole transaction has to be retried by its owner
+            if not is_locked_error(e) or attempt == retries - 1 or transaction.get_connection(using).in_atomic_block:
+                raise
+            logger.warning("Database locked, retrying write", extra={'attempt': attempt + 1})
+            time.sleep(delay * 2 ** attempt * (0.5 + random.random()))
+
+
+def serialized(func):
+    """Decorator form of serialized_write"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return serialized_write(func, *args, **kwargs)
+    return wrapper
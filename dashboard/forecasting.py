@@ -0,0 +1,172 @@
+"""
+Next-month bill forecasting.
+
+Bills are pivoted into a dense (households x HISTORY_MONTHS) kWh matrix aligned
+on each household's latest bill, then every household is fitted at once:
+- seasonal naive: the same month last year
+- linear trend: least squares over the last TREND_MONTHS months (NaN-aware)
+The forecast blends the two when both exist, and the trend residuals give a
+95% interval. Results are stored in BillForecast for the results page to read.
+Households whose last bill is so old that the month after it is already over
+get no forecast, and forecasts for past months are dropped.
+"""
+import time
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import BillForecast, ElectricityBill
+from .tariffs import stored_tariff
+
+HISTORY_MONTHS = 12     # Enough for "same month last year" relative to the next month
+TREND_MONTHS = 6
+Z_95 = 1.96
+BATCH_SIZE = 10000
+
+
+def month_index(dates):
+    """Months since year 0 for an array of dates"""
+    months = np.asarray(dates, dtype='datetime64[M]').astype(np.int64)
+    return months + 1970 * 12  # datetime64[M] counts from 1970-01
+
+
+def current_month():
+    """First day of this month"""
+    return timezone.localdate().replace(day=1)
+
+
+def current_forecasts():
+    """BillForecast rows for this month or later, the only ones worth showing"""
+    return BillForecast.objects.filter(month__gte=current_month())
+
+
+def history_matrix(household_ids, months, kwh):
+    """
+    Pivot bills into (unique household ids, latest month per household, matrix).
+    Column HISTORY_MONTHS - 1 holds each household's latest month, earlier months
+    go to the left and missing months are NaN. Later rows win on duplicate months.
+    """
+    ids, rows = np.unique(household_ids, return_inverse=True)
+    latest = np.full(len(ids), np.iinfo(np.int64).min)
+    np.maximum.at(latest, rows, months)
+
+    columns = HISTORY_MONTHS - 1 - (latest[rows] - months)
+    keep = columns >= 0
+    matrix = np.full((len(ids), HISTORY_MONTHS), np.nan)
+    matrix[rows[keep], columns[keep]] = kwh[keep]
+    return ids, latest, matrix
+
+
+def fit(matrix):
+    """
+    Forecast the month after the last column for every row.
+    Returns (forecast, lower, upper, method codes) where method is
+    0 = last value, 1 = trend, 2 = seasonal + trend.
+    """
+    n_rows = len(matrix)
+    recent = matrix[:, -TREND_MONTHS:]
+    x = np.arange(TREND_MONTHS, dtype=np.float64)
+    observed = ~np.isnan(recent)
+    y = np.where(observed, recent, 0.0)
+
+    # Closed-form least squares per row using only the observed months
+    n = observed.sum(axis=1)
+    sx = (observed * x).sum(axis=1)
+    sy = y.sum(axis=1)
+    sxx = (observed * x * x).sum(axis=1)
+    sxy = (y * x).sum(axis=1)
+    denominator = n * sxx - sx * sx
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(denominator > 0, (n * sxy - sx * sy) / denominator, 0.0)
+        intercept = np.where(n > 0, (sy - slope * sx) / n, np.nan)
+    trend = intercept + slope * TREND_MONTHS
+
+    residuals = np.where(observed, recent - (intercept[:, None] + slope[:, None] * x), 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma = np.sqrt((residuals ** 2).sum(axis=1) / np.maximum(n - 2, 1))
+
+    # Last observed value per row, for households with a single bill
+    last_col = HISTORY_MONTHS - 1 - np.argmax(~np.isnan(matrix[:, ::-1]), axis=1)
+    last_value = matrix[np.arange(n_rows), last_col]
+
+    seasonal = matrix[:, HISTORY_MONTHS - 12] if HISTORY_MONTHS >= 12 else np.full(n_rows, np.nan)
+    method = np.where(n >= 2, 1, 0)
+    forecast = np.where(n >= 2, trend, last_value)
+    has_season = (n >= 2) & ~np.isnan(seasonal)
+    forecast = np.where(has_season, (seasonal + trend) / 2, forecast)
+    method = np.where(has_season, 2, method)
+    forecast = np.maximum(forecast, 0.0)
+
+    # Too little history for a residual estimate: assume a 20% spread
+    sigma = np.where(n >= 3, sigma, 0.2 * forecast)
+    sigma = np.maximum(sigma, 0.05 * forecast)
+    lower = np.maximum(forecast - Z_95 * sigma, 0.0)
+    upper = forecast + Z_95 * sigma
+    return forecast, lower, upper, method
+
+
+METHOD_NAMES = {0: 'last_value', 1: 'trend', 2: 'seasonal_trend'}
+
+
+def fit_forecasts():
+    """Fit every household with bills and store the forecasts. Returns a summary dict."""
+    started = time.perf_counter()
+    rows = list(ElectricityBill.objects.order_by('month', 'id').values_list(
+        'household_id', 'month', 'units_consumed', 'amount', 'household__tariff'
+    ).iterator(chunk_size=BATCH_SIZE))
+    if not rows:
+        return {'households': 0, 'seconds': 0.0}
+    household_ids, months, units, amounts, tariffs = zip(*rows)
+
+    kwh = np.array([np.nan if u is None else float(u) for u in units])
+    amounts = np.array(amounts, dtype=np.float64)
+    tariffs = np.array(tariffs)
+    for code in np.unique(tariffs[np.isnan(kwh)]):
+        mask = np.isnan(kwh) & (tariffs == code)
+        kwh[mask] = stored_tariff(code).amount_to_kwh(amounts[mask])
+    loaded = time.perf_counter()
+
+    ids, latest, matrix = history_matrix(np.array(household_ids, dtype=np.int64), month_index(months), kwh)
+    # Skip households whose next month is already over: that "forecast" would be for the past
+    fresh = latest + 1 >= month_index([current_month()])[0]
+    stale = int((~fresh).sum())
+    ids, latest, matrix = ids[fresh], latest[fresh], matrix[fresh]
+    forecast, lower, upper, method = fit(matrix)
+    fitted = time.perf_counter()
+
+    # Tariff of each household (its most recent bill row carries it)
+    household_tariff = dict(zip(household_ids, tariffs.tolist()))
+    codes = np.array([household_tariff[h] for h in ids.tolist()])
+    amount = np.empty(len(ids))
+    for code in np.unique(codes):
+        mask = codes == code
+        amount[mask] = stored_tariff(code).kwh_to_amount(forecast[mask])
+
+    next_month = latest + 1
+    forecasts = [
+        BillForecast(
+            household_id=int(ids[i]),
+            month=np.datetime64(int(next_month[i]) - 1970 * 12, 'M').astype('datetime64[D]').item(),
+            kwh=round(float(forecast[i]), 1),
+            kwh_lower=round(float(lower[i]), 1),
+            kwh_upper=round(float(upper[i]), 1),
+            amount=round(float(amount[i]), 2),
+            method=METHOD_NAMES[int(method[i])],
+        )
+        for i in range(len(ids))
+    ]
+    with transaction.atomic():
+        BillForecast.objects.bulk_create(
+            forecasts, batch_size=1000, update_conflicts=True, unique_fields=['household'],
+            update_fields=['month', 'kwh', 'kwh_lower', 'kwh_upper', 'amount', 'method', 'fitted_at'],
+        )
+        BillForecast.objects.filter(month__lt=current_month()).delete()
+
+    return {
+        'households': len(ids),
+        'skipped_stale': stale,
+        'load_seconds': round(loaded - started, 3),
+        'fit_seconds': round(fitted - loaded, 3),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
@@ -5,6 +5,8 @@ from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 import datetime
+from .tariffs import tariff_choices
+from .catalog import get_catalog
 
 User = get_user_model()
 
@@ -27,7 +29,17 @@ class EmailAuthenticationForm(AuthenticationForm):
 class HouseholdForm(forms.ModelForm):
     class Meta:
         model = Household
-        fields = ['members', 'rooms']
+        fields = ['members', 'rooms', 'tariff']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Offer every configured slab tariff (state/DISCOM)
+        self.fields['tariff'] = forms.ChoiceField(
+            choices=tariff_choices(),
+            initial=self.fields['tariff'].initial,
+            label='Electricity Provider',
+            widget=forms.Select(attrs={'class': 'form-select'})
+        )
 
 class ApplianceForm(forms.ModelForm):
     class Meta:
@@ -40,6 +52,31 @@ class ApplianceForm(forms.ModelForm):
             'custom_name': forms.TextInput(attrs={'class': 'form-control'})
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Type and wattage can be filled in from the appliance catalog
+        self.fields['appliance_type'].required = False
+        self.fields['wattage'].required = False
+        self.fields['custom_name'].help_text = 'Model name, e.g. "LG 1.5 ton", fills in type and wattage'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        custom_name = cleaned_data.get('custom_name')
+
+        if custom_name and (not cleaned_data.get('appliance_type') or not cleaned_data.get('wattage')):
+            entry = get_catalog().best_match(custom_name)
+            if entry:
+                if not cleaned_data.get('appliance_type'):
+                    cleaned_data['appliance_type'] = entry['appliance_type']
+                if not cleaned_data.get('wattage') and cleaned_data['appliance_type'] == entry['appliance_type']:
+                    cleaned_data['wattage'] = entry['wattage']
+
+        if not cleaned_data.get('appliance_type'):
+            self.add_error('appliance_type', 'Select an appliance type or pick a model from the catalog.')
+        if not cleaned_data.get('wattage') and 'wattage' not in self.errors:
+            self.add_error('wattage', 'Enter the wattage or pick a model from the catalog.')
+        return cleaned_data
+
 class BillForm(forms.ModelForm):
     class Meta:
         model = ElectricityBill
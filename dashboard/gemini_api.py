@@ -1,10 +1,20 @@
 # Updated gemini_api.py - Replace your existing file with this
 
 import json
+import logging
 import os
+import time
 import requests
 from django.conf import settings
 
+from . import usage
+from .metrics import observe
+
+logger = logging.getLogger(__name__)
+
+class GeminiAPIError(Exception):
+    """Raised by generate_response(raise_errors=True) when no answer could be generated"""
+
 class GeminiAPI:
     """Utility class to handle interactions with the Google Gemini API"""
     
@@ -21,21 +31,24 @@ class GeminiAPI:
             api_key = os.environ.get('GEMINI_API_KEY')
             
         if not api_key:
-            print("WARNING: Gemini API key not found!")
+            logger.warning("Gemini API key not found")
             return "dummy_key_for_testing"  # For testing purposes
             
         return api_key
     
     @classmethod
-    def generate_response(cls, user_message, household_data=None):
-        """Generate a response from Gemini API based on user message and household data"""
+    def generate_response(cls, user_message, household_data=None, raise_errors=False, user_id=None):
+        """
+        Generate a response from Gemini API based on user message and household data.
+        Failures come back as a user-facing message, or raise GeminiAPIError when
+        raise_errors is set (background jobs use this to retry).
+        The tokens of an answered call are counted against user_id (see usage.py).
+        """
         
-        print(f"Generating response for message: {user_message}")
-        print(f"Household data received: {household_data}")
-        
-        # Inside generate_response method
-        print("Checking available models...")
-        available_models = cls.list_available_models()
+        logger.debug("Generating Gemini response", extra={
+            'message_chars': len(user_message or ''),
+            'appliances': len((household_data or {}).get('appliances') or []) if isinstance(household_data, dict) else 0,
+        })
         
         # For testing without API key, return a mock response
         api_key = cls.get_api_key()
@@ -91,7 +104,7 @@ Example Response Format:
         
         final_prompt += f"\nUser Question: {user_message}"
         
-        print(f"Final prompt: {final_prompt}")
+        logger.debug("Gemini prompt built", extra={'prompt_chars': len(final_prompt)})
         
         # Prepare the request payload
         payload = {
@@ -116,22 +129,20 @@ Example Response Format:
         }
         
         try:
-            print("Making API request to Gemini...")
-            response = requests.post(
-                cls.API_URL,
+            response = cls._timed_request(
+                'generateContent',
+                requests.post,
+                getattr(settings, 'GEMINI_API_URL', None) or cls.API_URL,
                 headers=headers,
                 data=json.dumps(payload),
                 timeout=30
             )
             
-            print(f"API Response status: {response.status_code}")
-            print(f"API Response headers: {response.headers}")
-            
             # Parse the response
             if response.status_code == 200:
                 response_data = response.json()
-                print(f"API Response data: {response_data}")
-                
+                usage.record(user_id, response_data.get('usageMetadata'))
+
                 # Extract the generated text from the response
                 candidates = response_data.get('candidates', [])
                 if candidates:
@@ -140,14 +151,17 @@ Example Response Format:
                     if parts:
                         generated_text = parts[0].get('text', '')
                         if generated_text:
-                            print(f"Generated text: {generated_text}")
                             return generated_text
                 
-                print("No generated text found in response")
+                logger.warning("No generated text found in Gemini response")
+                if raise_errors:
+                    raise GeminiAPIError("No generated text found in response")
                 return "I'm sorry, I couldn't generate a response. Please try again."
             else:
                 error_text = response.text
-                print(f"API Error: {response.status_code} - {error_text}")
+                logger.error("Gemini API error", extra={'status': response.status_code, 'body': error_text[:500]})
+                if raise_errors:
+                    raise GeminiAPIError(f"API Error: {response.status_code} - {error_text}")
                 
                 # Try to parse error details
                 try:
@@ -157,16 +171,22 @@ Example Response Format:
                 except:
                     return f"I'm having trouble connecting to my knowledge base. Status: {response.status_code}"
                 
+        except GeminiAPIError:
+            raise
         except requests.exceptions.Timeout:
-            print("API request timed out")
+            logger.warning("Gemini API request timed out")
+            if raise_errors:
+                raise GeminiAPIError("Request timed out")
             return "Request timed out. Please try again."
         except requests.exceptions.ConnectionError:
-            print("Connection error to API")
+            logger.warning("Gemini API connection error")
+            if raise_errors:
+                raise GeminiAPIError("Connection error")
             return "Connection error. Please check your internet connection and try again."
         except Exception as e:
-            print(f"Error calling Gemini API: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error calling Gemini API")
+            if raise_errors:
+                raise GeminiAPIError(str(e)) from e
             return f"Error processing request: {str(e)}"
     
     @classmethod  # Added missing @classmethod decorator
@@ -176,16 +196,35 @@ Example Response Format:
         headers = {"x-goog-api-key": cls.get_api_key()}
     
         try:
-            response = requests.get(url, headers=headers, timeout=10)
+            response = cls._timed_request('listModels', requests.get, url, headers=headers, timeout=10)
             if response.status_code == 200:
                 models = [model['name'] for model in response.json().get('models', [])]
-                print("AVAILABLE MODELS:", models)
+                logger.info("Available Gemini models", extra={'models': models})
                 return models
-            print(f"Error listing models: {response.status_code} - {response.text}")
-        except Exception as e:
-            print(f"Error listing models: {str(e)}")
+            logger.error("Error listing models", extra={'status': response.status_code, 'body': response.text[:500]})
+        except Exception:
+            logger.exception("Error listing models")
         return []
 
+    @staticmethod
+    def _timed_request(endpoint, send, url, **kwargs):
+        """Send one upstream request, recording its latency and outcome in the metrics"""
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            response = send(url, **kwargs)
+            status = response.status_code
+            return response
+        except requests.exceptions.Timeout:
+            status = 'timeout'
+            raise
+        except requests.exceptions.ConnectionError:
+            status = 'connection_error'
+            raise
+        finally:
+            observe('enersave_gemini_request_duration_seconds', time.perf_counter() - started,
+                    endpoint=endpoint, status=status)
+
     # @classmethod
     # def _generate_mock_response(cls, user_message, household_data=None):
     #     """Generate a mock response for testing purposes"""
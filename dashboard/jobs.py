@@ -0,0 +1,147 @@
+"""
+Background precomputation of AI tips.
+
+Saving a bill, an appliance or the household enqueues a TipJob; a worker pool
+(`manage.py run_tip_worker`) claims pending jobs, calls Gemini and stores the
+answer in HouseholdTip, so the tips and results pages never wait on the API.
+
+Jobs are keyed by a hash of the household data they were queued for:
+- a household has at most one open job, and later changes coalesce into it
+- a job whose hash already matches the stored tip finishes without a call
+- failures are retried with exponential backoff up to MAX_ATTEMPTS
+- jobs left running by a crashed worker are requeued after STALE_AFTER seconds
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .gemini_api import GeminiAPI
+from .models import Appliance, ElectricityBill, HouseholdTip, TipJob
+
+TIP_PROMPT = ("Give me personalized energy-saving tips for my household, "
+              "focusing on the appliances that use the most electricity.")
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 30     # Backoff: 30s, 60s, 120s, ...
+STALE_AFTER = 600           # Seconds before a running job is assumed lost
+
+
+def household_payload(household):
+    """The household_data sent to Gemini, in the same shape the tips page uses"""
+    appliances = Appliance.objects.filter(household=household).order_by('id')
+    bill = ElectricityBill.objects.filter(household=household).order_by('-month').first()
+    return {
+        'rooms': household.rooms,
+        'members': household.members,
+        'appliances': [
+            {
+                'type': app.get_appliance_type_display(),
+                'name': app.custom_name or app.get_appliance_type_display(),
+                'power': app.wattage,
+                'hours': app.hours_used,
+            }
+            for app in appliances
+        ],
+        'latest_bill': {
+            'month': bill.month.isoformat(),
+            'amount': str(bill.amount),
+            'units': None if bill.units_consumed is None else str(bill.units_consumed),
+        } if bill else None,
+    }
+
+
+def payload_hash(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def tip_prompt(payload):
+    bill = payload.get('latest_bill')
+    if not bill:
+        return TIP_PROMPT
+    units = f" for {bill['units']} kWh" if bill['units'] else ""
+    return f"{TIP_PROMPT} My latest bill was ₹{bill['amount']}{units}."
+
+
+def enqueue_tips(household):
+    """
+    Queue a tips refresh for the household unless its stored tips are already
+    current. Returns the open job, or None when nothing needs doing.
+    """
+    input_hash = payload_hash(household_payload(household))
+    if HouseholdTip.objects.filter(household=household, input_hash=input_hash).exists():
+        return None
+
+    now = timezone.now()
+    # Coalesce into the pending job if there is one: it will pick up the latest data
+    updated = TipJob.objects.filter(household=household, status=TipJob.PENDING).update(
+        input_hash=input_hash, run_after=now, attempts=0, updated_at=now,
+    )
+    if updated:
+        return TipJob.objects.filter(household=household, status=TipJob.PENDING).first()
+    try:
+        with transaction.atomic():
+            return TipJob.objects.create(household=household, input_hash=input_hash, run_after=now)
+    except IntegrityError:
+        # A job is already running; it rechecks the hash when it finishes
+        return TipJob.objects.filter(household=household, status=TipJob.RUNNING).first()
+
+
+def claim_jobs(limit):
+    """Atomically move up to limit due pending jobs to running and return them"""
+    now = timezone.now()
+    candidates = list(TipJob.objects.filter(status=TipJob.PENDING, run_after__lte=now)
+                      .order_by('run_after').values_list('id', flat=True)[:limit])
+    claimed = []
+    for job_id in candidates:
+        # The conditional update is the lock: only one worker sees a row count of 1
+        if TipJob.objects.filter(id=job_id, status=TipJob.PENDING).update(
+                status=TipJob.RUNNING, locked_at=now, updated_at=now):
+            claimed.append(job_id)
+    return list(TipJob.objects.filter(id__in=claimed).select_related('household'))
+
+
+def requeue_stale(stale_after=STALE_AFTER):
+    """Return jobs stuck in running (worker crashed or was killed) to the queue"""
+    now = timezone.now()
+    return TipJob.objects.filter(
+        status=TipJob.RUNNING, locked_at__lt=now - timedelta(seconds=stale_after)
+    ).update(status=TipJob.PENDING, locked_at=None, run_after=now, updated_at=now)
+
+
+def _finish(job, status, **fields):
+    TipJob.objects.filter(id=job.id).update(status=status, locked_at=None, updated_at=timezone.now(), **fields)
+
+
+def run_job(job):
+    """
+    Generate and store tips for a claimed job. Safe to run twice: the stored
+    tip is only replaced when it was generated from different data.
+    Returns the job's final status.
+    """
+    household = job.household
+    payload = household_payload(household)
+    input_hash = payload_hash(payload)
+    if HouseholdTip.objects.filter(household=household, input_hash=input_hash).exists():
+        _finish(job, TipJob.DONE, input_hash=input_hash)
+        return TipJob.DONE
+
+    attempts = job.attempts + 1
+    try:
+        text = GeminiAPI.generate_response(tip_prompt(payload), payload, raise_errors=True,
+                                           user_id=household.user_id)
+    except Exception as e:  # GeminiAPIError, or anything unexpected: retry rather than lose the job
+        if attempts >= MAX_ATTEMPTS:
+            _finish(job, TipJob.FAILED, attempts=attempts, last_error=str(e))
+            return TipJob.FAILED
+        delay = RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+        _finish(job, TipJob.PENDING, attempts=attempts, last_error=str(e),
+                run_after=timezone.now() + timedelta(seconds=delay))
+        return TipJob.PENDING
+
+    HouseholdTip.objects.update_or_create(household=household, defaults={'text': text, 'input_hash': input_hash})
+    _finish(job, TipJob.DONE, attempts=attempts, input_hash=input_hash, last_error='')
+    # Changes saved while the call was in flight could not open a second job; catch them now
+    enqueue_tips(household)
+    return TipJob.DONE
@@ -0,0 +1,152 @@
+"""
+Hourly load-profile synthesis.
+
+Each appliance type has a precomputed 24-hour usage template (the share of its
+daily running hours falling in each hour) and a monthly seasonal multiplier.
+Appliances are expanded into hourly demand by broadcasting their wattage and
+daily hours against the templates, then summed per household, with no loops
+over hours. The profiles feed peak-demand and time-of-use (ToD) cost views.
+"""
+import numpy as np
+
+from .models import Appliance
+from .utils import REAL_WORLD_USAGE_FACTOR
+
+APPLIANCE_TYPES = [code for code, _ in Appliance.HOUSEHOLD_APPLIANCES]
+TYPE_INDEX = {code: i for i, code in enumerate(APPLIANCE_TYPES)}
+
+# Relative likelihood of use in each hour of the day, per appliance type
+_RAW_TEMPLATES = {
+    'AC': [3, 3, 3, 3, 3, 2, 1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 1, 1, 1, 2, 2, 3, 3, 3],
+    'WM': [0, 0, 0, 0, 0, 0, 1, 3, 4, 4, 3, 2, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 0, 0],
+    'FR': [1] * 24,
+    'WH': [0, 0, 0, 0, 0, 2, 5, 6, 4, 2, 1, 0, 0, 0, 0, 0, 0, 1, 2, 2, 1, 0, 0, 0],
+    'TV': [0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 2, 3, 4, 5, 5, 3, 1],
+    'MO': [0, 0, 0, 0, 0, 0, 1, 3, 3, 1, 0, 0, 2, 2, 0, 0, 0, 0, 1, 3, 3, 1, 0, 0],
+    'CF': [3, 3, 3, 3, 3, 2, 2, 1, 1, 1, 1, 1, 2, 2, 2, 2, 1, 1, 1, 2, 2, 3, 3, 3],
+    'LT': [0, 0, 0, 0, 0, 1, 2, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 4, 5, 5, 4, 3, 1],
+    'PC': [0, 0, 0, 0, 0, 0, 0, 0, 1, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 1, 1, 0],
+}
+# (types x 24) share of daily running hours per hour; each row sums to 1
+TEMPLATES = np.array([_RAW_TEMPLATES[code] for code in APPLIANCE_TYPES], dtype=np.float64)
+TEMPLATES /= TEMPLATES.sum(axis=1, keepdims=True)
+
+# (types x 12) usage multiplier per calendar month (Jan..Dec)
+_RAW_SEASONAL = {
+    'AC': [0.1, 0.2, 0.6, 1.2, 1.6, 1.6, 1.3, 1.2, 1.1, 0.8, 0.3, 0.1],
+    'CF': [0.3, 0.5, 0.9, 1.3, 1.5, 1.5, 1.3, 1.3, 1.2, 1.0, 0.6, 0.3],
+    'WH': [1.8, 1.6, 1.1, 0.7, 0.4, 0.4, 0.5, 0.5, 0.6, 0.9, 1.3, 1.7],
+    'FR': [0.9, 0.9, 1.0, 1.1, 1.15, 1.15, 1.05, 1.05, 1.0, 1.0, 0.9, 0.9],
+}
+SEASONAL = np.array([_RAW_SEASONAL.get(code, [1.0] * 12) for code in APPLIANCE_TYPES], dtype=np.float64)
+
+# Time-of-day multipliers on the energy rate: cheaper solar hours, dearer evening peak
+TOD_MULTIPLIERS = np.ones(24)
+TOD_MULTIPLIERS[9:17] = 0.8
+TOD_MULTIPLIERS[18:23] = 1.2
+
+DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+MONTH_OF_DAY = np.repeat(np.arange(12), DAYS_IN_MONTH)  # 365 entries
+
+
+def spread_hours(hours_used, shares):
+    """
+    (appliances x 24) running hours per hour: each appliance's daily hours spread
+    in proportion to its shares, capped at a full hour per hour. Hours over a cap
+    move to the hours still below it (in proportion to their shares, or evenly
+    once only zero-share hours are left), so every row keeps its daily hours
+    (up to 24).
+    """
+    duty = np.minimum(hours_used, 24)[:, None] * shares
+    capped = np.flatnonzero(duty.max(axis=1) > 1.0)
+    if not len(capped):
+        return duty  # The common case: nothing to move
+
+    # Water-filling on the capped rows: each pass saturates at least one more hour,
+    # so 24 passes always finish
+    part, part_shares = duty[capped], shares[capped]
+    for _ in range(24):
+        excess = np.maximum(part - 1.0, 0.0).sum(axis=1)
+        part = np.minimum(part, 1.0)
+        if not (excess > 1e-9).any():
+            break
+        free = part < 1.0
+        weights = np.where(free, part_shares, 0.0)
+        weights = np.where(weights.sum(axis=1, keepdims=True) > 0, weights, free.astype(np.float64))
+        total = weights.sum(axis=1, keepdims=True)
+        part += excess[:, None] * np.divide(weights, total, out=np.zeros_like(weights), where=total > 0)
+    duty[capped] = part
+    return duty
+
+
+def appliance_loads(wattage, hours_used, type_index):
+    """
+    (appliances x 24) average kW drawn per hour of a typical day. Each appliance
+    spreads its daily hours over its template (see spread_hours), so the daily
+    kWh matches calculate_consumption.
+    """
+    wattage = np.asarray(wattage, dtype=np.float64)
+    hours_used = np.asarray(hours_used, dtype=np.float64)
+    duty = spread_hours(hours_used, TEMPLATES[type_index])
+    return wattage[:, None] / 1000 * duty * REAL_WORLD_USAGE_FACTOR
+
+
+def daily_profiles(household_index, wattage, hours_used, type_index, households):
+    """
+    (households x 24) kW profile of a typical day. household_index maps every
+    appliance to a row in 0..households-1.
+    """
+    profiles = np.zeros((households, 24))
+    np.add.at(profiles, np.asarray(household_index), appliance_loads(wattage, hours_used, type_index))
+    return profiles
+
+
+def annual_profiles(household_index, wattage, hours_used, type_index, households):
+    """
+    (households x 8760) hourly kW for a non-leap year, with each appliance type's
+    daily template scaled by its seasonal multiplier for the month. The result
+    is float32 (35 KB per household), so callers should work in batches.
+    """
+    loads = appliance_loads(wattage, hours_used, type_index)
+    # Per household and type: (households x types x 24)
+    by_type = np.zeros((households, len(APPLIANCE_TYPES), 24))
+    np.add.at(by_type, (np.asarray(household_index), np.asarray(type_index)), loads)
+    # (households x 12 x 24) typical day per month, then expanded to every day
+    monthly = np.einsum('htd,tm->hmd', by_type, SEASONAL).astype(np.float32)
+    return monthly[:, MONTH_OF_DAY, :].reshape(households, 365 * 24)
+
+
+def summarize(profile, flat_rate):
+    """
+    Peak and ToD figures for one daily profile. flat_rate is the household's
+    effective rupees per kWh; ToD cost applies TOD_MULTIPLIERS hour by hour.
+    """
+    daily_kwh = profile.sum()
+    peak_hour = int(profile.argmax())
+    tod_factor = float((profile * TOD_MULTIPLIERS).sum() / daily_kwh) if daily_kwh > 0 else 1.0
+    evening = profile[18:23].sum()
+    return {
+        'hourly_kw': [round(float(kw), 3) for kw in profile],
+        'peak_hour': peak_hour,
+        'peak_kw': round(float(profile[peak_hour]), 2),
+        'daily_kwh': round(float(daily_kwh), 2),
+        'evening_peak_share': round(float(evening / daily_kwh * 100), 1) if daily_kwh > 0 else 0,
+        'tod_factor': round(tod_factor, 3),
+        'monthly_flat_cost': round(float(daily_kwh * 30 * flat_rate), 2),
+        'monthly_tod_cost': round(float(daily_kwh * 30 * flat_rate * tod_factor), 2),
+    }
+
+
+def household_load_profile(appliances, flat_rate):
+    """Typical-day profile and ToD summary for one household's appliances"""
+    appliances = list(appliances)
+    if not appliances:
+        return None
+    profile = daily_profiles(
+        np.zeros(len(appliances), dtype=np.int64),
+        [app.wattage for app in appliances],
+        [app.hours_used for app in appliances],
+        np.array([TYPE_INDEX[app.appliance_type] for app in appliances]),
+        1,
+    )[0]
+    return summarize(profile, flat_rate)
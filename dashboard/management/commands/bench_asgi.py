@@ -0,0 +1,155 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+from types import ModuleType
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import path
+
+from dashboard import async_views, views
+from dashboard.benchmarks import generate_dataset, latency_summary
+from dashboard.models import User
+from dashboard.neighbours import get_index
+
+PAGES = ['/results/', '/tips/']
+MODES = {'sync': views, 'async': async_views}
+
+
+def urlconf(module):
+    """The project's URLs with the results and tips pages served by `module`"""
+    from enersave.urls import urlpatterns
+    conf = ModuleType(f'bench_{module.__name__}_urls')
+    conf.urlpatterns = [
+        path('results/', module.results, name='results'),
+        path('tips/', module.tips, name='tips'),
+    ] + urlpatterns
+    return conf
+
+
+async def asgi_get(application, url, cookie):
+    """GET url through the ASGI application; returns the status code"""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': url, 'raw_path': url.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+    received = False
+    status = None
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await asyncio.Event().wait()  # The client never disconnects early
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await application(scope, receive, send)
+    return status
+
+
+class Command(BaseCommand):
+    help = ("Compare the sync and async results/tips views served through enersave.asgi at several "
+            "concurrency levels, on a synthetic dataset in a throwaway on-disk test database")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--households', type=int, default=2000)
+        parser.add_argument('--requests', type=int, default=400, help='Requests per page, mode and concurrency')
+        parser.add_argument('--concurrency', default='1,8,32', help='Comma-separated in-flight request counts')
+        parser.add_argument('--db-latency-ms', type=float, default=0,
+                            help='Delay added to every query, to model a database across the network')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        levels = [int(c) for c in options['concurrency'].split(',')]
+        setup_test_environment()
+        with tempfile.TemporaryDirectory() as tmp:
+            # On disk, so the threads serving concurrent requests share the database
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(tmp, 'bench.sqlite3')
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                result = self.run(levels, options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+        for page, by_level in result['pages'].items():
+            for level, r in by_level.items():
+                self.stdout.write(
+                    f"{page:<10} c={level:<3} sync {r['sync']['requests_per_s']:>7.1f} req/s "
+                    f"(p50 {r['sync']['p50_ms']:>7.2f}, p95 {r['sync']['p95_ms']:>7.2f} ms)  "
+                    f"async {r['async']['requests_per_s']:>7.1f} req/s "
+                    f"(p50 {r['async']['p50_ms']:>7.2f}, p95 {r['async']['p95_ms']:>7.2f} ms)"
+                )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def run(self, levels, options):
+        from enersave.asgi import application
+
+        generate_dataset(options['households'], months=6)
+        get_index()  # Build the neighbour index outside the timings
+        cookies = []
+        for user in User.objects.filter(household__isnull=False)[:200]:
+            client = Client()
+            client.force_login(user)
+            cookies.append('; '.join(f'{name}={morsel.value}' for name, morsel in client.cookies.items()))
+
+        latency = options['db_latency_ms'] / 1000
+        if latency:
+            def delayed(execute, sql, params, many, context):
+                time.sleep(latency)
+                return execute(sql, params, many, context)
+
+            def add_latency(sender=None, connection=None, **kwargs):
+                if delayed not in connection.execute_wrappers:
+                    connection.execute_wrappers.append(delayed)
+
+            connection_created.connect(add_latency, weak=False)
+            for conn in connections.all():
+                add_latency(connection=conn)
+
+        pages = {}
+        for page in PAGES:
+            pages[page] = {}
+            for level in levels:
+                pages[page][level] = {}
+                for mode, module in MODES.items():
+                    with override_settings(ROOT_URLCONF=urlconf(module)):
+                        asyncio.run(self.load(application, page, cookies, level, min(level * 2, 20)))  # Warm-up
+                        pages[page][level][mode] = asyncio.run(
+                            self.load(application, page, cookies, level, options['requests']))
+        return {'households': options['households'], 'db_latency_ms': options['db_latency_ms'],
+                'cpus': os.cpu_count(), 'pages': pages}
+
+    @staticmethod
+    async def load(application, page, cookies, concurrency, requests):
+        """Send `requests` GETs with at most `concurrency` in flight; latency summary and throughput"""
+        slots = asyncio.Semaphore(concurrency)
+        timings = []
+
+        async def one(i):
+            async with slots:
+                t = time.perf_counter()
+                status = await asgi_get(application, page, cookies[i % len(cookies)])
+                timings.append(time.perf_counter() - t)
+            if status != 200:
+                raise CommandError(f"{page} returned {status}")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+        return {**latency_summary(timings), 'requests_per_s': round(requests / elapsed, 1)}
@@ -0,0 +1,170 @@
+import json
+import platform
+import subprocess
+import time
+
+import django
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from dashboard.benchmarks import MockGeminiServer, compare_results, generate_dataset, latency_summary
+from dashboard.gemini_api import GeminiAPI
+from dashboard.models import Appliance, ElectricityBill, Household, User
+from dashboard.tariffs import TARIFF_SLABS
+from dashboard.utils import calculate_consumption, expected_bill_for_indian_household
+
+SIZES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the dashboard hot paths (consumption, expected bill, results/appliances/tips "
+            "views, Gemini chat against a mock upstream) on a synthetic dataset in a throwaway test database")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=SIZES, default='1k', help='Synthetic households to generate')
+        parser.add_argument('--months', type=int, default=12, help='Bills per household')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--iterations', type=int, default=200, help='Timed calls per benchmark')
+        parser.add_argument('--upstream-latency', type=float, default=0.0,
+                            help='Seconds the mock Gemini server waits before answering')
+        parser.add_argument('--keepdb', action='store_true', help='Reuse (and keep) the benchmark database')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--compare', help='Baseline JSON file; exit with an error on p50 regressions')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed p50 slowdown for --compare')
+
+    def handle(self, *args, **options):
+        households = SIZES[options['size']]
+        setup_test_environment()
+        # Always a separate test database: the generator inserts up to a million households
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            result = self.run(households, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        for name, stats in result['benchmarks'].items():
+            queries = f", {stats['queries']} queries" if 'queries' in stats else ''
+            self.stdout.write(f"{name:<24} p50 {stats['p50_ms']:>9.3f} ms  p95 {stats['p95_ms']:>9.3f} ms  "
+                              f"p99 {stats['p99_ms']:>9.3f} ms{queries}")
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                regressions = compare_results(json.load(f), result, options['tolerance'])
+            for name, before, after, ratio in regressions:
+                self.stdout.write(self.style.ERROR(f"{name}: p50 {before} ms -> {after} ms ({ratio}x)"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} benchmarks regressed beyond {options['tolerance']:.0%}")
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
+
+    def run(self, households, options):
+        rng = np.random.default_rng(options['seed'])
+        iterations = options['iterations']
+
+        started = time.perf_counter()
+        if not Household.objects.exists():
+            generate_dataset(households, months=options['months'], seed=options['seed'],
+                             log=self.stdout.write if households >= 100_000 else None)
+        generate_s = time.perf_counter() - started
+
+        # Sample households by id so the run never loads the whole table
+        max_id = Household.objects.order_by('-id').values_list('id', flat=True).first()
+        sample_ids = rng.integers(1, max_id + 1, iterations).tolist()
+        benchmarks = {}
+
+        # Step 1: calculate_consumption on preloaded rows, so only the function is timed
+        inputs = []
+        for household in Household.objects.filter(id__in=set(sample_ids)):
+            appliances = list(Appliance.objects.filter(household=household))
+            bill = ElectricityBill.objects.filter(household=household).order_by('-month').first()
+            inputs.append((household, appliances, bill))
+        timings = []
+        for household, appliances, bill in inputs:
+            t = time.perf_counter()
+            calculate_consumption(household, appliances, bill)
+            timings.append(time.perf_counter() - t)
+        benchmarks['calculate_consumption'] = latency_summary(timings)
+
+        # Step 2: expected bill over random household shapes and tariffs
+        codes = list(TARIFF_SLABS)
+        timings = []
+        for members, rooms, tariff in zip(rng.integers(1, 9, iterations), rng.integers(1, 7, iterations),
+                                          rng.choice(codes, iterations)):
+            t = time.perf_counter()
+            expected_bill_for_indian_household(int(members), int(rooms), str(tariff))
+            timings.append(time.perf_counter() - t)
+        benchmarks['expected_bill'] = latency_summary(timings)
+
+        # Step 3: full views through the test client, logged in as sampled users
+        users = list(User.objects.filter(household__id__in=set(sample_ids)))
+        if not users:
+            raise CommandError(f"None of the {iterations} sampled household ids belongs to a user; "
+                               "raise --iterations or use a larger --size")
+        client = Client()
+        with MockGeminiServer(latency=options['upstream_latency']) as upstream:
+            original_url = GeminiAPI.API_URL
+            GeminiAPI.API_URL = upstream.url
+            try:
+                for name, path, method in [('results_view', '/results/', 'get'),
+                                           ('appliances_view', '/appliances/', 'get'),
+                                           ('tips_view', '/tips/', 'get'),
+                                           ('gemini_chat', '/gemini_chat/', 'post')]:
+                    benchmarks[name] = self.time_view(client, users, path, method)
+            finally:
+                GeminiAPI.API_URL = original_url
+
+        return {
+            'meta': {
+                'households': households,
+                'months': options['months'],
+                'seed': options['seed'],
+                'iterations': iterations,
+                'upstream_latency_s': options['upstream_latency'],
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            },
+            'generate_s': round(generate_s, 3),
+            'benchmarks': benchmarks,
+        }
+
+    def time_view(self, client, users, path, method):
+        """Latency and median query count of one view, one request per sampled user after a warm-up"""
+        body = json.dumps({'message': 'How can I cut my AC bill?',
+                           'household_data': {'rooms': 3, 'members': 4, 'appliances': []}})
+        client.force_login(users[0])
+        self.request(client, path, method, body)  # Warm caches (tariffs, catalog, neighbour index)
+
+        timings, queries = [], []
+        for user in users:
+            client.force_login(user)
+            with CaptureQueriesContext(connection) as captured:
+                t = time.perf_counter()
+                response = self.request(client, path, method, body)
+                timings.append(time.perf_counter() - t)
+            queries.append(len(captured))
+            if response.status_code >= 400:
+                raise CommandError(f"{path} returned {response.status_code} for {user.email}")
+        return {**latency_summary(timings), 'queries': int(np.median(queries))}
+
+    @staticmethod
+    def request(client, path, method, body):
+        if method == 'post':
+            return client.post(path, body, content_type='application/json')
+        return client.get(path)
@@ -0,0 +1,54 @@
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from dashboard.forecasting import fit, history_matrix
+
+
+class Command(BaseCommand):
+    help = "Benchmark the batched nightly forecast fit on synthetic bill histories"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--households', type=int, default=1_000_000)
+        parser.add_argument('--months', type=int, default=24, help='Months of history per household')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        households, months = options['households'], options['months']
+
+        # Seasonal consumption with a per-household level and trend; ~10% of bills missing
+        household_ids = np.repeat(np.arange(households), months)
+        month = np.tile(np.arange(2023 * 12, 2023 * 12 + months), households)
+        level = rng.gamma(4.0, 60.0, households)[household_ids]
+        season = 1 + 0.3 * np.sin(2 * np.pi * (month % 12) / 12)
+        drift = 1 + rng.normal(0, 0.01, households)[household_ids] * (month - month.min())
+        kwh = level * season * drift * rng.lognormal(0, 0.1, len(month))
+        keep = rng.random(len(month)) > 0.1
+        household_ids, month, kwh = household_ids[keep], month[keep], kwh[keep]
+
+        started = time.perf_counter()
+        ids, latest, matrix = history_matrix(household_ids, month, kwh)
+        pivoted = time.perf_counter()
+        forecast, lower, upper, method = fit(matrix)
+        fitted = time.perf_counter()
+
+        result = {
+            'households': households,
+            'bills': int(keep.sum()),
+            'pivot_s': round(pivoted - started, 3),
+            'fit_s': round(fitted - pivoted, 3),
+            'households_per_s': round(households / (fitted - started)),
+            'methods': {str(m): int((method == m).sum()) for m in np.unique(method)},
+        }
+        self.stdout.write(
+            f"{households:,} households ({result['bills']:,} bills): pivot {result['pivot_s']}s, "
+            f"fit {result['fit_s']}s ({result['households_per_s']:,} households/s)"
+        )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,54 @@
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from dashboard.load_profile import APPLIANCE_TYPES, annual_profiles, daily_profiles
+
+
+class Command(BaseCommand):
+    help = "Benchmark daily and 8760-hour load-profile synthesis on synthetic households"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--households', type=int, default=10000)
+        parser.add_argument('--appliances', type=int, default=8, help='Appliances per household')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        households = options['households']
+        n = households * options['appliances']
+        household_index = np.repeat(np.arange(households), options['appliances'])
+        type_index = rng.integers(0, len(APPLIANCE_TYPES), n)
+        wattage = rng.choice([60, 75, 150, 200, 1000, 1500, 2000], n)
+        hours_used = rng.integers(1, 13, n)
+
+        started = time.perf_counter()
+        daily = daily_profiles(household_index, wattage, hours_used, type_index, households)
+        daily_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        annual = annual_profiles(household_index, wattage, hours_used, type_index, households)
+        peaks = annual.max(axis=1)
+        annual_s = time.perf_counter() - started
+
+        result = {
+            'households': households,
+            'appliances': n,
+            'daily_s': round(daily_s, 4),
+            'daily_households_per_s': round(households / daily_s),
+            'annual_s': round(annual_s, 4),
+            'annual_households_per_s': round(households / annual_s),
+            'mean_daily_peak_kw': round(float(daily.max(axis=1).mean()), 3),
+            'mean_annual_peak_kw': round(float(peaks.mean()), 3),
+        }
+        self.stdout.write(
+            f"{households:,} households: 24h profiles {result['daily_households_per_s']:,}/s, "
+            f"8760h profiles {result['annual_households_per_s']:,}/s"
+        )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,69 @@
+import json
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from dashboard.neighbours import FEATURES, NeighbourIndex
+
+
+class Command(BaseCommand):
+    help = "Benchmark households-like-you kNN queries on synthetic households"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--households', type=int, default=1_000_000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--k', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        n, k = options['households'], options['k']
+
+        # Members/rooms are small integers, appliance usage is sparse and skewed
+        features = np.zeros((n, len(FEATURES)))
+        features[:, 0] = rng.integers(1, 9, n)
+        features[:, 1] = rng.integers(1, 7, n)
+        owned = rng.random((n, len(FEATURES) - 2)) < 0.6
+        features[:, 2:] = owned * rng.gamma(2.0, 1.5, (n, len(FEATURES) - 2))
+        kwh = features[:, 2:].sum(axis=1) * 12 + rng.normal(0, 20, n)
+
+        started = time.perf_counter()
+        index = NeighbourIndex(np.arange(n), features, kwh)
+        build_s = time.perf_counter() - started
+        self.stdout.write(f"Built index over {n} households in {build_s:.2f}s")
+
+        queries = features[rng.integers(0, n, options['queries'])] + rng.normal(0, 0.1, (options['queries'], len(FEATURES)))
+        tree_ms, brute_ms, mismatches = [], [], 0
+        scaled = index.features / index.scale
+        for q in queries:
+            started = time.perf_counter()
+            ids, _ = index.nearest(q, k=k)
+            tree_ms.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            diff = scaled - q / index.scale
+            brute = np.argpartition(np.einsum('ij,ij->i', diff, diff), k - 1)[:k]
+            brute_ms.append((time.perf_counter() - started) * 1000)
+            mismatches += len(set(brute.tolist()) - set(ids.tolist()))
+
+        result = {
+            'households': n,
+            'k': k,
+            'build_s': round(build_s, 3),
+            'tree_ms_p50': round(statistics.median(tree_ms), 3),
+            'tree_ms_p95': round(float(np.percentile(tree_ms, 95)), 3),
+            'brute_ms_p50': round(statistics.median(brute_ms), 3),
+            # Ties at equal distance can legitimately differ between the two
+            'mismatched_neighbours': mismatches,
+        }
+        self.stdout.write(
+            f"kNN (k={k}): tree p50 {result['tree_ms_p50']} ms, p95 {result['tree_ms_p95']} ms; "
+            f"brute force p50 {result['brute_ms_p50']} ms"
+        )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,63 @@
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from dashboard.models import Appliance, Household
+from dashboard.optimizer import recommend_upgrades
+
+
+class Command(BaseCommand):
+    help = "Benchmark the exact and greedy upgrade optimizers on synthetic households"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='5,10,20,50,200', help='Comma-separated appliance counts')
+        parser.add_argument('--budgets', default='5000,25000,100000', help='Comma-separated budgets in rupees')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        types = [code for code, _ in Appliance.HOUSEHOLD_APPLIANCES]
+        household = Household(members=4, rooms=3)
+        results = []
+
+        for size in [int(s) for s in options['sizes'].split(',')]:
+            # Unsaved model instances: the optimizer never touches the database
+            appliances = [
+                Appliance(
+                    id=i,
+                    appliance_type=rng.choice(types),
+                    wattage=rng.choice([60, 75, 150, 200, 1000, 1500, 2000]),
+                    hours_used=rng.randint(1, 12),
+                )
+                for i in range(size)
+            ]
+            for budget in [int(b) for b in options['budgets'].split(',')]:
+                row = {'appliances': size, 'budget': budget}
+                for solver in ('exact', 'greedy'):
+                    timings = []
+                    for _ in range(options['repeat']):
+                        started = time.perf_counter()
+                        result = recommend_upgrades(household, appliances, None, budget, solver=solver)
+                        timings.append((time.perf_counter() - started) * 1000)
+                    row[f'{solver}_ms_median'] = round(statistics.median(timings), 3)
+                    row[f'{solver}_ms_max'] = round(max(timings), 3)
+                    row[f'{solver}_kwh_saved'] = result['kwh_saved']
+                row['greedy_quality'] = (
+                    round(row['greedy_kwh_saved'] / row['exact_kwh_saved'], 4) if row['exact_kwh_saved'] else 1.0
+                )
+                results.append(row)
+                self.stdout.write(
+                    f"{size:>4} appliances, budget {budget:>7}: "
+                    f"exact {row['exact_ms_median']:.2f} ms, greedy {row['greedy_ms_median']:.2f} ms, "
+                    f"greedy/exact savings {row['greedy_quality']:.3f}"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,84 @@
+import json
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from dashboard.benchmarks import generate_dataset, latency_summary
+from dashboard.models import Household, User
+
+PAGES = ['/appliances/', '/bill/', '/results/', '/tips/', '/upgrades/?budget=5000',
+         '/api/appliances/', '/api/bills/', '/api/consumption/']
+
+# Database sessions and an uncached user lookup, as before dashboard/auth.py
+UNCACHED = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+    'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend'],
+}
+# The settings used with a shared cache (REDIS_URL); the local cache stands in for it in this one process
+CACHED = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+    'AUTHENTICATION_BACKENDS': ['dashboard.auth.CachedModelBackend'],
+}
+
+
+class Command(BaseCommand):
+    help = ("Count the database queries per page view with database sessions and uncached users "
+            "against the cached session/user path, on a synthetic dataset in a throwaway test database")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--households', type=int, default=200)
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per page and setup')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            generate_dataset(options['households'], months=6)
+            users = list(User.objects.filter(household__isnull=False)[:options['iterations']])
+            pages = {}
+            for path in PAGES:
+                with override_settings(**UNCACHED):
+                    before = self.measure(path, users)
+                with override_settings(**CACHED):
+                    after = self.measure(path, users)
+                pages[path] = {'uncached': before, 'cached': after,
+                               'queries_removed': before['queries'] - after['queries']}
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for path, r in pages.items():
+            self.stdout.write(
+                f"{path:<24} queries {r['uncached']['queries']:>2} -> {r['cached']['queries']:>2} "
+                f"(-{r['queries_removed']}, household lookups {r['cached']['household_queries']})  "
+                f"p50 {r['uncached']['p50_ms']:>7.2f} -> {r['cached']['p50_ms']:>7.2f} ms"
+            )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'households': options['households'], 'pages': pages}, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def measure(self, path, users):
+        """Median queries, household lookups and latency of one warm request per user"""
+        cache.clear()
+        table = Household._meta.db_table
+        queries, households, timings = [], [], []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            client.get(path)  # Warm the session and user caches
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(path)
+                timings.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                raise CommandError(f"{path} returned {response.status_code} for {user.email}")
+            queries.append(len(captured))
+            households.append(sum(f'FROM "{table}"' in q['sql'] for q in captured.captured_queries))
+        return {**latency_summary(timings), 'queries': sorted(queries)[len(queries) // 2],
+                'household_queries': max(households)}
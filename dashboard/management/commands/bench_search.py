@@ -0,0 +1,99 @@
+import json
+import time
+
+from django.contrib import admin
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from dashboard import search
+from dashboard.admin_utils import FullTextSearchMixin
+from dashboard.benchmarks import BENCH_EMAIL, generate_dataset, latency_summary
+from dashboard.models import Appliance, ElectricityBill, Household, User
+
+SIZES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+ROOMS = ['Bedroom', 'Kitchen', 'Living room', 'Study', 'Guest room', 'Balcony', 'Office']
+
+
+class Command(BaseCommand):
+    help = ("Compare admin search through the FTS5 index with the LIKE '%term%' search it replaces, "
+            "on a synthetic dataset in a throwaway test database")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=SIZES, default='100k', help='Synthetic households to generate')
+        parser.add_argument('--months', type=int, default=3, help='Bills per household')
+        parser.add_argument('--iterations', type=int, default=20, help='Timed searches per query and method')
+        parser.add_argument('--keepdb', action='store_true', help='Reuse (and keep) the benchmark database')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            if not search.is_installed():
+                raise CommandError("This database has no FTS5 trigram support")
+            result = self.run(SIZES[options['size']], options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        for name, r in result['benchmarks'].items():
+            self.stdout.write(
+                f"{name:<32} LIKE p50 {r['like']['p50_ms']:>9.2f} ms  FTS p50 {r['fts']['p50_ms']:>8.2f} ms  "
+                f"{r['speedup']:>7.1f}x  ({r['matches']:,} matches)"
+            )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def run(self, households, options):
+        if not Household.objects.exists():
+            generate_dataset(households, months=options['months'],
+                             log=self.stdout.write if households >= 100_000 else None)
+            # Name a third of the appliances after rooms; the triggers index the new names
+            rooms = ' '.join(f"WHEN {i} THEN '{room} '" for i, room in enumerate(ROOMS))
+            with connection.cursor() as cursor:
+                cursor.execute(f"UPDATE {Appliance._meta.db_table} SET custom_name = "
+                               f"CASE id % {len(ROOMS)} {rooms} END || appliance_type WHERE id % 3 = 0")
+                cursor.execute('ANALYZE')
+
+        probe = households // 2
+        cases = [
+            ('user: exact email', User, BENCH_EMAIL.format(probe)),
+            ('user: email fragment', User, f'bench{probe // 10}'),
+            ('household: email fragment', Household, f'bench{probe // 100}'),
+            ('appliance: custom name', Appliance, 'Guest room'),
+            ('appliance: name and owner', Appliance, f'Kitchen bench{probe // 100}'),
+            ('bill: owner email', ElectricityBill, BENCH_EMAIL.format(probe)),
+        ]
+        benchmarks = {}
+        for name, model, term in cases:
+            model_admin = admin.site._registry[model]
+            like_search = super(FullTextSearchMixin, model_admin).get_search_results
+            like, like_ids = self.time_search(like_search, model, term, options['iterations'])
+            fts, fts_ids = self.time_search(model_admin.get_search_results, model, term, options['iterations'])
+            if like_ids != fts_ids:
+                raise CommandError(f"{name}: FTS returned different rows than LIKE for {term!r}")
+            benchmarks[name] = {
+                'term': term,
+                'matches': len(fts_ids),
+                'like': like,
+                'fts': fts,
+                'speedup': round(like['p50_ms'] / fts['p50_ms'], 1) if fts['p50_ms'] else None,
+            }
+        return {'meta': {'households': households, 'months': options['months'],
+                         'iterations': options['iterations']},
+                'benchmarks': benchmarks}
+
+    @staticmethod
+    def time_search(search_func, model, term, iterations):
+        """Latency of an admin-style search: first page of 100 plus the match count"""
+        timings = []
+        for _ in range(iterations):
+            t = time.perf_counter()
+            queryset, _ = search_func(None, model._default_manager.all(), term)
+            list(queryset.order_by('-pk')[:100])
+            ids = set(queryset.values_list('pk', flat=True))
+            timings.append(time.perf_counter() - t)
+        return latency_summary(timings), ids
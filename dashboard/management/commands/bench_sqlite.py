@@ -0,0 +1,145 @@
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from dashboard.benchmarks import latency_summary
+
+SCHEMA = """
+CREATE TABLE household (id INTEGER PRIMARY KEY, members INTEGER, rooms INTEGER);
+CREATE TABLE bill (id INTEGER PRIMARY KEY, household_id INTEGER, month TEXT, amount REAL, units REAL);
+CREATE INDEX bill_household ON bill (household_id, month);
+CREATE TABLE anomaly (bill_id INTEGER PRIMARY KEY, score REAL);
+"""
+
+
+def connect(path, profile):
+    """A connection configured like Django's for the given profile"""
+    if profile == 'production':
+        conn = sqlite3.connect(path, timeout=20, isolation_level=None, check_same_thread=False)
+        for statement in settings.SQLITE_INIT_COMMAND.split(';'):
+            if statement.strip():
+                conn.execute(statement)
+    else:
+        conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    return conn
+
+
+def seed(path, households, bills_per_household):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.executemany('INSERT INTO household VALUES (?, ?, ?)',
+                     ((i, random.randint(1, 8), random.randint(1, 6)) for i in range(1, households + 1)))
+    conn.executemany('INSERT INTO bill (household_id, month, amount, units) VALUES (?, ?, ?, ?)', (
+        (h, f'2024-{m:02d}-01', random.uniform(500, 5000), random.uniform(50, 600))
+        for h in range(1, households + 1) for m in range(1, bills_per_household + 1)
+    ))
+    conn.commit()
+    conn.close()
+
+
+class Command(BaseCommand):
+    help = ("Compare concurrent read/write throughput of the default and production SQLite profiles "
+            "on a scratch database shaped like the bills tables")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per profile')
+        parser.add_argument('--households', type=int, default=20000)
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        results = {}
+        for profile in ('default', 'production'):
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, 'bench.sqlite3')
+                seed(path, options['households'], 12)
+                results[profile] = self.run(path, profile, options)
+            r = results[profile]
+            self.stdout.write(
+                f"{profile:<10} reads {r['reads_per_s']:>8,.0f}/s (p95 {r['read']['p95_ms']} ms)  "
+                f"writes {r['writes_per_s']:>7,.0f}/s (p95 {r['write']['p95_ms']} ms)  "
+                f"lock errors {r['lock_errors']}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def run(self, path, profile, options):
+        households = options['households']
+        deadline = time.monotonic() + options['duration']
+        read_times, write_times = [], []
+        errors = {'lock': 0}
+        # Production mirrors dashboard.db.serialized_write: one writer at a time per process
+        write_lock = threading.Lock() if profile == 'production' else None
+
+        def reader():
+            conn = connect(path, profile)
+            while time.monotonic() < deadline:
+                household = random.randint(1, households)
+                started = time.perf_counter()
+                try:
+                    conn.execute('SELECT COUNT(*), AVG(units), MAX(month) FROM bill WHERE household_id = ?',
+                                 (household,)).fetchone()
+                    read_times.append(time.perf_counter() - started)
+                except sqlite3.OperationalError:
+                    errors['lock'] += 1
+            conn.close()
+
+        def write(conn, household):
+            # Same shape as a bill save: read history, insert, write the score; IMMEDIATE in production
+            conn.execute('BEGIN IMMEDIATE' if profile == 'production' else 'BEGIN')
+            try:
+                conn.execute('SELECT AVG(units) FROM bill WHERE household_id = ?', (household,)).fetchone()
+                cursor = conn.execute('INSERT INTO bill (household_id, month, amount, units) VALUES (?, ?, ?, ?)',
+                                      (household, '2025-01-01', random.uniform(500, 5000), random.uniform(50, 600)))
+                conn.execute('INSERT INTO anomaly VALUES (?, ?)', (cursor.lastrowid, random.random()))
+                conn.execute('COMMIT')
+            except sqlite3.OperationalError:
+                conn.execute('ROLLBACK')
+                raise
+
+        def writer():
+            conn = connect(path, profile)
+            while time.monotonic() < deadline:
+                household = random.randint(1, households)
+                started = time.perf_counter()
+                try:
+                    if write_lock:
+                        with write_lock:
+                            write(conn, household)
+                    else:
+                        write(conn, household)
+                    write_times.append(time.perf_counter() - started)
+                except sqlite3.OperationalError:
+                    errors['lock'] += 1
+            conn.close()
+
+        threads = ([threading.Thread(target=reader) for _ in range(options['readers'])]
+                   + [threading.Thread(target=writer) for _ in range(options['writers'])])
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        return {
+            'readers': options['readers'],
+            'writers': options['writers'],
+            'seconds': round(elapsed, 2),
+            'reads_per_s': round(len(read_times) / elapsed, 1),
+            'writes_per_s': round(len(write_times) / elapsed, 1),
+            'lock_errors': errors['lock'],
+            'read': latency_summary(read_times),
+            'write': latency_summary(write_times),
+        }
@@ -0,0 +1,100 @@
+import json
+import re
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from dashboard.benchmarks import generate_dataset
+from dashboard.models import User
+
+STATIC_REF = re.compile(r'<(link|script)\b[^>]*?(?:href|src)="(/static/[^"]+)"')
+PAGES = ['/login/', '/appliances/', '/results/', '/admin/']
+
+
+class Command(BaseCommand):
+    help = ("Measure static transfer bytes and modeled first-paint time of the main pages before "
+            "(plain names, uncompressed, revalidated every visit) and after the hashed, precompressed pipeline")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bandwidth-kbps', type=float, default=1600, help='Modeled downlink (Fast 3G)')
+        parser.add_argument('--rtt-ms', type=float, default=150, help='Modeled round-trip time')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with tempfile.TemporaryDirectory() as root, override_settings(
+                DEBUG=False, STATIC_ROOT=root, STORAGES={
+                    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                    'staticfiles': {'BACKEND': 'dashboard.staticfiles.CompressedManifestStaticFilesStorage'},
+                },
+            ):
+                call_command('collectstatic', interactive=False, verbosity=0)
+                result = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for page, r in result['pages'].items():
+            self.stdout.write(
+                f"{page:<14} {len(r['assets'])} assets  bytes {r['before']['bytes']:>8,} -> {r['after']['bytes']:>7,}  "
+                f"first paint (CSS) {r['before']['first_visit_ms']:>6.0f} -> {r['after']['first_visit_ms']:>5.0f} ms, "
+                f"repeat visit {r['before']['repeat_visit_ms']:>4.0f} -> {r['after']['repeat_visit_ms']:>3.0f} ms"
+            )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def run(self, options):
+        generate_dataset(1, months=3)
+        user = User.objects.get()
+        user.is_staff = user.is_superuser = True
+        user.save()
+        client = Client()
+        client.force_login(user)
+        rtt = options['rtt_ms']
+        bytes_per_ms = options['bandwidth_kbps'] * 1000 / 8 / 1000
+
+        pages = {}
+        for page in PAGES:
+            html = client.get(page).content.decode()
+            assets = []
+            for tag, url in dict.fromkeys(STATIC_REF.findall(html)):
+                plain = re.sub(r'\.[0-9a-f]{12}(\.[^./]+)$', r'\1', url)
+                before = self.fetch(client, plain, 'identity')
+                after = self.fetch(client, url, 'br, gzip')
+                assets.append({'url': url, 'blocking': tag == 'link', **{
+                    'before_bytes': before['bytes'], 'after_bytes': after['bytes'],
+                    'encoding': after['encoding'], 'cache_control': after['cache_control'],
+                }})
+            if not assets:
+                raise CommandError(f"{page} references no static files")
+
+            def model(key, revalidate):
+                blocking = [a[key] for a in assets if a['blocking']]
+                return {
+                    'bytes': sum(a[key] for a in assets),
+                    # Stylesheets block first paint: one round trip each (in parallel) plus their bytes
+                    'first_visit_ms': round((rtt if blocking else 0) + sum(blocking) / bytes_per_ms, 1),
+                    # Without immutable caching every stylesheet is revalidated (a 304 round trip) per visit
+                    'repeat_visit_ms': rtt if blocking and revalidate else 0,
+                }
+
+            pages[page] = {'assets': assets, 'before': model('before_bytes', True),
+                           'after': model('after_bytes', False)}
+        return {'network': {'bandwidth_kbps': options['bandwidth_kbps'], 'rtt_ms': rtt}, 'pages': pages}
+
+    @staticmethod
+    def fetch(client, url, accept_encoding):
+        response = client.get(url, HTTP_ACCEPT_ENCODING=accept_encoding)
+        if response.status_code != 200:
+            raise CommandError(f"{url} returned {response.status_code}")
+        return {'bytes': len(b''.join(response.streaming_content)),
+                'encoding': response.get('Content-Encoding', 'identity'),
+                'cache_control': response.get('Cache-Control')}
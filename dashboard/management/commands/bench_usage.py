@@ -0,0 +1,137 @@
+import json
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from dashboard import usage
+from dashboard.benchmarks import generate_dataset, latency_summary
+from dashboard.db import serialized_write
+from dashboard.metrics import QueryTimer
+from dashboard.models import GeminiUsage, User
+
+
+class Command(BaseCommand):
+    help = ("Compare writing Gemini token usage once per message with the in-memory counters and batched "
+            "upserts of dashboard/usage.py, and time the daily quota check, in a throwaway test database")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--messages', type=int, default=20000, help='Answered calls to account')
+        parser.add_argument('--flush-every', type=int, default=2000,
+                            help='Messages between flushes (stands in for USAGE_FLUSH_SECONDS)')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            result = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for name in ('per_message', 'write_behind'):
+            r = result[name]
+            self.stdout.write(
+                f"{name:<13} {r['queries']:>6,} queries  {r['total_s']:>7.3f} s ({r['db_s']:.3f} s in the database)  "
+                f"p50 {r['p50_ms']:.4f} ms  p99 {r['p99_ms']:.4f} ms per message"
+            )
+        q = result['quota_check']
+        self.stdout.write(f"quota check   {q['queries']} queries  p50 {q['p50_ms']:.4f} ms  "
+                          f"(users with 1 to {q['max_days']} days of history)")
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def run(self, options):
+        generate_dataset(options['users'], months=1)
+        user_ids = list(User.objects.values_list('pk', flat=True))
+        rng = np.random.default_rng(7)
+        # Heavy users send most messages, as in practice
+        senders = [user_ids[i] for i in rng.zipf(1.5, options['messages']) % len(user_ids)]
+        metadata = [{'promptTokenCount': int(p), 'candidatesTokenCount': int(c)}
+                    for p, c in zip(rng.integers(150, 900, len(senders)), rng.integers(50, 500, len(senders)))]
+        result = {'users': len(user_ids), 'messages': len(senders)}
+
+        # Step 1: a write per message, adding to the user's row for the day (created by the first)
+        def write(user_id, day, prompt, completion, cost):
+            if not GeminiUsage.objects.filter(user_id=user_id, day=day).update(
+                    requests=F('requests') + 1, prompt_tokens=F('prompt_tokens') + prompt,
+                    completion_tokens=F('completion_tokens') + completion, cost=F('cost') + cost):
+                GeminiUsage.objects.create(user_id=user_id, day=day, requests=1, prompt_tokens=prompt,
+                                           completion_tokens=completion, cost=cost)
+
+        def per_message(user_id, meta):
+            prompt, completion = usage.token_counts(meta)
+            serialized_write(write, user_id, timezone.localdate(), prompt, completion,
+                             usage.token_cost(prompt, completion).quantize(usage.COST_PLACES))
+
+        result['per_message'] = self.measure(senders, metadata, per_message)
+        expected = self.totals()
+        GeminiUsage.objects.all().delete()
+        cache.clear()
+
+        # Step 2: record() into memory, flushed every --flush-every messages
+        counter = iter(range(1, len(senders) + 1))
+
+        def write_behind(user_id, meta):
+            usage.record(user_id, meta)
+            if next(counter) % options['flush_every'] == 0:
+                usage.flush()
+
+        with override_settings(USAGE_FLUSH_SECONDS=10 ** 9, USAGE_FLUSH_MAX_ROWS=10 ** 9):
+            usage.flush()
+            result['write_behind'] = self.measure(senders, metadata, write_behind, finish=usage.flush)
+        if self.totals() != expected:
+            raise CommandError(f"Batched totals {self.totals()} differ from per-message totals {expected}")
+        result['totals'] = expected
+
+        # Step 3: the quota check, for users with one day and with a long history of usage rows
+        max_days = 90
+        today = timezone.localdate()
+        GeminiUsage.objects.bulk_create([
+            GeminiUsage(user_id=user_id, day=today - timedelta(days=d), requests=1, prompt_tokens=100)
+            for user_id in user_ids[:50] for d in range(1, max_days)
+        ])
+        timings = []
+        with override_settings(GEMINI_DAILY_TOKEN_QUOTA=10 ** 9):
+            for user_id in user_ids:
+                usage.over_quota(user_id)  # Seed the counter
+            timer = QueryTimer()
+            with connection.execute_wrapper(timer):
+                for user_id in user_ids:
+                    t = time.perf_counter()
+                    usage.over_quota(user_id)
+                    timings.append(time.perf_counter() - t)
+        result['quota_check'] = {**latency_summary(timings), 'queries': timer.queries, 'max_days': max_days}
+        return result
+
+    @staticmethod
+    def measure(senders, metadata, account, finish=None):
+        timings = []
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            started = time.perf_counter()
+            for user_id, meta in zip(senders, metadata):
+                t = time.perf_counter()
+                account(user_id, meta)
+                timings.append(time.perf_counter() - t)
+            if finish:
+                finish()
+            total = time.perf_counter() - started
+        return {**latency_summary(timings), 'queries': timer.queries, 'db_s': round(timer.seconds, 3),
+                'total_s': round(total, 3)}
+
+    @staticmethod
+    def totals():
+        return {row['user_id']: (row['requests'], row['prompt_tokens'], row['completion_tokens'])
+                for row in GeminiUsage.objects.values('user_id', 'requests', 'prompt_tokens', 'completion_tokens')}
@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.neighbours import NeighbourIndex
+
+
+class Command(BaseCommand):
+    help = "Build the households-like-you index and write it to NEIGHBOUR_INDEX_PATH"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='Snapshot file (.npz), defaults to settings.NEIGHBOUR_INDEX_PATH')
+
+    def handle(self, *args, **options):
+        path = options['path'] or getattr(settings, 'NEIGHBOUR_INDEX_PATH', None)
+        if not path:
+            raise CommandError("Pass --path or set NEIGHBOUR_INDEX_PATH")
+        if not str(path).endswith('.npz'):
+            raise CommandError("The snapshot path must end with .npz")
+
+        started = time.perf_counter()
+        index = NeighbourIndex.build()
+        index.save(path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {len(index)} households in {time.perf_counter() - started:.1f}s -> {path}"
+        ))
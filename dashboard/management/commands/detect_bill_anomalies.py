@@ -0,0 +1,46 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from dashboard.anomalies import detect_anomalies, score_bills
+
+
+class Command(BaseCommand):
+    help = "Score every electricity bill for anomalies and store the flagged ones (run nightly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--synthetic', type=int, metavar='BILLS',
+            help='Only benchmark the vectorized scorer on this many synthetic bills; the database is not touched'
+        )
+
+    def handle(self, *args, **options):
+        if options['synthetic']:
+            self.benchmark(options['synthetic'])
+            return
+
+        summary = detect_anomalies()
+        rate = summary['bills'] / summary['seconds'] if summary['seconds'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {summary['bills']} bills, flagged {summary['flagged']} "
+            f"in {summary['seconds']}s ({rate:,.0f} bills/s)"
+        ))
+
+    def benchmark(self, bills):
+        rng = np.random.default_rng(42)
+        households = max(bills // 12, 1)
+        household_ids = rng.integers(0, households, bills)
+        members = rng.integers(1, 9, households)[household_ids]
+        rooms = rng.integers(1, 7, households)[household_ids]
+        base = rng.gamma(4.0, 60.0, households)[household_ids]
+        kwh = base * rng.lognormal(0, 0.15, bills)
+        appliance_kwh = base * rng.lognormal(0, 0.4, bills)
+
+        started = time.perf_counter()
+        *_, flagged, _ = score_bills(household_ids, members * 1000 + rooms, kwh, appliance_kwh)
+        seconds = time.perf_counter() - started
+        self.stdout.write(
+            f"Scored {bills:,} synthetic bills in {seconds:.2f}s "
+            f"({bills / seconds:,.0f} bills/s), flagged {int(flagged.sum()):,}"
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.forecasting import fit_forecasts
+
+
+class Command(BaseCommand):
+    help = "Fit next-month bill forecasts for every household (run nightly)"
+
+    def handle(self, *args, **options):
+        summary = fit_forecasts()
+        self.stdout.write(self.style.SUCCESS(
+            f"Fitted {summary['households']} households in {summary['seconds']}s"
+            f" ({summary.get('skipped_stale', 0)} skipped: no bill recent enough to forecast from)"
+        ))
@@ -0,0 +1,227 @@
+import json
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.benchmarks import MockGeminiServer, latency_summary
+
+STEPS = ['register', 'household', 'appliances', 'bill', 'results', 'tips', 'chat']
+PASSWORD = 'Load-test-pass-2024'
+APPLIANCES = [('AC', 1500, 6), ('FR', 200, 24), ('TV', 100, 4), ('LT', 60, 6), ('CF', 75, 10)]
+
+
+class StepFailed(Exception):
+    pass
+
+
+class VirtualUser:
+    """
+    One simulated person walking the whole journey with their own session.
+    Form pages are fetched before posting so the CSRF cookie and token come
+    from the server exactly as in a browser.
+    """
+
+    def __init__(self, base_url, name, think_time, timeout, chat, record):
+        self.base_url = base_url.rstrip('/')
+        self.email = f'{name}@loadtest.example.com'
+        self.think_time = think_time
+        self.timeout = timeout
+        self.chat = chat
+        self.record = record
+        self.session = requests.Session()
+
+    def url(self, path):
+        return self.base_url + path
+
+    def get(self, path):
+        return self.session.get(self.url(path), timeout=self.timeout)
+
+    def post_form(self, path, data):
+        token = self.session.cookies.get('csrftoken', '')
+        return self.session.post(self.url(path), data={**data, 'csrfmiddlewaretoken': token},
+                                 headers={'Referer': self.url(path)}, timeout=self.timeout)
+
+    def submit(self, path, data, expect_path):
+        """GET the form (sets the CSRF cookie), POST it and check where the redirects end"""
+        self.get(path).raise_for_status()
+        response = self.post_form(path, data)
+        response.raise_for_status()
+        if not response.url.rstrip('/').endswith(expect_path.rstrip('/')):
+            raise StepFailed(f"{path} ended at {response.url}, expected {expect_path}")
+
+    def think(self):
+        if self.think_time > 0:
+            # Exponential think time, capped so one slow user does not stall a short run
+            time.sleep(min(random.expovariate(1 / self.think_time), 5 * self.think_time))
+
+    def step(self, name, action):
+        """Run and time one step; returns False when it failed and the journey should stop"""
+        started = time.perf_counter()
+        try:
+            action()
+            ok, error = True, None
+        except (requests.RequestException, StepFailed) as e:
+            ok, error = False, f"{type(e).__name__}: {e}"
+        self.record(name, time.perf_counter() - started, ok, error)
+        return ok
+
+    def run(self):
+        steps = [
+            ('register', lambda: self.submit('/register/', {
+                'username': self.email.split('@')[0], 'email': self.email,
+                'password1': PASSWORD, 'password2': PASSWORD,
+            }, '/household/')),
+            ('household', lambda: self.submit('/household/', {
+                'members': random.randint(1, 6), 'rooms': random.randint(1, 5), 'tariff': 'IN-AVG',
+            }, '/appliances/')),
+            ('appliances', self.add_appliances),
+            ('bill', lambda: self.submit('/bill/', {
+                'amount': random.randint(800, 6000), 'month': time.strftime('%Y-%m-01'), 'units_consumed': '',
+            }, '/results/')),
+            ('results', lambda: self.get('/results/').raise_for_status()),
+            ('tips', lambda: self.get('/tips/').raise_for_status()),
+        ]
+        if self.chat:
+            steps.append(('chat', self.ask))
+
+        for i, (name, action) in enumerate(steps):
+            if i:
+                self.think()
+            if not self.step(name, action):
+                return False
+        return True
+
+    def add_appliances(self):
+        self.get('/appliances/').raise_for_status()
+        chosen = random.sample(APPLIANCES, random.randint(2, len(APPLIANCES)))
+        for code, wattage, hours in chosen:
+            response = self.post_form('/appliances/', {
+                'appliance_type': code, 'wattage': wattage, 'hours_used': hours, 'custom_name': '',
+            })
+            response.raise_for_status()
+        # The page answers 200 whether or not the form was valid, so check what was saved
+        response = self.get('/api/appliances/')
+        response.raise_for_status()
+        saved = len(response.json()['results'])
+        if saved != len(chosen):
+            raise StepFailed(f"{saved} of {len(chosen)} appliances were saved")
+
+    def ask(self):
+        response = self.session.post(self.url('/gemini_chat/'), json={
+            'message': 'How can I reduce my AC bill?',
+            'household_data': {'rooms': 3, 'members': 4, 'appliances': []},
+        }, headers={'X-CSRFToken': self.session.cookies.get('csrftoken', ''), 'Referer': self.url('/tips/')},
+            timeout=self.timeout)
+        response.raise_for_status()
+        if 'response' not in response.json():
+            raise StepFailed("chat answered without a response")
+
+
+class Command(BaseCommand):
+    help = ("Drive concurrent virtual users through register -> household -> appliances -> bill -> "
+            "results -> tips/chat against a running server and report per-step latency")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--users', type=int, default=20, help='Concurrent virtual users')
+        parser.add_argument('--duration', type=float, default=60, help='Seconds to keep starting journeys')
+        parser.add_argument('--ramp-up', type=float, default=5, help='Seconds over which users start')
+        parser.add_argument('--think-time', type=float, default=1.0, help='Mean seconds between steps')
+        parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds')
+        parser.add_argument('--no-chat', action='store_true', help='Skip the Gemini chat step')
+        parser.add_argument('--mock-upstream-port', type=int,
+                            help='Serve a mock Gemini endpoint on this port for the duration of the run '
+                                 '(start the server with GEMINI_API_URL pointing at it)')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        try:
+            requests.get(options['base_url'] + '/login/', timeout=options['timeout']).raise_for_status()
+        except requests.RequestException as e:
+            raise CommandError(f"Server not reachable at {options['base_url']}: {e}")
+
+        samples = {step: [] for step in STEPS}
+        errors = {step: [] for step in STEPS}
+        journeys = {'completed': 0, 'failed': 0}
+        lock = threading.Lock()
+
+        def record(step, seconds, ok, error):
+            with lock:
+                samples[step].append(seconds)
+                if not ok:
+                    errors[step].append(error)
+
+        run_id = uuid.uuid4().hex[:8]
+        deadline = time.monotonic() + options['ramp_up'] + options['duration']
+
+        def user_loop(index):
+            time.sleep(options['ramp_up'] * index / max(options['users'], 1))
+            journey = 0
+            while time.monotonic() < deadline:
+                user = VirtualUser(options['base_url'], f'lt-{run_id}-{index}-{journey}', options['think_time'],
+                                   options['timeout'], not options['no_chat'], record)
+                ok = user.run()
+                with lock:
+                    journeys['completed' if ok else 'failed'] += 1
+                journey += 1
+
+        upstream = MockGeminiServer(port=options['mock_upstream_port']) if options['mock_upstream_port'] else None
+        if upstream:
+            upstream.__enter__()
+            self.stdout.write(f"Mock Gemini upstream at {upstream.url}")
+        started = time.monotonic()
+        try:
+            with ThreadPoolExecutor(max_workers=options['users']) as pool:
+                list(pool.map(user_loop, range(options['users'])))
+        finally:
+            if upstream:
+                upstream.__exit__(None, None, None)
+        elapsed = time.monotonic() - started
+
+        result = self.report(samples, errors, journeys, elapsed, options)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def report(self, samples, errors, journeys, elapsed, options):
+        steps = {}
+        for step in STEPS:
+            if not samples[step]:
+                continue
+            stats = latency_summary(samples[step])
+            stats['errors'] = len(errors[step])
+            stats['error_rate'] = round(len(errors[step]) / len(samples[step]), 4)
+            stats['per_s'] = round(len(samples[step]) / elapsed, 2)
+            if errors[step]:
+                stats['first_error'] = errors[step][0]
+            steps[step] = stats
+            self.stdout.write(
+                f"{step:<11} n={stats['n']:<6} err={stats['error_rate']:>6.1%}  p50 {stats['p50_ms']:>8.1f} ms  "
+                f"p95 {stats['p95_ms']:>8.1f} ms  p99 {stats['p99_ms']:>8.1f} ms"
+            )
+
+        requests_total = sum(len(s) for s in samples.values())
+        errors_total = sum(len(e) for e in errors.values())
+        total_journeys = journeys['completed'] + journeys['failed']
+        summary = {
+            'users': options['users'],
+            'duration_s': round(elapsed, 1),
+            'think_time_s': options['think_time'],
+            'journeys_completed': journeys['completed'],
+            'journeys_failed': journeys['failed'],
+            'journeys_per_s': round(journeys['completed'] / elapsed, 2),
+            'steps_per_s': round(requests_total / elapsed, 2),
+            'error_rate': round(errors_total / requests_total, 4) if requests_total else 0,
+        }
+        self.stdout.write(self.style.SUCCESS(
+            f"{journeys['completed']}/{total_journeys} journeys completed in {elapsed:.1f}s "
+            f"({summary['journeys_per_s']} journeys/s, {summary['steps_per_s']} steps/s, "
+            f"{summary['error_rate']:.1%} step errors)"
+        ))
+        return {'summary': summary, 'steps': steps}
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from dashboard import search
+from dashboard.db import serialized_write
+
+
+class Command(BaseCommand):
+    help = ("Drop and recreate the FTS5 search index (tables, sync triggers and contents) "
+            "for users and appliances")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if not search.fts5_supported(connection):
+            raise CommandError("This database has no FTS5 trigram support; admin search keeps using LIKE")
+
+        started = time.perf_counter()
+        serialized_write(search.install, connection, using=options['database'])
+        with connection.cursor() as cursor:
+            counts = {}
+            for name in search.INDEXES:
+                cursor.execute(f"SELECT COUNT(*) FROM {search.index_table(name)}")
+                counts[name] = cursor.fetchone()[0]
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {counts['users']:,} users and {counts['appliances']:,} appliances "
+            f"in {time.perf_counter() - started:.2f}s"
+        ))
@@ -0,0 +1,134 @@
+import hashlib
+import inspect
+import json
+import multiprocessing
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Max, Min
+
+from dashboard.models import Appliance, ConsumptionRating, ElectricityBill, Household
+from dashboard.tariffs import DEFAULT_TARIFF, tariff_definitions
+from dashboard.utils import REAL_WORLD_USAGE_FACTOR, calculate_consumption
+
+CHUNK_SIZE = 2000
+
+
+def ratings_fingerprint():
+    """
+    Digest of everything a rating depends on besides the household's own rows:
+    the tariffs, the default tariff, the usage factor and the rating code itself.
+    A checkpoint from a run with a different fingerprint is not resumed.
+    """
+    inputs = {
+        'tariffs': tariff_definitions(),
+        'default_tariff': getattr(settings, 'DEFAULT_TARIFF', DEFAULT_TARIFF),
+        'usage_factor': REAL_WORLD_USAGE_FACTOR,
+        'code': inspect.getsource(calculate_consumption),
+    }
+    return hashlib.blake2b(json.dumps(inputs, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+
+def recompute_shard(bounds):
+    """
+    Recompute ratings for households with lo <= id < hi and write them in bulk.
+    Runs in a worker process; returns (lo, households processed).
+    """
+    lo, hi = bounds
+
+    # Stream the shard's appliances and latest bills, grouped by household
+    appliances = {}
+    for app in Appliance.objects.filter(household_id__gte=lo, household_id__lt=hi).iterator(chunk_size=CHUNK_SIZE):
+        appliances.setdefault(app.household_id, []).append(app)
+    bills = {}
+    for bill in (ElectricityBill.objects.filter(household_id__gte=lo, household_id__lt=hi)
+                 .order_by('household_id', '-month').iterator(chunk_size=CHUNK_SIZE)):
+        bills.setdefault(bill.household_id, bill)
+
+    ratings = []
+    for household in Household.objects.filter(id__gte=lo, id__lt=hi).iterator(chunk_size=CHUNK_SIZE):
+        data = calculate_consumption(household, appliances.get(household.id, []), bills.get(household.id))
+        ratings.append(ConsumptionRating(
+            household_id=household.id,
+            total_kwh=data['total_kwh'],
+            per_person=data['per_person'],
+            rating=data['rating'],
+            consumption_source=data['consumption_source'],
+            appliance_based_kwh=data['appliance_based_kwh'],
+            bill_based_kwh=data['bill_based_kwh'],
+        ))
+
+    ConsumptionRating.objects.bulk_create(
+        ratings, batch_size=500, update_conflicts=True, unique_fields=['household'],
+        update_fields=['total_kwh', 'per_person', 'rating', 'consumption_source',
+                       'appliance_based_kwh', 'bill_based_kwh', 'computed_at'],
+    )
+    return lo, len(ratings)
+
+
+class Command(BaseCommand):
+    help = "Recompute every household's consumption rating in parallel, id-range shards, resumable"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--shard-size', type=int, default=10000, help='Household ids per shard')
+        parser.add_argument('--checkpoint', default='recompute_ratings.checkpoint.json',
+                            help='File recording completed shards so an interrupted run can resume')
+        parser.add_argument('--restart', action='store_true', help='Ignore any existing checkpoint')
+
+    def handle(self, *args, **options):
+        bounds = Household.objects.aggregate(lo=Min('id'), hi=Max('id'))
+        if bounds['lo'] is None:
+            self.stdout.write("No households to recompute.")
+            return
+        shard_size = options['shard_size']
+        shards = [(lo, lo + shard_size) for lo in range(bounds['lo'], bounds['hi'] + 1, shard_size)]
+
+        checkpoint_path = options['checkpoint']
+        fingerprint = ratings_fingerprint()
+        completed = set()
+        if os.path.exists(checkpoint_path) and not options['restart']:
+            with open(checkpoint_path) as f:
+                checkpoint = json.load(f)
+            if checkpoint.get('fingerprint') != fingerprint:
+                self.stdout.write("Checkpoint was written before a tariff or rating change; starting over")
+            elif checkpoint.get('shard_size') != shard_size:
+                self.stdout.write("Checkpoint used a different shard size; starting over")
+            else:
+                completed = set(checkpoint['completed'])
+                self.stdout.write(f"Resuming: {len(completed)} of {len(shards)} shards already done")
+        pending = [shard for shard in shards if shard[0] not in completed]
+
+        # Forked workers must not share the parent's database connection
+        connections.close_all()
+        started = time.monotonic()
+        processed = 0
+        with multiprocessing.get_context('fork').Pool(options['workers']) as pool:
+            for lo, count in pool.imap_unordered(recompute_shard, pending):
+                processed += count
+                completed.add(lo)
+                self._save_checkpoint(checkpoint_path, fingerprint, shard_size, completed)
+
+                elapsed = time.monotonic() - started
+                done = len(completed) - (len(shards) - len(pending))
+                rate = processed / elapsed if elapsed else 0
+                eta = elapsed / done * (len(pending) - done) if done else 0
+                self.stdout.write(
+                    f"[{len(completed)}/{len(shards)} shards] {processed} households, "
+                    f"{rate:,.0f}/s, ETA {eta:,.0f}s"
+                )
+
+        os.remove(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomputed {processed} households in {time.monotonic() - started:.1f}s"
+        ))
+
+    def _save_checkpoint(self, path, fingerprint, shard_size, completed):
+        """Write the checkpoint atomically so a crash never leaves a torn file"""
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'fingerprint': fingerprint, 'shard_size': shard_size, 'completed': sorted(completed)}, f)
+        os.replace(tmp, path)
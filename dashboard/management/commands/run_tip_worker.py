@@ -0,0 +1,57 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from dashboard import usage
+from dashboard.jobs import claim_jobs, requeue_stale, run_job
+from dashboard.models import TipJob
+
+
+def run_in_thread(job):
+    """Run one job on a pool thread, which has its own database connection"""
+    try:
+        return run_job(job)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = "Process queued AI tip jobs with a bounded pool of concurrent Gemini calls"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Gemini calls in flight at once')
+        parser.add_argument('--poll', type=float, default=5.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once no jobs are due')
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        counts = {TipJob.DONE: 0, TipJob.PENDING: 0, TipJob.FAILED: 0}
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while True:
+                close_old_connections()
+                requeued = requeue_stale()
+                if requeued:
+                    self.stdout.write(f"Requeued {requeued} stale jobs")
+
+                # Claim no more than the pool can run, so jobs are not held while waiting
+                jobs = claim_jobs(concurrency)
+                if not jobs:
+                    usage.flush()  # Write token counts while idle rather than at the next call
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+
+                for status in pool.map(run_in_thread, jobs):
+                    counts[status] += 1
+                self.stdout.write(
+                    f"Tips: {counts[TipJob.DONE]} done, {counts[TipJob.PENDING]} retrying, "
+                    f"{counts[TipJob.FAILED]} failed"
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {sum(counts.values())} jobs: {counts[TipJob.DONE]} done, "
+            f"{counts[TipJob.PENDING]} retrying, {counts[TipJob.FAILED]} failed"
+        ))
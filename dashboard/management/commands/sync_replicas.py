@@ -0,0 +1,44 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from dashboard.routers import replica_aliases
+
+
+class Command(BaseCommand):
+    help = ("Copy the primary SQLite database into every replica file (a local stand-in for replication); "
+            "use --interval to keep them refreshed")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Repeat every this many seconds until interrupted')
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        if 'sqlite3' not in primary['ENGINE']:
+            raise CommandError("sync_replicas only copies SQLite databases; use the database's own replication")
+        aliases = replica_aliases()
+        if not aliases:
+            raise CommandError("No replicas configured (set SQLITE_REPLICAS)")
+
+        while True:
+            started = time.perf_counter()
+            source = sqlite3.connect(primary['NAME'])
+            try:
+                for alias in aliases:
+                    target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+                    try:
+                        # Online backup: a consistent snapshot even while the primary takes writes
+                        source.backup(target)
+                    finally:
+                        target.close()
+            finally:
+                source.close()
+            self.stdout.write(self.style.SUCCESS(
+                f"Synced {len(aliases)} replicas in {time.perf_counter() - started:.2f}s"
+            ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
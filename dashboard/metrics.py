@@ -0,0 +1,220 @@
+"""
+In-process metrics with a Prometheus text endpoint.
+
+Each thread records into its own shard (plain dicts, no lock on the hot path);
+a scrape of /metrics merges the shards. Recorded per request by
+MetricsMiddleware:
+- request latency histogram per view, method and status
+- database query count and time per view
+and by GeminiAPI for every outbound call:
+- upstream latency histogram per endpoint and status
+Series are per process, so each worker exposes its own totals.
+
+Queries are counted by an execute wrapper installed on every connection,
+which reports to the timer of the request in the current context; async
+views run their queries on other threads, and sync_to_async carries the
+context over.
+"""
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+# Upper bounds in seconds; the implicit last bucket is +Inf
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+METRICS = {
+    'enersave_request_duration_seconds': ('histogram', 'Request latency by view', LATENCY_BUCKETS),
+    'enersave_request_db_queries': ('histogram', 'Database queries per request by view', QUERY_BUCKETS),
+    'enersave_request_db_duration_seconds': ('histogram', 'Database time per request by view', LATENCY_BUCKETS),
+    'enersave_gemini_request_duration_seconds': ('histogram', 'Gemini API call latency by endpoint and status',
+                                                 LATENCY_BUCKETS),
+}
+
+
+class _Shard:
+    """One thread's histograms: {(metric, labels): [bucket counts..., +Inf count, sum]}"""
+
+    def __init__(self):
+        self.series = {}
+
+
+_local = threading.local()
+_shards = []
+_shards_lock = threading.Lock()
+
+
+def _shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = _local.shard = _Shard()
+        with _shards_lock:  # Once per thread
+            _shards.append(shard)
+    return shard
+
+
+def observe(metric, value, **labels):
+    """Record one observation of a histogram metric in the calling thread's shard"""
+    buckets = METRICS[metric][2]
+    key = (metric, tuple(sorted((name, str(value)) for name, value in labels.items())))
+    series = _shard().series.get(key)
+    if series is None:
+        series = _shard().series[key] = [0] * (len(buckets) + 2)
+    series[bisect_left(buckets, value)] += 1
+    series[-1] += value
+
+
+def snapshot():
+    """Merged {(metric, labels): [bucket counts..., +Inf count, sum]} over all threads"""
+    with _shards_lock:
+        shards = list(_shards)
+    merged = {}
+    for shard in shards:
+        for key, series in list(shard.series.items()):
+            total = merged.get(key)
+            if total is None:
+                merged[key] = list(series)
+            else:
+                for i, value in enumerate(series):
+                    total[i] += value
+    return merged
+
+
+def reset():
+    with _shards_lock:
+        for shard in _shards:
+            shard.series = {}
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format"""
+    merged = snapshot()
+    lines = []
+    for metric, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} {kind}')
+        for (name, labels), series in sorted(merged.items()):
+            if name != metric:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                lines.append(f'{metric}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{metric}_sum{_format_labels(labels)} {series[-1]:.6f}')
+            lines.append(f'{metric}_count{_format_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+class QueryTimer:
+    """Database execute wrapper counting queries and summing their time"""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.seconds += time.perf_counter() - started
+
+
+# The QueryTimer of the request being handled in this context, if any
+_request_timer = ContextVar('request_query_timer', default=None)
+
+
+def _time_request_query(execute, sql, params, many, context):
+    timer = _request_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def install_query_timer(sender=None, connection=None, **kwargs):
+    """Route a connection's queries to the current request's timer (connection_created receiver)"""
+    if _time_request_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_request_query)
+
+
+connection_created.connect(install_query_timer, dispatch_uid='dashboard.metrics.install_query_timer')
+
+
+class MetricsMiddleware:
+    """Times every request and the database queries it runs"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        for conn in connections.all():  # Opened before this module was imported
+            install_query_timer(connection=conn)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = QueryTimer()
+        token = _request_timer.set(timer)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_timer.reset(token)
+        self.record(request, response, timer, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        token = _request_timer.set(timer)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_timer.reset(token)
+        self.record(request, response, timer, time.perf_counter() - started)
+        return response
+
+    @staticmethod
+    def record(request, response, timer, elapsed):
+        # Label by route name, not path, so ids in URLs do not explode the series count
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match._func_path) if match else 'unmatched'
+        observe('enersave_request_duration_seconds', elapsed,
+                view=view, method=request.method, status=response.status_code)
+        observe('enersave_request_db_queries', timer.queries, view=view)
+        observe('enersave_request_db_duration_seconds', timer.seconds, view=view)
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. When METRICS_TOKEN is set the scraper must send
+    it as a bearer token; without one only staff users (or anyone under DEBUG)
+    can read it, as it exposes per-view traffic, latency and upstream errors.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        allowed = hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    else:
+        allowed = settings.DEBUG or request.user.is_staff
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_alter_user_managers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='household',
+            name='tariff',
+            field=models.CharField(default='IN-AVG', max_length=20),
+        ),
+    ]
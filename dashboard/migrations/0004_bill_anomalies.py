@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_household_tariff'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillAnomaly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('history_score', models.FloatField(blank=True, null=True)),
+                ('cohort_score', models.FloatField(blank=True, null=True)),
+                ('gap_score', models.FloatField(blank=True, null=True)),
+                ('flags', models.CharField(max_length=100)),
+                ('scored_at', models.DateTimeField(auto_now=True)),
+                ('bill', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='anomaly', to='dashboard.electricitybill')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CohortBaseline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('members', models.PositiveIntegerField()),
+                ('rooms', models.PositiveIntegerField()),
+                ('median_kwh', models.FloatField()),
+                ('mad_kwh', models.FloatField()),
+                ('bills', models.PositiveIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('members', 'rooms'), name='unique_cohort_baseline')],
+            },
+        ),
+    ]
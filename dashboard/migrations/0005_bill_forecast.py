@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_bill_anomalies'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('kwh', models.FloatField()),
+                ('kwh_lower', models.FloatField()),
+                ('kwh_upper', models.FloatField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('method', models.CharField(max_length=20)),
+                ('fitted_at', models.DateTimeField(auto_now=True)),
+                ('household', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='forecast', to='dashboard.household')),
+            ],
+        ),
+    ]
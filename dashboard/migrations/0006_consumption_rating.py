@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0005_bill_forecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsumptionRating',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_kwh', models.FloatField()),
+                ('per_person', models.FloatField()),
+                ('rating', models.CharField(max_length=10)),
+                ('consumption_source', models.CharField(max_length=30)),
+                ('appliance_based_kwh', models.FloatField()),
+                ('bill_based_kwh', models.FloatField(blank=True, null=True)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('household', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rating', to='dashboard.household')),
+            ],
+        ),
+    ]
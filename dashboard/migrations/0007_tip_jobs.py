@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0006_consumption_rating'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HouseholdTip',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField()),
+                ('input_hash', models.CharField(max_length=64)),
+                ('generated_at', models.DateTimeField(auto_now=True)),
+                ('household', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='tip', to='dashboard.household')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TipJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('input_hash', models.CharField(max_length=64)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('run_after', models.DateTimeField()),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('household', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tip_jobs', to='dashboard.household')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after'], name='tipjob_status_run_after')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('household',), name='unique_open_tip_job')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0007_tip_jobs'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appliance',
+            index=models.Index(fields=['appliance_type', 'id'], name='appliance_type_id'),
+        ),
+        migrations.AddIndex(
+            model_name='electricitybill',
+            index=models.Index(fields=['month', 'id'], name='bill_month_id'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def install_index(apps, schema_editor):
+    from dashboard import search
+    search.install(schema_editor.connection)
+
+
+def uninstall_index(apps, schema_editor):
+    from dashboard import search
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0008_admin_changelist_indexes'),
+    ]
+
+    operations = [
+        # FTS5 tables and sync triggers; skipped on databases without FTS5 (see dashboard/search.py)
+        migrations.RunPython(install_index, uninstall_index),
+    ]
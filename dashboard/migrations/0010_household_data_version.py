@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:16
+
+import uuid
+from django.db import migrations, models
+
+
+def drop_search_triggers(apps, schema_editor):
+    from dashboard import search
+    search.drop_triggers(schema_editor.connection)
+
+
+def create_search_triggers(apps, schema_editor):
+    from dashboard import search
+    search.create_triggers(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0009_search_index'),
+    ]
+
+    operations = [
+        # SQLite adds the column by rebuilding the table, which the search triggers would block
+        migrations.RunPython(drop_search_triggers, create_search_triggers),
+        migrations.AddField(
+            model_name='household',
+            name='data_version',
+            field=models.UUIDField(default=uuid.uuid4, editable=False),
+        ),
+        migrations.RunPython(create_search_triggers, drop_search_triggers),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0010_household_data_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeminiUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('requests', models.PositiveIntegerField(default=0)),
+                ('prompt_tokens', models.PositiveBigIntegerField(default=0)),
+                ('completion_tokens', models.PositiveBigIntegerField(default=0)),
+                ('cost', models.DecimalField(decimal_places=6, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gemini_usage', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Gemini usage',
+                'indexes': [models.Index(fields=['day'], name='gemini_usage_day')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'day'), name='unique_gemini_usage_day')],
+            },
+        ),
+    ]
@@ -1,7 +1,10 @@
 # Check and fix the models if necessary
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser,BaseUserManager
 from django.utils.translation import gettext_lazy as _
+from .tariffs import DEFAULT_TARIFF
 
 class UserManager(BaseUserManager):
     """Custom user manager where email is the unique identifier"""
@@ -44,7 +47,10 @@ class Household(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     members = models.PositiveIntegerField()
     rooms = models.PositiveIntegerField()
+    tariff = models.CharField(max_length=20, default=DEFAULT_TARIFF)  # Tariff code from tariffs.py
     created_at = models.DateTimeField(auto_now_add=True)
+    # Replaced whenever the household, its appliances or bills change; the API's ETags are built from it
+    data_version = models.UUIDField(default=uuid.uuid4, editable=False)
     
     def __str__(self):
         return f"{self.user.email}'s household"
@@ -67,6 +73,11 @@ class Appliance(models.Model):
     wattage = models.PositiveIntegerField()
     hours_used = models.PositiveIntegerField()
     custom_name = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['appliance_type', 'id'], name='appliance_type_id'),  # Admin changelist order
+        ]
     
     def __str__(self):
         display_name = self.custom_name if self.custom_name else self.get_appliance_type_display()
@@ -77,6 +88,145 @@ class ElectricityBill(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     month = models.DateField()
     units_consumed = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['month', 'id'], name='bill_month_id'),  # Admin changelist order
+        ]
     
     def __str__(self):
-        return f"Bill for {self.household.user.email} - {self.month.strftime('%B %Y')}"
\ No newline at end of file
+        return f"Bill for {self.household.user.email} - {self.month.strftime('%B %Y')}"
+
+class BillAnomaly(models.Model):
+    """A bill flagged by anomalies.py; bills that look normal have no row"""
+    bill = models.OneToOneField(ElectricityBill, on_delete=models.CASCADE, related_name='anomaly')
+    history_score = models.FloatField(null=True, blank=True)  # Robust z against the household's own bills
+    cohort_score = models.FloatField(null=True, blank=True)   # Robust z against same members/rooms
+    gap_score = models.FloatField(null=True, blank=True)      # log2(appliance kWh / bill kWh)
+    flags = models.CharField(max_length=100)
+    scored_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.bill} - {self.flags}"
+
+class CohortBaseline(models.Model):
+    """Median and MAD of bill kWh for households with the same members and rooms"""
+    members = models.PositiveIntegerField()
+    rooms = models.PositiveIntegerField()
+    median_kwh = models.FloatField()
+    mad_kwh = models.FloatField()
+    bills = models.PositiveIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['members', 'rooms'], name='unique_cohort_baseline'),
+        ]
+
+    def __str__(self):
+        return f"{self.members} members, {self.rooms} rooms"
+
+class BillForecast(models.Model):
+    """Next month's expected consumption and bill, refitted nightly by forecasting.py"""
+    household = models.OneToOneField(Household, on_delete=models.CASCADE, related_name='forecast')
+    month = models.DateField()  # First day of the forecast month
+    kwh = models.FloatField()
+    kwh_lower = models.FloatField()  # 95% interval
+    kwh_upper = models.FloatField()
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    method = models.CharField(max_length=20)
+    fitted_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Forecast for {self.household.user.email} - {self.month.strftime('%B %Y')}"
+
+class ConsumptionRating(models.Model):
+    """
+    Stored calculate_consumption output for admin reporting, refreshed in bulk by
+    `manage.py recompute_ratings`; pages compute ratings live.
+    """
+    household = models.OneToOneField(Household, on_delete=models.CASCADE, related_name='rating')
+    total_kwh = models.FloatField()
+    per_person = models.FloatField()
+    rating = models.CharField(max_length=10)
+    consumption_source = models.CharField(max_length=30)
+    appliance_based_kwh = models.FloatField()
+    bill_based_kwh = models.FloatField(null=True, blank=True)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.household} - {self.rating}"
+
+class TipJob(models.Model):
+    """A queued request to precompute a household's AI tips, processed by `manage.py run_tip_worker`"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    household = models.ForeignKey(Household, on_delete=models.CASCADE, related_name='tip_jobs')
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    input_hash = models.CharField(max_length=64)  # Hash of the household data the tips are for
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField()  # Not picked up before this time (retry backoff)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='tipjob_status_run_after'),
+        ]
+        constraints = [
+            # At most one queued or running job per household; new changes coalesce into it
+            models.UniqueConstraint(
+                fields=['household'], condition=models.Q(status__in=['pending', 'running']),
+                name='unique_open_tip_job',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Tips for {self.household} - {self.status}"
+
+class HouseholdTip(models.Model):
+    """The latest AI-generated tips for a household, read by the tips and results pages"""
+    household = models.OneToOneField(Household, on_delete=models.CASCADE, related_name='tip')
+    text = models.TextField()
+    input_hash = models.CharField(max_length=64)
+    generated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Tips for {self.household}"
+
+class GeminiUsage(models.Model):
+    """A user's Gemini calls, tokens and cost for one day, upserted in batches by usage.py"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='gemini_usage')
+    day = models.DateField()
+    requests = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.PositiveBigIntegerField(default=0)
+    completion_tokens = models.PositiveBigIntegerField(default=0)  # Candidates plus thinking tokens
+    cost = models.DecimalField(max_digits=14, decimal_places=6, default=0)  # USD at the GEMINI_*_PRICE settings
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Gemini usage'
+        indexes = [
+            models.Index(fields=['day'], name='gemini_usage_day'),  # Top-consumers report over a date range
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='unique_gemini_usage_day'),
+        ]
+
+    @property
+    def total_tokens(self):
+        return self.prompt_tokens + self.completion_tokens
+
+    def __str__(self):
+        return f"Gemini usage for {self.user.email} - {self.day}"
@@ -0,0 +1,276 @@
+"""
+"Households like you" comparison.
+
+Every household with a bill becomes a feature vector (members, rooms and daily
+kWh per appliance type). The vectors are standardized and stored in a
+NumPy-backed KD-tree that answers k-nearest-neighbour queries by best-first
+search over node bounding boxes. The process-wide index is rebuilt in the
+background when it is older than NEIGHBOUR_INDEX_TTL seconds, or loaded from
+the snapshot written by `manage.py build_neighbour_index`.
+"""
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Sum, Window
+from django.db.models.functions import RowNumber
+
+from .models import Appliance, ElectricityBill
+from .tariffs import stored_tariff
+
+logger = logging.getLogger(__name__)
+
+APPLIANCE_TYPES = [code for code, _ in Appliance.HOUSEHOLD_APPLIANCES]
+FEATURES = ['members', 'rooms'] + [f'{code.lower()}_kwh' for code in APPLIANCE_TYPES]
+LEAF_SIZE = 256
+DEFAULT_K = 50
+DEFAULT_TTL = 3600
+REBUILD_RETRY_SECONDS = 300
+
+
+def household_features(members, rooms, appliances):
+    """Feature vector for one household from its appliance rows"""
+    vector = np.zeros(len(FEATURES))
+    vector[0] = members
+    vector[1] = rooms
+    for app in appliances:
+        vector[2 + APPLIANCE_TYPES.index(app.appliance_type)] += app.wattage * app.hours_used / 1000
+    return vector
+
+
+class KDTree:
+    """
+    Static KD-tree over an (n, d) array. Only the leaves are kept: points are
+    stored leaf by leaf in one contiguous array, each leaf with its bounding box.
+    """
+
+    def __init__(self, points, leaf_size=LEAF_SIZE):
+        points = np.asarray(points, dtype=np.float64)
+        n, d = points.shape
+        order = np.arange(n)
+        starts, ends, lows, highs = [], [], [], []
+
+        # Iterative build: each node owns order[start:end] and splits on its widest dimension
+        stack = [(0, n)]
+        while stack:
+            start, end = stack.pop()
+            block = points[order[start:end]]
+            low = block.min(axis=0) if end > start else np.zeros(d)
+            high = block.max(axis=0) if end > start else np.zeros(d)
+            spread = high - low
+            if end - start <= leaf_size or spread.max() == 0:
+                starts.append(start)
+                ends.append(end)
+                lows.append(low)
+                highs.append(high)
+                continue
+            dim = int(spread.argmax())
+            mid = (end - start) // 2
+            order[start:end] = order[start:end][np.argpartition(block[:, dim], mid)]
+            stack.append((start + mid, end))
+            stack.append((start, start + mid))
+
+        self.order = order
+        self.points = np.ascontiguousarray(points[order])
+        self.leaf_starts = np.array(starts)
+        self.leaf_ends = np.array(ends)
+        self.leaf_lows = np.array(lows)
+        self.leaf_highs = np.array(highs)
+
+    def query(self, x, k, batch=16):
+        """
+        Indices (into points) and squared distances of the k nearest points.
+
+        Rather than walking the tree node by node in Python, the distance from x
+        to every leaf's bounding box is computed in one pass; leaves are then
+        scanned nearest-box first, a batch at a time, until the next box is
+        farther away than the current k-th neighbour.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        k = min(k, len(self.points))
+        gap = np.maximum(self.leaf_lows - x, 0) + np.maximum(x - self.leaf_highs, 0)
+        bounds = np.einsum('ij,ij->i', gap, gap)
+        leaf_order = np.argsort(bounds)
+
+        best_idx = np.empty(0, dtype=np.int64)
+        best_dist = np.empty(0)
+        worst = np.inf
+        for first in range(0, len(leaf_order), batch):
+            if len(best_dist) == k and bounds[leaf_order[first]] > worst:
+                break
+            chosen = leaf_order[first:first + batch]
+            positions = np.concatenate([np.arange(self.leaf_starts[leaf], self.leaf_ends[leaf]) for leaf in chosen])
+            diff = self.points[positions] - x
+            best_idx = np.concatenate((best_idx, self.order[positions]))
+            best_dist = np.concatenate((best_dist, np.einsum('ij,ij->i', diff, diff)))
+            if len(best_dist) > k:
+                keep = np.argpartition(best_dist, k - 1)[:k]
+                best_idx, best_dist = best_idx[keep], best_dist[keep]
+            if len(best_dist) == k:
+                worst = best_dist.max()
+
+        order = np.argsort(best_dist)
+        return best_idx[order], best_dist[order]
+
+
+class NeighbourIndex:
+    """Household ids, standardized features and monthly kWh behind a KD-tree"""
+
+    def __init__(self, household_ids, features, kwh):
+        self.household_ids = np.asarray(household_ids, dtype=np.int64)
+        self.features = np.asarray(features, dtype=np.float64)
+        self.kwh = np.asarray(kwh, dtype=np.float64)
+        scale = self.features.std(axis=0) if len(self.features) else np.ones(len(FEATURES))
+        self.scale = np.where(scale > 0, scale, 1.0)
+        self.tree = KDTree(self.features / self.scale) if len(self.features) else None
+        self.built_at = time.time()
+
+    def __len__(self):
+        return len(self.household_ids)
+
+    @classmethod
+    def build(cls):
+        """Build the index from every household that has at least one bill"""
+        # Only each household's latest bill, picked in SQL, with its household columns
+        latest = (ElectricityBill.objects
+                  .annotate(rank=Window(RowNumber(), partition_by=F('household_id'),
+                                        order_by=[F('month').desc(), F('id').desc()]))
+                  .filter(rank=1)
+                  .order_by('household_id')
+                  .values_list('household_id', 'household__members', 'household__rooms',
+                               'units_consumed', 'amount', 'household__tariff'))
+        ids, members, rooms, kwh, amounts, tariffs = [], [], [], [], [], []
+        for household_id, m, r, units, amount, tariff in latest.iterator(chunk_size=10000):
+            ids.append(household_id)
+            members.append(m)
+            rooms.append(r)
+            kwh.append(np.nan if units is None else float(units))
+            amounts.append(float(amount))
+            tariffs.append(tariff)
+        if not ids:
+            return cls([], np.empty((0, len(FEATURES))), [])
+
+        ids = np.array(ids, dtype=np.int64)
+        kwh = np.array(kwh)
+        amounts = np.array(amounts)
+        tariffs = np.array(tariffs)
+        for code in set(tariffs[np.isnan(kwh)].tolist()):
+            mask = np.isnan(kwh) & (tariffs == code)
+            kwh[mask] = stored_tariff(code).amount_to_kwh(amounts[mask])
+
+        features = np.zeros((len(ids), len(FEATURES)))
+        features[:, 0] = members
+        features[:, 1] = rooms
+        position = {household_id: i for i, household_id in enumerate(ids.tolist())}
+        type_column = {code: 2 + i for i, code in enumerate(APPLIANCE_TYPES)}
+        usage = (Appliance.objects.values('household_id', 'appliance_type')
+                 .annotate(wh=Sum(F('wattage') * F('hours_used'))))
+        for row in usage.iterator(chunk_size=10000):
+            i = position.get(row['household_id'])
+            if i is not None:
+                features[i, type_column[row['appliance_type']]] = row['wh'] / 1000
+
+        return cls(ids, features, kwh)
+
+    def save(self, path):
+        np.savez(path, household_ids=self.household_ids, features=self.features, kwh=self.kwh)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data['household_ids'], data['features'], data['kwh'])
+
+    def nearest(self, vector, k=DEFAULT_K, exclude=None):
+        """Household ids and kWh of the k nearest households, optionally excluding one id"""
+        if self.tree is None:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        idx, _ = self.tree.query(np.asarray(vector) / self.scale, k + (1 if exclude is not None else 0))
+        if exclude is not None:
+            idx = idx[self.household_ids[idx] != exclude][:k]
+        return self.household_ids[idx], self.kwh[idx]
+
+
+_index = None
+_index_lock = threading.Lock()
+_rebuilding = False
+_retry_after = 0.0  # After a failed rebuild, don't try again before this time
+
+
+def get_index():
+    """
+    Process-wide index. When NEIGHBOUR_INDEX_PATH is set the snapshot there is
+    (re)loaded whenever it changes. Otherwise the index is built from the
+    database on first use; once it is older than NEIGHBOUR_INDEX_TTL seconds
+    a background thread rebuilds it while the old one keeps serving.
+    """
+    global _index
+    path = getattr(settings, 'NEIGHBOUR_INDEX_PATH', None)
+    if path and os.path.exists(path):
+        with _index_lock:
+            mtime = os.path.getmtime(path)
+            if _index is None or mtime != _index.built_at:
+                _index = NeighbourIndex.load(path)
+                _index.built_at = mtime
+            return _index
+
+    index = _index
+    if index is None:
+        with _index_lock:
+            if _index is None:
+                _index = NeighbourIndex.build()
+            return _index
+    if time.time() - index.built_at > getattr(settings, 'NEIGHBOUR_INDEX_TTL', DEFAULT_TTL):
+        start_rebuild()
+    return index
+
+
+def start_rebuild():
+    """
+    Rebuild the index on a background thread unless one is already running or
+    the last one failed less than REBUILD_RETRY_SECONDS ago.
+    """
+    global _rebuilding
+    with _index_lock:
+        if _rebuilding or time.time() < _retry_after:
+            return
+        _rebuilding = True
+    threading.Thread(target=_rebuild, name='neighbour-index-rebuild', daemon=True).start()
+
+
+def _rebuild():
+    global _index, _rebuilding, _retry_after
+    try:
+        index = NeighbourIndex.build()
+        with _index_lock:
+            _index = index
+    except Exception:
+        _retry_after = time.time() + REBUILD_RETRY_SECONDS
+        logger.exception("Rebuilding the neighbour index failed; keeping the old one")
+    finally:
+        _rebuilding = False
+        connection.close()  # The thread's own connection
+
+
+def compare_with_neighbours(household, appliances, total_kwh, k=DEFAULT_K):
+    """
+    Compare a household's monthly kWh with its k most similar households.
+    Returns None when there are no other households to compare with.
+    """
+    vector = household_features(household.members, household.rooms, appliances)
+    _, neighbour_kwh = get_index().nearest(vector, k=k, exclude=household.id)
+    if not len(neighbour_kwh):
+        return None
+
+    p25, p50, p75 = np.percentile(neighbour_kwh, [25, 50, 75])
+    return {
+        'count': len(neighbour_kwh),
+        'p25': round(float(p25), 1),
+        'median': round(float(p50), 1),
+        'p75': round(float(p75), 1),
+        # Share of similar households that use less than this one
+        'percentile': round(float((neighbour_kwh < total_kwh).mean() * 100), 1),
+    }
@@ -0,0 +1,210 @@
+"""
+Budget-constrained upgrade optimizer.
+
+Picks at most one upgrade/behaviour combination per appliance so the total
+upfront cost stays within the user's rupee budget and the monthly saving is as
+large as possible (a multiple-choice knapsack). Small problems are solved
+exactly with dynamic programming over the budget; large ones use the greedy
+incremental-efficiency heuristic.
+"""
+import math
+import time
+
+import numpy as np
+
+from .tariffs import household_tariff
+from .utils import calculate_consumption, days_in_bill_month, monthly_appliance_kwh
+
+BUDGET_STEP = 100                # Rupee granularity of the exact solver
+EXACT_CELL_LIMIT = 2_000_000     # appliances x budget steps handled by the exact solver
+
+# Replacement options per appliance type: (label, wattage factor, upfront cost in rupees)
+REPLACEMENTS = {
+    'AC': [('5-star inverter AC', 0.6, 38000), ('3-star inverter AC', 0.75, 30000)],
+    'WM': [('5-star front-load washer', 0.7, 28000)],
+    'FR': [('5-star frost-free refrigerator', 0.55, 25000)],
+    'WH': [('Solar water heater', 0.2, 22000), ('5-star instant geyser', 0.85, 6000)],
+    'TV': [('LED TV', 0.5, 15000)],
+    'MO': [('Inverter microwave', 0.85, 9000)],
+    'CF': [('BLDC ceiling fan', 0.4, 3500)],
+    'LT': [('LED bulbs', 0.15, 600)],
+    'PC': [('Energy Star laptop', 0.4, 45000)],
+}
+
+# Behaviour changes per appliance type: (label, hours reduced per day, upfront cost)
+BEHAVIOURS = {
+    'AC': [('Run the AC 2 hours less', 2, 0), ('Timer plug for the AC', 1, 800)],
+    'WM': [('Wash full loads only', 1, 0)],
+    'WH': [('Geyser timer', 1, 1200)],
+    'TV': [('Watch 1 hour less', 1, 0)],
+    'CF': [('Switch off fans in empty rooms', 2, 0)],
+    'LT': [('Use daylight, 2 hours less lighting', 2, 0)],
+    'PC': [('Sleep mode when idle', 2, 0)],
+}
+
+
+def upgrade_options(appliance, days_in_month):
+    """
+    All (label, cost, kwh_saved) options for one appliance: every replacement,
+    every behaviour change and every replacement + behaviour pair.
+    """
+    replacements = [(None, 1.0, 0)] + REPLACEMENTS.get(appliance.appliance_type, [])
+    behaviours = [(None, 0, 0)] + BEHAVIOURS.get(appliance.appliance_type, [])
+    current = monthly_appliance_kwh(appliance.wattage, appliance.hours_used, days_in_month)
+
+    options = []
+    for replace_label, factor, replace_cost in replacements:
+        for behaviour_label, hours_cut, behaviour_cost in behaviours:
+            if replace_label is None and behaviour_label is None:
+                continue
+            hours = max(appliance.hours_used - hours_cut, 0)
+            kwh_saved = current - monthly_appliance_kwh(appliance.wattage * factor, hours, days_in_month)
+            if kwh_saved <= 0:
+                continue
+            label = ' + '.join(l for l in (replace_label, behaviour_label) if l)
+            options.append((label, replace_cost + behaviour_cost, kwh_saved))
+    return options
+
+
+def solve_exact(groups, budget):
+    """
+    Exact multiple-choice knapsack by DP over the budget in BUDGET_STEP units.
+    groups is a list of option lists [(cost, value), ...]; returns the chosen
+    option index (or None) per group.
+    """
+    capacity = int(budget // BUDGET_STEP)
+    if len(groups) * (capacity + 1) > EXACT_CELL_LIMIT:
+        raise ValueError("Budget too large for the exact solver")
+    best = np.zeros(capacity + 1)
+    choices = np.zeros((len(groups), capacity + 1), dtype=np.int16)
+
+    for g, options in enumerate(groups):
+        new_best = best.copy()
+        for o, (cost, value) in enumerate(options):
+            units = math.ceil(cost / BUDGET_STEP)
+            if units > capacity:
+                continue
+            candidate = np.full(capacity + 1, -np.inf)
+            candidate[units:] = best[:capacity + 1 - units] + value
+            better = candidate > new_best
+            new_best[better] = candidate[better]
+            choices[g, better] = o + 1
+        best = new_best
+
+    # Walk the choice table back from the full budget
+    picks = [None] * len(groups)
+    remaining = capacity
+    for g in range(len(groups) - 1, -1, -1):
+        o = choices[g, remaining]
+        if o:
+            picks[g] = o - 1
+            remaining -= math.ceil(groups[g][o - 1][0] / BUDGET_STEP)
+    return picks
+
+
+def solve_greedy(groups, budget):
+    """
+    Approximate multiple-choice knapsack: take the upper convex hull of each group
+    and buy incremental upgrades in order of value per rupee while they fit.
+    """
+    increments = []
+    for g, options in enumerate(groups):
+        # Cheapest option first, keeping only those that add value (the efficient frontier)
+        order = sorted(range(len(options)), key=lambda o: (options[o][0], -options[o][1]))
+        hull = [(None, 0.0, 0.0)]
+        for o in order:
+            cost, value = options[o]
+            if value <= hull[-1][2]:
+                continue
+            while len(hull) > 1:
+                _, c1, v1 = hull[-2]
+                _, c2, v2 = hull[-1]
+                # Drop the last point when it lies below the line to the new one
+                if (v2 - v1) * (cost - c1) <= (value - v1) * (c2 - c1):
+                    hull.pop()
+                else:
+                    break
+            hull.append((o, cost, value))
+        for step in range(1, len(hull)):
+            _, c0, v0 = hull[step - 1]
+            o, c1, v1 = hull[step]
+            ratio = math.inf if c1 == c0 else (v1 - v0) / (c1 - c0)
+            increments.append((ratio, g, step, hull))
+
+    increments.sort(key=lambda inc: -inc[0])
+    picks = [None] * len(groups)
+    levels = [0] * len(groups)
+    spent = 0.0
+    for ratio, g, step, hull in increments:
+        if levels[g] != step - 1:
+            continue  # An earlier increment of this group did not fit
+        extra = hull[step][1] - hull[step - 1][1]
+        if spent + extra > budget:
+            continue
+        spent += extra
+        levels[g] = step
+        picks[g] = hull[step][0]
+    return picks
+
+
+def recommend_upgrades(household, appliances, bill, budget, solver=None):
+    """
+    Recommend the combination of upgrades that saves the most under a rupee budget.
+    solver is 'exact', 'greedy' or None to choose by problem size; 'exact' falls
+    back to greedy above EXACT_CELL_LIMIT (the result names the solver used).
+    """
+    started = time.perf_counter()
+    if not math.isfinite(budget):
+        raise ValueError("Budget must be a finite number")
+    if budget < 0:
+        raise ValueError("Budget must not be negative")
+
+    appliances = list(appliances)
+    days_in_month = days_in_bill_month(bill)
+    per_appliance = [upgrade_options(app, days_in_month) for app in appliances]
+    # kWh savings add up across appliances and the tariff is monotonic, so the
+    # largest kWh saving is also the largest rupee saving
+    groups = [[(cost, kwh) for _, cost, kwh in options] for options in per_appliance]
+
+    if solver not in (None, 'exact', 'greedy'):
+        raise ValueError(f"Unknown solver: {solver}")
+    if solver != 'greedy':
+        # The exact solver's table takes memory in proportion to the budget
+        cells = len(groups) * (int(budget // BUDGET_STEP) + 1)
+        solver = 'exact' if cells <= EXACT_CELL_LIMIT else 'greedy'
+    if solver == 'exact':
+        picks = solve_exact(groups, budget)
+    else:
+        picks = solve_greedy(groups, budget)
+
+    recommendations = []
+    spent = kwh_saved = 0.0
+    for app, options, pick in zip(appliances, per_appliance, picks):
+        if pick is None:
+            continue
+        label, cost, kwh = options[pick]
+        spent += cost
+        kwh_saved += kwh
+        recommendations.append({
+            'id': app.id,
+            'name': app.custom_name if app.custom_name else app.get_appliance_type_display(),
+            'action': label,
+            'cost': cost,
+            'kwh_saved': round(kwh, 1),
+        })
+
+    # Rupee savings are priced on the whole bill so slab effects are respected
+    tariff = household_tariff(household)
+    actual_kwh = calculate_consumption(household, appliances, bill)['total_kwh']
+    rupees_saved = tariff.kwh_to_amount(actual_kwh) - tariff.kwh_to_amount(max(actual_kwh - kwh_saved, 0))
+
+    return {
+        'solver': solver,
+        'budget': budget,
+        'spent': spent,
+        'kwh_saved': round(kwh_saved, 1),
+        'rupees_saved': round(rupees_saved, 2),
+        'payback_months': round(spent / rupees_saved, 1) if rupees_saved > 0 else None,
+        'recommendations': recommendations,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+    }
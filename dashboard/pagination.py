@@ -0,0 +1,42 @@
+"""
+Keyset (cursor) pagination shared by the admin changelists and the JSON API.
+
+A cursor is the sort key of the last row of a page, JSON-encoded and base64'd
+so it is opaque to clients. The next page is the rows strictly after it in the
+same ordering, which the database answers with an index seek however deep
+the page is, unlike OFFSET.
+"""
+import base64
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, cls=DjangoJSONEncoder).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """The list of values in a cursor, or None when it is malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def keyset_after(ordering, values):
+    """
+    Q for the rows strictly after `values` in `ordering`, a list of
+    (field name, descending) ending in a unique field.
+    """
+    condition = Q()
+    for i, (name, descending) in enumerate(ordering):
+        step = Q(**{f'{name}__{"lt" if descending else "gt"}': values[i]})
+        for (prev, _), value in zip(ordering[:i], values[:i]):
+            step &= Q(**{prev: value})
+        condition |= step
+    # A plain range bound on the leading column lets the database seek its index
+    first, descending = ordering[0]
+    return Q(**{f'{first}__{"lte" if descending else "gte"}': values[0]}) & condition
@@ -0,0 +1,114 @@
+"""
+Primary/replica database routing.
+
+Writes always go to 'default'. Reads go to a replica only while a view marked
+with @replica_reads (or an admin changelist) is handling a GET, and only when
+the client has not written recently: any write sets a short-lived cookie that
+pins the next REPLICA_STICKY_SECONDS of that client's reads to the primary, so
+users always see what they just saved.
+
+Replicas are any database aliases other than 'default' (see SQLITE_REPLICAS in
+settings); `manage.py sync_replicas` refreshes local SQLite replica files.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_COOKIE = 'db_sticky_until'
+PRIMARY_ONLY_APPS = {'sessions'}  # Sessions are read right after they are written
+
+# Per-request routing state, None outside requests (commands and workers read the primary)
+_routing = ContextVar('db_routing', default=None)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+def replica_reads(view_func):
+    """Mark a view whose GET requests may read from a replica"""
+    view_func.replica_reads = True
+    return view_func
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if (not state or not state['replica_ok'] or state['wrote']
+                or model._meta.app_label in PRIMARY_ONLY_APPS):
+            return DEFAULT_DB_ALIAS
+        replicas = replica_aliases()
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # Replicas hold the same data as the primary
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS  # Replicas are copies of the primary, never migrated directly
+
+
+class ReplicaRoutingMiddleware:
+    """Enables replica reads for marked views and keeps writers sticky to the primary"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _routing.set(self.request_state(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            state = _routing.get()
+            _routing.reset(token)
+        return self.mark_sticky(response, state)
+
+    async def __acall__(self, request):
+        # The async ORM runs queries on other threads with a copy of this context; they share the state dict
+        token = _routing.set(self.request_state(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            state = _routing.get()
+            _routing.reset(token)
+        return self.mark_sticky(response, state)
+
+    @staticmethod
+    def request_state(request):
+        try:
+            sticky_until = float(request.COOKIES.get(STICKY_COOKIE, 0))
+        except ValueError:
+            sticky_until = 0
+        return {'replica_ok': False, 'sticky': sticky_until > time.time(), 'wrote': False}
+
+    @staticmethod
+    def mark_sticky(response, state):
+        if state['wrote']:
+            window = getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+            response.set_cookie(STICKY_COOKIE, f'{time.time() + window:.3f}', max_age=window,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _routing.get()
+        if state is None or state['sticky'] or request.method not in ('GET', 'HEAD'):
+            return None
+        match = request.resolver_match
+        is_admin_list = match.namespace == 'admin' and (match.url_name or '').endswith('_changelist')
+        state['replica_ok'] = getattr(view_func, 'replica_reads', False) or is_admin_list
+        return None
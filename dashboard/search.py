@@ -0,0 +1,267 @@
+"""
+SQLite FTS5 search index for users and appliances.
+
+Admin search fields like `household__user__email` turn into LIKE '%x%' scans
+across joins. Instead, two FTS5 tables hold the searchable text and are kept
+in sync by triggers on the source tables (so bulk inserts, raw SQL and
+cascading deletes are covered too):
+
+- dashboard_user_fts: rowid = user id; email, name (first, last, username)
+- dashboard_appliance_fts: rowid = appliance id; name (custom_name), type
+  (code and label) and the owner's email
+
+The trigram tokenizer matches substrings like icontains does, for terms of
+at least three characters; shorter terms, other databases and SQLite builds
+without FTS5 fall back to the regular LIKE search.
+`manage.py rebuild_search_index` recreates the tables, triggers and contents.
+Migrations that rebuild the user, household or appliance tables must wrap
+their operations in drop_triggers/create_triggers (see 0010).
+"""
+import logging
+import sqlite3
+
+from django.apps import apps
+from django.db import connection as default_connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.text import smart_split, unescape_string_literal
+
+logger = logging.getLogger(__name__)
+
+INDEXES = ('users', 'appliances')
+MIN_TERM_LENGTH = 3  # Trigram tokens; shorter terms cannot use the index
+
+
+def _tables():
+    User = apps.get_model('dashboard', 'User')
+    Household = apps.get_model('dashboard', 'Household')
+    Appliance = apps.get_model('dashboard', 'Appliance')
+    return {
+        'user': User._meta.db_table,
+        'household': Household._meta.db_table,
+        'appliance': Appliance._meta.db_table,
+        'users': f'{User._meta.db_table}_fts',
+        'appliances': f'{Appliance._meta.db_table}_fts',
+    }
+
+
+def index_table(index):
+    return _tables()[index]
+
+
+def _type_label_sql(column):
+    """CASE expression giving 'code label' for an appliance type column"""
+    Appliance = apps.get_model('dashboard', 'Appliance')
+    whens = ' '.join(
+        f"WHEN '{code}' THEN '{code} {label}'"
+        for code, label in Appliance._meta.get_field('appliance_type').choices
+    )
+    return f"CASE {column} {whens} ELSE {column} END"
+
+
+def _trigger_sql():
+    t = _tables()
+    user_name = "trim(new.first_name || ' ' || new.last_name || ' ' || new.username)"
+    owner_email = (f"(SELECT u.email FROM {t['household']} h JOIN {t['user']} u ON u.id = h.user_id "
+                   f"WHERE h.id = new.household_id)")
+    appliances_of_user = (f"SELECT a.id FROM {t['appliance']} a JOIN {t['household']} h "
+                          f"ON h.id = a.household_id WHERE h.user_id = new.id")
+    return [
+        # Users
+        f"""CREATE TRIGGER {t['users']}_insert AFTER INSERT ON {t['user']} BEGIN
+            INSERT INTO {t['users']} (rowid, email, name) VALUES (new.id, new.email, {user_name});
+        END""",
+        f"""CREATE TRIGGER {t['users']}_update AFTER UPDATE OF email, first_name, last_name, username
+            ON {t['user']} BEGIN
+            UPDATE {t['users']} SET email = new.email, name = {user_name} WHERE rowid = new.id;
+        END""",
+        f"""CREATE TRIGGER {t['users']}_delete AFTER DELETE ON {t['user']} BEGIN
+            DELETE FROM {t['users']} WHERE rowid = old.id;
+        END""",
+
+        # Appliances, including the owner's email copied from the user
+        f"""CREATE TRIGGER {t['appliances']}_insert AFTER INSERT ON {t['appliance']} BEGIN
+            INSERT INTO {t['appliances']} (rowid, name, type, email)
+            VALUES (new.id, new.custom_name, {_type_label_sql('new.appliance_type')}, {owner_email});
+        END""",
+        f"""CREATE TRIGGER {t['appliances']}_update AFTER UPDATE OF custom_name, appliance_type, household_id
+            ON {t['appliance']} BEGIN
+            UPDATE {t['appliances']} SET name = new.custom_name,
+                type = {_type_label_sql('new.appliance_type')}, email = {owner_email}
+            WHERE rowid = new.id;
+        END""",
+        f"""CREATE TRIGGER {t['appliances']}_delete AFTER DELETE ON {t['appliance']} BEGIN
+            DELETE FROM {t['appliances']} WHERE rowid = old.id;
+        END""",
+        f"""CREATE TRIGGER {t['appliances']}_user_email AFTER UPDATE OF email ON {t['user']} BEGIN
+            UPDATE {t['appliances']} SET email = new.email WHERE rowid IN ({appliances_of_user});
+        END""",
+        f"""CREATE TRIGGER {t['appliances']}_household_user AFTER UPDATE OF user_id ON {t['household']} BEGIN
+            UPDATE {t['appliances']} SET email = (SELECT email FROM {t['user']} WHERE id = new.user_id)
+            WHERE rowid IN (SELECT id FROM {t['appliance']} WHERE household_id = new.id);
+        END""",
+    ]
+
+
+def _populate_sql():
+    t = _tables()
+    return [
+        f"""INSERT INTO {t['users']} (rowid, email, name)
+            SELECT id, email, trim(first_name || ' ' || last_name || ' ' || username) FROM {t['user']}""",
+        f"""INSERT INTO {t['appliances']} (rowid, name, type, email)
+            SELECT a.id, a.custom_name, {_type_label_sql('a.appliance_type')}, u.email
+            FROM {t['appliance']} a
+            JOIN {t['household']} h ON h.id = a.household_id
+            JOIN {t['user']} u ON u.id = h.user_id""",
+    ]
+
+
+TRIGGERS = {
+    'users': ('insert', 'update', 'delete'),
+    'appliances': ('insert', 'update', 'delete', 'user_email', 'household_user'),
+}
+
+
+def _table_sql():
+    t = _tables()
+    return [
+        f"CREATE VIRTUAL TABLE {t['users']} USING fts5(email, name, tokenize='trigram')",
+        f"CREATE VIRTUAL TABLE {t['appliances']} USING fts5(name, type, email, tokenize='trigram')",
+    ]
+
+
+def _drop_trigger_sql():
+    t = _tables()
+    return [f"DROP TRIGGER IF EXISTS {t[name]}_{suffix}" for name, suffixes in TRIGGERS.items()
+            for suffix in suffixes]
+
+
+def _drop_sql():
+    # The triggers live on the source tables, so dropping the index tables leaves them behind
+    return _drop_trigger_sql() + [f"DROP TABLE IF EXISTS {_tables()[name]}" for name in INDEXES]
+
+
+_fts5_compiled = None  # The SQLite library is shared by every connection in the process
+
+
+def fts5_supported(connection=default_connection):
+    """Whether this database can hold the index (SQLite with FTS5 and the trigram tokenizer)"""
+    global _fts5_compiled
+    if connection.vendor != 'sqlite' or sqlite3.sqlite_version_info < (3, 34, 0):
+        return False
+    if _fts5_compiled is None:
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA compile_options')
+            _fts5_compiled = 'ENABLE_FTS5' in {row[0] for row in cursor.fetchall()}
+    return _fts5_compiled
+
+
+def is_installed(connection=default_connection):
+    if not fts5_supported(connection):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN (%s, %s)",
+                       [_tables()['users'], _tables()['appliances']])
+        return cursor.fetchone()[0] == len(INDEXES)
+
+
+def install(connection=default_connection):
+    """Create (or recreate) the index tables and triggers and fill them from the source tables"""
+    if not fts5_supported(connection):
+        logger.warning("Search index skipped: database has no FTS5 trigram support")
+        return False
+    with connection.cursor() as cursor:
+        for statement in _drop_sql() + _table_sql() + _trigger_sql() + _populate_sql():
+            cursor.execute(statement)
+        for name in INDEXES:
+            cursor.execute(f"INSERT INTO {_tables()[name]} ({_tables()[name]}) VALUES ('optimize')")
+    return True
+
+
+def uninstall(connection=default_connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for statement in _drop_sql():
+            cursor.execute(statement)
+
+
+def drop_triggers(connection=default_connection):
+    """
+    Remove the sync triggers. SQLite cannot rebuild (ALTER through a table
+    copy) the user, household or appliance tables while triggers refer to
+    them, so migrations doing that call this first and create_triggers after.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for statement in _drop_trigger_sql():
+            cursor.execute(statement)
+
+
+def create_triggers(connection=default_connection):
+    """Reinstate the sync triggers after drop_triggers (changes made in between are not indexed)"""
+    if not is_installed(connection):
+        return
+    with connection.cursor() as cursor:
+        for statement in _drop_trigger_sql() + _trigger_sql():
+            cursor.execute(statement)
+
+
+def _quote(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def matching_ids(index, term):
+    """Subquery of the row ids in `index` whose text contains `term` (case-insensitive)"""
+    table = index_table(index)
+    return RawSQL(f"SELECT rowid FROM {table} WHERE {table} MATCH %s", [_quote(term)])
+
+
+def usable_terms(search_term):
+    """The search's terms, or None when any is too short for the trigram index"""
+    terms = []
+    for bit in smart_split(search_term):
+        if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+            bit = unescape_string_literal(bit)
+        if len(bit) < MIN_TERM_LENGTH:
+            return None
+        terms.append(bit)
+    return terms
+
+
+def search_filter(terms, lookups):
+    """
+    Q requiring every term to match at least one of `lookups`, a mapping of
+    index name to the field holding that index's row id (e.g. {'users':
+    'household__user_id'}), the same semantics as admin search_fields.
+    """
+    condition = Q()
+    for term in terms:
+        any_index = Q()
+        for index, field in lookups.items():
+            any_index |= Q(**{f'{field}__in': matching_ids(index, term)})
+        condition &= any_index
+    return condition
+
+
+def search(query, limit=20):
+    """Best-ranked users and appliances for `query`, for the staff search endpoint"""
+    t = _tables()
+    terms = usable_terms(query) or []
+    if not terms or not is_installed():
+        return None
+    match = ' AND '.join(_quote(term) for term in terms)
+    results = {}
+    with default_connection.cursor() as cursor:
+        cursor.execute(f"SELECT rowid, email, name FROM {t['users']} WHERE {t['users']} MATCH %s "
+                       f"ORDER BY rank LIMIT %s", [match, limit])
+        results['users'] = [{'id': id, 'email': email, 'name': name} for id, email, name in cursor.fetchall()]
+        cursor.execute(f"SELECT f.rowid, f.name, f.type, f.email, a.household_id "
+                       f"FROM {t['appliances']} f JOIN {t['appliance']} a ON a.id = f.rowid "
+                       f"WHERE {t['appliances']} MATCH %s ORDER BY f.rank LIMIT %s", [match, limit])
+        results['appliances'] = [
+            {'id': id, 'name': name, 'type': type_, 'email': email, 'household_id': household_id}
+            for id, name, type_, email, household_id in cursor.fetchall()
+        ]
+    return results
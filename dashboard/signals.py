@@ -0,0 +1,71 @@
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .auth import user_cache_key
+from .models import Appliance, ElectricityBill, Household, User
+
+
+@receiver(post_save, sender=ElectricityBill)
+def score_saved_bill(sender, instance, raw=False, **kwargs):
+    """Score each newly saved bill so anomalies show up without waiting for the nightly run"""
+    if raw:
+        return  # Skip fixture loading
+    from .anomalies import score_bill
+    score_bill(instance)
+
+
+@receiver(post_save, sender=Household)
+@receiver(post_save, sender=Appliance)
+@receiver(post_delete, sender=Appliance)
+@receiver(post_save, sender=ElectricityBill)
+@receiver(post_delete, sender=ElectricityBill)
+def queue_tips_refresh(sender, instance, raw=False, **kwargs):
+    """Queue a background refresh of the household's AI tips once the change is committed"""
+    if raw:
+        return
+    refresh_tips(instance.id if sender is Household else instance.household_id)
+
+
+def refresh_tips(household_id):
+    def enqueue():
+        from .jobs import enqueue_tips
+        household = Household.objects.filter(id=household_id).first()
+        if household:  # Gone when the whole household was deleted
+            enqueue_tips(household)
+
+    transaction.on_commit(enqueue)
+
+
+@receiver(post_save, sender=Household)
+@receiver(post_save, sender=Appliance)
+@receiver(post_delete, sender=Appliance)
+@receiver(post_save, sender=ElectricityBill)
+@receiver(post_delete, sender=ElectricityBill)
+def bump_data_version(sender, instance, raw=False, **kwargs):
+    """Give the household a new data_version so cached API responses (ETags) go stale"""
+    if raw:
+        return
+    new_data_version(instance.id if sender is Household else instance.household_id)
+
+
+def new_data_version(household_id):
+    # A fresh random value rather than a counter: a household saved from a stale instance
+    # writes back an old version first, which must never come around again
+    Household.objects.filter(id=household_id).update(data_version=uuid.uuid4())
+
+
+def household_changed(household_id):
+    """Run the change hooks above once, for bulk writes (bulk_create/bulk_update) that send no signals"""
+    new_data_version(household_id)
+    refresh_tips(household_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    """Drop the user from the auth cache so the next request reloads it (password, is_active, ...)"""
+    cache.delete(user_cache_key(instance.id))
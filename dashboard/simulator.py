@@ -0,0 +1,135 @@
+"""
+What-if savings simulator.
+
+Expands a grid of per-appliance hour reductions, wattage replacements and tariff
+choices into scenarios and evaluates all of them in one batched NumPy pass using
+the same monthly kWh formula as calculate_consumption.
+"""
+import math
+import time
+
+import numpy as np
+
+from .tariffs import get_tariff, household_tariff
+from .utils import calculate_consumption, days_in_bill_month, monthly_appliance_kwh
+
+MAX_SCENARIOS = 50000  # Keeps a single simulation well inside the request latency budget
+DEFAULT_LIMIT = 20
+
+
+def simulate_savings(household, appliances, bill, options=None, tariffs=None, limit=DEFAULT_LIMIT):
+    """
+    Evaluate every combination of appliance changes and tariffs and rank them by savings.
+
+    options maps an appliance id to {'hour_reductions': [...], 'wattages': [...]};
+    appliances without options keep their current usage. tariffs is a list of tariff
+    codes (the household's own tariff when omitted). Raises ValueError when the grid
+    is invalid or larger than MAX_SCENARIOS.
+    """
+    started = time.perf_counter()
+    options = options or {}
+    if not isinstance(options, dict):
+        raise ValueError("appliances must map appliance ids to options")
+    if tariffs is not None and not (isinstance(tariffs, list) and all(isinstance(t, str) for t in tariffs)):
+        raise ValueError("tariffs must be a list of tariff codes")
+    appliances = list(appliances)
+    if not appliances:
+        raise ValueError("No appliances to simulate")
+
+    current_tariff = household_tariff(household)
+    tariff_list = [get_tariff(code) for code in tariffs] if tariffs else [current_tariff]
+    days_in_month = days_in_bill_month(bill)
+
+    # Step 1: Per-appliance option tables (hours x wattages, flattened)
+    hour_options, watt_options = [], []
+    for app in appliances:
+        app_options = options.get(str(app.id), options.get(app.id, {})) or {}
+        if not isinstance(app_options, dict) or not all(
+                isinstance(app_options.get(key, []), list) for key in ('hour_reductions', 'wattages')):
+            raise ValueError("Appliance options must be {'hour_reductions': [...], 'wattages': [...]}")
+        reductions = sorted({0, *(float(r) for r in app_options.get('hour_reductions', []))})
+        wattages = [app.wattage] + [float(w) for w in app_options.get('wattages', []) if float(w) != app.wattage]
+        if not all(math.isfinite(v) for v in reductions + wattages):
+            raise ValueError("Hour reductions and wattages must be finite numbers")
+        if any(r < 0 for r in reductions) or any(w <= 0 for w in wattages):
+            raise ValueError("Hour reductions must be >= 0 and wattages must be > 0")
+        hours = np.maximum(app.hours_used - np.array(reductions), 0.0)
+        hour_options.append(np.tile(hours, len(wattages)))
+        watt_options.append(np.repeat(np.array(wattages, dtype=np.float64), len(hours)))
+
+    counts = [len(h) for h in hour_options]
+    shape = counts + [len(tariff_list)]
+    total = math.prod(shape)  # Python ints: a NumPy product can wrap around past the limit
+    if total > MAX_SCENARIOS:
+        raise ValueError(f"Too many scenarios ({total}); the limit is {MAX_SCENARIOS}")
+
+    # Padded (appliances x options) tables so every scenario is a gather
+    width = max(counts)
+    hours_table = np.zeros((len(appliances), width))
+    watts_table = np.zeros((len(appliances), width))
+    for i, (hours, watts) in enumerate(zip(hour_options, watt_options)):
+        hours_table[i, :len(hours)] = hours
+        watts_table[i, :len(watts)] = watts
+    kwh_table = monthly_appliance_kwh(watts_table, hours_table, days_in_month)
+
+    # Step 2: Decode every scenario index into per-appliance option indices
+    indices = np.unravel_index(np.arange(total), shape)
+    option_idx = np.stack(indices[:-1])                        # appliances x scenarios
+    tariff_idx = indices[-1]
+    rows = np.arange(len(appliances))[:, None]
+    scenario_appliance_kwh = kwh_table[rows, option_idx].sum(axis=0)
+
+    # Step 3: Apply the appliance delta to the household's actual consumption
+    baseline_appliance_kwh = float(kwh_table[:, 0].sum())
+    actual_kwh = calculate_consumption(household, appliances, bill)['total_kwh']
+    scenario_kwh = np.maximum(actual_kwh - (baseline_appliance_kwh - scenario_appliance_kwh), 0.0)
+
+    baseline_amount = current_tariff.kwh_to_amount(actual_kwh)
+    scenario_amount = np.empty(total)
+    for t, tariff in enumerate(tariff_list):
+        mask = tariff_idx == t
+        scenario_amount[mask] = tariff.kwh_to_amount(scenario_kwh[mask])
+
+    kwh_saved = actual_kwh - scenario_kwh
+    rupees_saved = baseline_amount - scenario_amount
+
+    # Step 4: Rank by rupee savings, then kWh savings
+    limit = max(1, min(int(limit), total))
+    if limit < total:
+        candidates = np.argpartition(-rupees_saved, limit - 1)[:limit]
+    else:
+        candidates = np.arange(total)
+    order = candidates[np.lexsort((-kwh_saved[candidates], -rupees_saved[candidates]))]
+
+    scenarios = []
+    for s in order:
+        changes = []
+        for i, app in enumerate(appliances):
+            j = option_idx[i, s]
+            if j == 0:
+                continue
+            changes.append({
+                'id': app.id,
+                'name': app.custom_name if app.custom_name else app.get_appliance_type_display(),
+                'hours_used': float(hours_table[i, j]),
+                'wattage': float(watts_table[i, j]),
+            })
+        scenarios.append({
+            'tariff': tariff_list[tariff_idx[s]].code,
+            'changes': changes,
+            'kwh': round(float(scenario_kwh[s]), 1),
+            'amount': round(float(scenario_amount[s]), 2),
+            'kwh_saved': round(float(kwh_saved[s]), 1),
+            'rupees_saved': round(float(rupees_saved[s]), 2),
+        })
+
+    return {
+        'baseline': {
+            'tariff': current_tariff.code,
+            'kwh': round(actual_kwh, 1),
+            'amount': round(baseline_amount, 2),
+        },
+        'evaluated': total,
+        'scenarios': scenarios,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+    }
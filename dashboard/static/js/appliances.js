@@ -1,79 +1,198 @@
 document.addEventListener('DOMContentLoaded', function() {
-    // Handle appliance form submission via AJAX
     const applianceForm = document.getElementById('appliance-form');
-    if (applianceForm) {
-        applianceForm.addEventListener('submit', function(e) {
-            e.preventDefault();
-            
-            const formData = new FormData(this);
-            fetch('{% url "appliances" %}', {
-                method: 'POST',
-                body: formData,
-                headers: {
-                    'X-CSRFToken': formData.get('csrfmiddlewaretoken')
-                }
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.success) {
-                    // Clear the form
-                    this.reset();
-                    
-                    // Update the appliances list
-                    const appliancesList = document.getElementById('appliances-list');
-                    if (appliancesList.querySelector('.alert')) {
-                        appliancesList.innerHTML = '';
-                    }
-                    
-                    // Add new appliance to the list
-                    const newAppliance = document.createElement('div');
-                    newAppliance.className = 'list-group-item d-flex justify-content-between align-items-center';
-                    newAppliance.innerHTML = `
-                        <div>
-                            <strong>${data.appliance_type_display}</strong>
-                            <span class="text-muted ms-2">${data.wattage}W, ${data.hours_used} hrs/day</span>
-                        </div>
-                        <button class="btn btn-sm btn-outline-danger remove-appliance" data-id="${data.id}">Remove</button>
-                    `;
-                    appliancesList.appendChild(newAppliance);
-                    
-                    // Add event listener to the new remove button
-                    newAppliance.querySelector('.remove-appliance').addEventListener('click', function() {
-                        removeAppliance(this);
-                    });
+    if (!applianceForm) {
+        return;
+    }
+    const batchUrl = applianceForm.dataset.batchUrl;
+    const catalogUrl = applianceForm.dataset.catalogUrl;
+    const csrfToken = applianceForm.querySelector('[name=csrfmiddlewaretoken]').value;
+    const appliancesList = document.getElementById('appliances-list');
+    const batchStatus = document.getElementById('batch-status');
+    const saveButton = document.getElementById('save-appliances');
+    const pendingCount = document.getElementById('pending-count');
+    const batchErrors = document.getElementById('batch-errors');
+
+    // Saved appliances as returned by the server, and edits not sent yet
+    let appliances = JSON.parse(document.getElementById('appliances-data').textContent);
+    let pending = [];
+    let nextRef = 1;
+    let saving = null;
+
+    function render() {
+        appliancesList.innerHTML = '';
+        const deleted = new Set(pending.filter(op => op.op === 'delete').map(op => op.id));
+        const rows = appliances.map(appliance => ({appliance, state: deleted.has(appliance.id) ? 'delete' : null}))
+            .concat(pending.filter(op => op.op === 'create').map(op => ({appliance: op, state: 'create'})));
+
+        if (rows.length === 0) {
+            appliancesList.innerHTML = '<div class="alert alert-info">No appliances added yet. Add an appliance above.</div>';
+        }
+        rows.forEach(({appliance, state}) => {
+            const item = document.createElement('div');
+            item.className = 'list-group-item d-flex justify-content-between align-items-center';
+            const label = document.createElement('div');
+            const name = document.createElement('strong');
+            name.textContent = appliance.name;
+            const details = document.createElement('span');
+            details.className = 'text-muted ms-2';
+            details.textContent = `${appliance.wattage ? appliance.wattage + 'W' : 'wattage from catalog'}, ${appliance.hours_used} hrs/day`;
+            label.append(name, details);
+            if (state) {
+                const badge = document.createElement('span');
+                badge.className = `badge ms-2 ${state === 'create' ? 'bg-success' : 'bg-danger'}`;
+                badge.textContent = state === 'create' ? 'to add' : 'to remove';
+                label.appendChild(badge);
+            }
+            if (state === 'delete') {
+                name.classList.add('text-decoration-line-through');
+            }
+
+            const button = document.createElement('button');
+            button.type = 'button';
+            button.className = `btn btn-sm ${state ? 'btn-outline-secondary' : 'btn-outline-danger'}`;
+            button.textContent = state ? 'Undo' : 'Remove';
+            button.addEventListener('click', function() {
+                if (state === 'create') {
+                    pending = pending.filter(op => op !== appliance);
+                } else if (state === 'delete') {
+                    pending = pending.filter(op => !(op.op === 'delete' && op.id === appliance.id));
+                } else {
+                    pending.push({op: 'delete', id: appliance.id});
                 }
+                render();
             });
+            item.append(label, button);
+            appliancesList.appendChild(item);
+        });
+
+        batchStatus.classList.toggle('d-none', pending.length === 0);
+        pendingCount.textContent = `${pending.length} unsaved change${pending.length === 1 ? '' : 's'}`;
+    }
+
+    function showErrors(messages) {
+        batchErrors.innerHTML = '';
+        messages.forEach(message => {
+            const line = document.createElement('div');
+            line.textContent = message;
+            batchErrors.appendChild(line);
         });
+        batchErrors.classList.toggle('d-none', messages.length === 0);
     }
-    
-    // Function to handle appliance removal
-    function removeAppliance(button) {
-        const applianceId = button.getAttribute('data-id');
-        fetch(`/appliance/${applianceId}/delete/`, {
+
+    // Send every pending edit in one request; resolves once the list matches the server
+    function save() {
+        if (saving) {
+            return saving;
+        }
+        if (pending.length === 0) {
+            return Promise.resolve();
+        }
+        const sent = pending;
+        saveButton.disabled = true;
+        saving = fetch(batchUrl, {
             method: 'POST',
             headers: {
-                'X-CSRFToken': '{{ csrf_token }}',
-                'Content-Type': 'application/json'
+                'X-CSRFToken': csrfToken,
+                'Content-Type': 'application/json',
+                'X-Requested-With': 'XMLHttpRequest'
             },
-            body: JSON.stringify({})
+            body: JSON.stringify({operations: sent})
         })
-        .then(response => response.json())
-        .then(data => {
-            if (data.success) {
-                button.closest('.list-group-item').remove();
-                const appliancesList = document.getElementById('appliances-list');
-                if (appliancesList.children.length === 0) {
-                    appliancesList.innerHTML = 
-                        '<div class="alert alert-info">No appliances added yet. Add an appliance above.</div>';
-                }
+        .then(response => response.json().then(data => ({ok: response.ok, data})))
+        .then(({ok, data}) => {
+            if (!ok) {
+                const messages = (data.errors || []).map(({index, errors}) => {
+                    const fields = Object.entries(errors).map(([field, list]) => `${field}: ${list.join(' ')}`);
+                    return `${sent[index].name || 'Appliance'} - ${fields.join('; ')}`;
+                });
+                showErrors([data.error].concat(messages));
+                throw new Error(data.error);
             }
+            appliances = data.appliances;
+            pending = pending.filter(op => !sent.includes(op));  // Keep edits made while saving
+            showErrors([]);
+            render();
+        })
+        .finally(() => {
+            saving = null;
+            saveButton.disabled = false;
         });
+        return saving;
     }
-    
-    // Add event listeners to all remove buttons
-    document.querySelectorAll('.remove-appliance').forEach(btn => {
-        btn.addEventListener('click', function() {
-            removeAppliance(this);
-        });
+
+    applianceForm.addEventListener('submit', function(e) {
+        e.preventDefault();
+        const formData = new FormData(this);
+        const typeSelect = document.getElementById('id_appliance_type');
+        const op = {
+            op: 'create',
+            ref: `new-${nextRef++}`,
+            appliance_type: formData.get('appliance_type') || '',
+            wattage: formData.get('wattage') || '',
+            hours_used: formData.get('hours_used'),
+            custom_name: formData.get('custom_name') || ''
+        };
+        op.name = op.custom_name || (typeSelect.value ? typeSelect.selectedOptions[0].textContent : 'Appliance');
+        pending.push(op);
+        this.reset();
+        render();
+    });
+
+    saveButton.addEventListener('click', function() {
+        save().catch(error => console.error('Error:', error));
+    });
+
+    // Save before leaving for the bill page; warn when leaving any other way with unsaved edits
+    document.getElementById('continue-to-bill').addEventListener('click', function(e) {
+        if (pending.length === 0) {
+            return;
+        }
+        e.preventDefault();
+        save().then(() => { window.location.href = this.href; })
+            .catch(error => console.error('Error:', error));
+    });
+    window.addEventListener('beforeunload', function(e) {
+        if (pending.length > 0 && !saving) {
+            e.preventDefault();
+            e.returnValue = '';
+        }
+    });
+
+    // Autocomplete models from the appliance catalog and fill in type and wattage
+    const modelInput = document.getElementById('id_custom_name');
+    const suggestions = document.getElementById('catalog-suggestions');
+    let catalogResults = [];
+    let catalogTimer = null;
+
+    modelInput.addEventListener('input', function() {
+        const selected = catalogResults.find(item => item.name === this.value);
+        if (selected) {
+            document.getElementById('id_appliance_type').value = selected.appliance_type;
+            document.getElementById('id_wattage').value = selected.wattage;
+            return;
+        }
+
+        clearTimeout(catalogTimer);
+        const query = this.value.trim();
+        if (query.length < 2) {
+            return;
+        }
+        catalogTimer = setTimeout(() => {
+            fetch(`${catalogUrl}?q=${encodeURIComponent(query)}`)
+                .then(response => response.json())
+                .then(data => {
+                    catalogResults = data.results;
+                    suggestions.innerHTML = '';
+                    catalogResults.forEach(item => {
+                        const option = document.createElement('option');
+                        option.value = item.name;
+                        option.label = `${item.wattage}W${item.star_rating ? ', ' + item.star_rating + ' star' : ''}`;
+                        suggestions.appendChild(option);
+                    });
+                })
+                .catch(error => console.error('Error:', error));
+        }, 150);
     });
-});
\ No newline at end of file
+
+    render();
+});
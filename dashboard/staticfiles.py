@@ -0,0 +1,140 @@
+"""
+Content-hashed, precompressed static files.
+
+- CompressedManifestStaticFilesStorage: `collectstatic` writes every file
+  under a content-hashed name (styles.css -> styles.4b1c9e0f2a7d.css) and,
+  for text assets, `.gz` and `.br` siblings when they come out smaller
+- PrecompressedStaticMiddleware: serves STATIC_URL from STATIC_ROOT, picking
+  the smallest variant the client accepts; hashed names never change
+  content, so they are sent as immutable for a year
+
+Under DEBUG, `{% static %}` keeps the plain names and runserver serves the
+source files as before.
+"""
+import gzip
+import mimetypes
+import os
+import re
+
+import brotli
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse, HttpResponseNotAllowed
+from django.utils.cache import patch_vary_headers
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.mjs', '.map', '.svg', '.json', '.txt', '.html', '.xml',
+                           '.ico', '.ttf', '.eot'}
+MIN_COMPRESS_SIZE = 256        # Bytes; smaller files gain less than the header overhead
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+UNHASHED_MAX_AGE = 60          # Files requested by their plain name can change on deploy
+
+# Content coding and file suffix of each variant, best first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+
+def compress(data):
+    """{encoding: compressed bytes} for the variants smaller than `data`"""
+    variants = {
+        'gzip': gzip.compress(data, compresslevel=9, mtime=0),
+        'br': brotli.compress(data, quality=11),
+    }
+    return {encoding: body for encoding, body in variants.items() if len(body) < len(data)}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also writes .gz/.br variants of the hashed files"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in self.hashed_files.values():
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            path = self.path(name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < MIN_COMPRESS_SIZE:
+                continue
+            for encoding, body in compress(data).items():
+                with open(path + dict(ENCODINGS)[encoding], 'wb') as f:
+                    f.write(body)
+
+
+def accepted_encodings(header):
+    """Content codings the Accept-Encoding header allows (q=0 excluded)"""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class PrecompressedStaticMiddleware:
+    """Serves collected static files, precompressed and with far-future cache headers"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.root = os.path.realpath(settings.STATIC_ROOT) if getattr(settings, 'STATIC_ROOT', None) else None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        path = self.collected_path(request)
+        if path is None:
+            return self.get_response(request)  # Not collected: let Django answer (404, or runserver's handler)
+        return self.serve(request, path)
+
+    async def __acall__(self, request):
+        path = self.collected_path(request)  # A few stat calls, cheap enough for the event loop
+        if path is None:
+            return await self.get_response(request)
+        return self.serve(request, path)
+
+    def collected_path(self, request):
+        if self.root is None or not request.path.startswith(self.prefix):
+            return None
+        path = os.path.realpath(os.path.join(self.root, request.path[len(self.prefix):]))
+        if not path.startswith(self.root + os.sep) or not os.path.isfile(path):
+            return None
+        return path
+
+    def serve(self, request, path):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+
+        # Step 1: smallest variant the client accepts
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        served, encoding = path, None
+        for coding, suffix in ENCODINGS:
+            if coding in accepted and os.path.isfile(path + suffix):
+                served, encoding = path + suffix, coding
+                break
+
+        # Step 2: headers; the type is the original file's, not the .gz/.br one's
+        response = FileResponse(open(served, 'rb'))
+        content_type, _ = mimetypes.guess_type(path)
+        response['Content-Type'] = content_type or 'application/octet-stream'
+        if encoding:
+            response['Content-Encoding'] = encoding
+        if any(os.path.isfile(path + suffix) for _, suffix in ENCODINGS):
+            patch_vary_headers(response, ['Accept-Encoding'])
+        if HASHED_NAME.search(path):
+            response['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        else:
+            response['Cache-Control'] = f'public, max-age={UNHASHED_MAX_AGE}'
+        return response
@@ -0,0 +1,151 @@
+"""
+Slab-based electricity tariffs for Indian DISCOMs.
+
+Slab definitions are compiled once per process into NumPy lookup arrays so a
+bill can be converted between kWh and rupees for a single value or for
+millions of values in one vectorized call.
+"""
+import logging
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TARIFF = 'IN-AVG'
+
+# Domestic (LT residential) tariffs. Each slab is (upper kWh bound, rate per kWh);
+# the last slab is open-ended. Fixed charges are per month.
+TARIFF_SLABS = {
+    'IN-AVG': {
+        'name': 'India (national average)',
+        'fixed_charge': 60,
+        'slabs': [(100, 4.5), (300, 7.0), (500, 9.0), (None, 11.0)],
+    },
+    'MH-MSEDCL': {
+        'name': 'Maharashtra (MSEDCL)',
+        'fixed_charge': 128,
+        'slabs': [(100, 5.58), (300, 10.81), (500, 14.78), (1000, 16.74), (None, 18.93)],
+    },
+    'DL-BSES': {
+        'name': 'Delhi (BSES)',
+        'fixed_charge': 20,
+        'slabs': [(200, 3.0), (400, 4.5), (800, 6.5), (1200, 7.0), (None, 8.0)],
+    },
+    'KA-BESCOM': {
+        'name': 'Karnataka (BESCOM)',
+        'fixed_charge': 110,
+        'slabs': [(None, 5.9)],
+    },
+    'TN-TANGEDCO': {
+        'name': 'Tamil Nadu (TANGEDCO)',
+        'fixed_charge': 0,
+        'slabs': [(100, 0.0), (200, 2.35), (400, 4.7), (500, 6.3), (600, 8.4),
+                  (800, 9.45), (1000, 10.5), (None, 11.55)],
+    },
+}
+
+
+class Tariff:
+    """A compiled slab tariff that converts between kWh and bill amount"""
+
+    def __init__(self, code, name, fixed_charge, slabs):
+        if not slabs:
+            raise ValueError(f"Tariff {code} must define at least one slab")
+        if slabs[-1][0] is not None:
+            raise ValueError(f"The last slab of tariff {code} must be open-ended")
+        if slabs[-1][1] <= 0:
+            raise ValueError(f"The last slab of tariff {code} must have a positive rate")
+
+        self.code = code
+        self.name = name
+        self.fixed_charge = float(fixed_charge)
+
+        # Lower kWh bound and rate of every slab
+        self.bounds = np.array([0.0] + [float(upper) for upper, _ in slabs[:-1]])
+        self.rates = np.array([float(rate) for _, rate in slabs])
+        if np.any(np.diff(self.bounds) <= 0):
+            raise ValueError(f"Slab bounds of tariff {code} must be increasing")
+
+        # Energy charge accumulated up to each slab's lower bound
+        widths = np.diff(self.bounds)
+        self.cumulative = np.concatenate(([0.0], np.cumsum(widths * self.rates[:-1])))
+
+    def __repr__(self):
+        return f"<Tariff {self.code}>"
+
+    def kwh_to_amount(self, kwh):
+        """Bill amount (including the fixed charge) for one or many kWh values"""
+        units = np.maximum(np.asarray(kwh, dtype=np.float64), 0.0)
+        idx = np.searchsorted(self.bounds, units, side='right') - 1
+        amount = self.fixed_charge + self.cumulative[idx] + (units - self.bounds[idx]) * self.rates[idx]
+        return _unwrap(amount, kwh)
+
+    def amount_to_kwh(self, amount):
+        """
+        kWh consumed for one or many bill amounts (the inverse of kwh_to_amount).
+        Where a zero-rate slab makes the inverse ambiguous the largest kWh is returned.
+        """
+        energy = np.maximum(np.asarray(amount, dtype=np.float64) - self.fixed_charge, 0.0)
+        idx = np.searchsorted(self.cumulative, energy, side='right') - 1
+        units = self.bounds[idx] + (energy - self.cumulative[idx]) / self.rates[idx]
+        return _unwrap(units, amount)
+
+    def average_rate(self, kwh):
+        """Effective rupees per kWh (fixed charge included) at the given consumption"""
+        units = np.maximum(np.asarray(kwh, dtype=np.float64), 1e-9)
+        return _unwrap(np.asarray(self.kwh_to_amount(units)) / units, kwh)
+
+
+def _unwrap(result, original):
+    """Return a plain float for scalar input, an array otherwise"""
+    if np.ndim(original) == 0:
+        return float(result)
+    return result
+
+
+_compiled = {}
+_unknown = set()  # Stored codes already warned about
+
+
+def tariff_definitions():
+    """Built-in slab definitions merged with any TARIFF_SLABS from settings"""
+    return {**TARIFF_SLABS, **getattr(settings, 'TARIFF_SLABS', {})}
+
+
+def tariff_choices():
+    return [(code, definition['name']) for code, definition in tariff_definitions().items()]
+
+
+def get_tariff(code=None):
+    """Return the compiled tariff for a code, defaulting to settings.DEFAULT_TARIFF"""
+    code = code or getattr(settings, 'DEFAULT_TARIFF', DEFAULT_TARIFF)
+    tariff = _compiled.get(code)
+    if tariff is None:
+        definitions = tariff_definitions()
+        if code not in definitions:
+            raise ValueError(f"Unknown tariff: {code}")
+        definition = definitions[code]
+        tariff = Tariff(code, definition['name'], definition['fixed_charge'], definition['slabs'])
+        _compiled[code] = tariff
+    return tariff
+
+
+def stored_tariff(code):
+    """
+    get_tariff for a code stored on a household: a code no longer in the
+    definitions (removed from settings.TARIFF_SLABS) falls back to the default
+    with a warning instead of raising.
+    """
+    try:
+        return get_tariff(code)
+    except ValueError:
+        if code not in _unknown:
+            _unknown.add(code)
+            logger.warning("Unknown stored tariff, using the default", extra={'tariff': code})
+        return get_tariff()
+
+
+def household_tariff(household):
+    """Compiled tariff for a household, falling back to the default"""
+    return stored_tariff(getattr(household, 'tariff', None))
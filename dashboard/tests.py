@@ -1,3 +1,781 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import re
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.http import HttpResponse
+from django.contrib import admin
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import anomalies, async_views, db, jobs, neighbours, routers, search, staticfiles, urls, usage
+from .admin import ApplianceAdmin
+from .catalog import DEFAULT_CATALOG_PATH, ApplianceCatalog
+from .forecasting import current_forecasts, current_month, fit_forecasts
+from .gemini_api import GeminiAPI
+from .load_profile import household_load_profile, spread_hours, TEMPLATES, TYPE_INDEX
+from .management.commands import recompute_ratings
+from .models import Appliance, BillAnomaly, BillForecast, CohortBaseline, ElectricityBill, GeminiUsage, Household, HouseholdTip, TipJob, User
+from .neighbours import NeighbourIndex
+from .simulator import MAX_SCENARIOS, simulate_savings
+from .tariffs import DEFAULT_TARIFF, get_tariff, household_tariff
+from .utils import monthly_appliance_kwh
+
+PASSWORD = 'Test-pass-2024'
+CACHED_AUTH = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+    'AUTHENTICATION_BACKENDS': ['dashboard.auth.CachedModelBackend'],
+}
+
+
+def make_household(email='user@example.com', appliances=(('AC', 1500, 6), ('TV', 100, 4)), bill=True, **fields):
+    """A user with a household, some appliances and (optionally) a bill for last month"""
+    user = User.objects.create_user(email=email, password=PASSWORD)
+    household = Household.objects.create(user=user, **{'members': 4, 'rooms': 3, **fields})
+    for code, wattage, hours in appliances:
+        Appliance.objects.create(household=household, appliance_type=code, wattage=wattage, hours_used=hours)
+    if bill:
+        last_month = (current_month() - datetime.timedelta(days=1)).replace(day=1)
+        ElectricityBill.objects.create(household=household, month=last_month, amount=2500, units_consumed=300)
+    return user, household
+
+
+class TariffTests(TestCase):
+    def test_slab_amounts(self):
+        tariff = get_tariff('IN-AVG')
+        self.assertEqual(tariff.kwh_to_amount(0), 60)
+        self.assertAlmostEqual(tariff.kwh_to_amount(100), 60 + 100 * 4.5)
+        self.assertAlmostEqual(tariff.kwh_to_amount(250), 60 + 100 * 4.5 + 150 * 7.0)
+        self.assertAlmostEqual(tariff.kwh_to_amount(600), 60 + 450 + 1400 + 1800 + 100 * 11.0)
+
+    def test_amount_to_kwh_inverts_kwh_to_amount(self):
+        kwh = np.array([0.5, 99, 100, 101, 299.5, 450, 1200])
+        for code in ('IN-AVG', 'MH-MSEDCL', 'DL-BSES', 'KA-BESCOM'):
+            tariff = get_tariff(code)
+            np.testing.assert_allclose(tariff.amount_to_kwh(tariff.kwh_to_amount(kwh)), kwh)
+
+    def test_zero_rate_slab_takes_the_largest_kwh(self):
+        self.assertEqual(get_tariff('TN-TANGEDCO').amount_to_kwh(0), 100)
+
+    def test_unknown_code_raises(self):
+        with self.assertRaises(ValueError):
+            get_tariff('NOPE')
+
+    def test_removed_household_tariff_falls_back_to_default(self):
+        household = Household(members=2, rooms=2, tariff='REMOVED')
+        with self.assertLogs('dashboard.tariffs', 'WARNING'):
+            self.assertEqual(household_tariff(household).code, DEFAULT_TARIFF)
+
+
+class SimulateTests(TestCase):
+    def setUp(self):
+        self.user, self.household = make_household()
+        self.client.force_login(self.user)
+
+    def post(self, body):
+        return self.client.post(reverse('simulate'), json.dumps(body), content_type='application/json')
+
+    def test_ranks_scenarios(self):
+        appliance = Appliance.objects.filter(household=self.household, appliance_type='AC').get()
+        response = self.post({'appliances': {str(appliance.id): {'hour_reductions': [1, 2]}}})
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual(result['evaluated'], 3)
+        self.assertGreater(result['scenarios'][0]['rupees_saved'], 0)
+
+    def test_rejects_payloads_of_the_wrong_shape(self):
+        for body in ([1, 2], {'appliances': [1]}, {'appliances': {'1': [1]}}, {'tariffs': 'IN-AVG'},
+                     {'limit': 'many'}):
+            with self.subTest(body=body):
+                self.assertEqual(self.post(body).status_code, 400)
+
+    def test_scenario_limit_cannot_overflow(self):
+        appliances = [Appliance(id=i, appliance_type='LT', wattage=60, hours_used=5) for i in range(16)]
+        # 16 ** 16 == 2 ** 64 scenarios, which a 64-bit product wraps to 0
+        options = {str(i): {'hour_reductions': list(range(1, 16))} for i in range(16)}
+        with self.assertRaisesMessage(ValueError, f'the limit is {MAX_SCENARIOS}'):
+            simulate_savings(self.household, appliances, None, options=options)
+
+
+class UpgradeTests(TestCase):
+    def setUp(self):
+        self.user, self.household = make_household()
+        self.client.force_login(self.user)
+
+    def get(self, **params):
+        return self.client.get(reverse('upgrades'), params)
+
+    def test_recommends_within_budget(self):
+        result = self.get(budget=40000).json()
+        self.assertEqual(result['solver'], 'exact')
+        self.assertLessEqual(result['spent'], 40000)
+
+    def test_rejects_bad_budgets(self):
+        for budget in ('inf', '-inf', 'nan', '-1', 'lots'):
+            with self.subTest(budget=budget):
+                self.assertEqual(self.get(budget=budget).status_code, 400)
+
+    def test_exact_solver_falls_back_to_greedy_for_huge_budgets(self):
+        response = self.get(budget='1e11', solver='exact')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['solver'], 'greedy')
+
+
+class CatalogReloadTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'catalog.csv')
+        shutil.copy(DEFAULT_CATALOG_PATH, self.path)
+        self.catalog = ApplianceCatalog(self.path)
+
+    def rewrite(self, extra):
+        with open(self.path, 'a') as f:
+            f.write(extra)
+        mtime = os.path.getmtime(self.path) + 10
+        os.utime(self.path, (mtime, mtime))
+        self.catalog._checked_at = float('-inf')  # Skip the throttle
+
+    def test_reloads_a_changed_file(self):
+        count = len(self.catalog)
+        self.rewrite('Testco,TX-1,FR,180,5\n')
+        self.assertTrue(self.catalog.reload_if_changed())
+        self.assertEqual(len(self.catalog), count + 1)
+        self.assertEqual(self.catalog.lookup('testco tx-1')['wattage'], 180)
+
+    def test_keeps_the_last_good_catalog_when_the_file_does_not_parse(self):
+        count = len(self.catalog)
+        self.rewrite('Testco,TX-1,FR,lots,5\n')
+        with self.assertLogs('dashboard.catalog', 'ERROR'):
+            self.assertFalse(self.catalog.reload_if_changed())
+        self.assertEqual(len(self.catalog), count)
+        self.catalog._checked_at = float('-inf')
+        self.assertFalse(self.catalog.reload_if_changed())  # The same broken file is not parsed again
+
+
+class NeighbourIndexTests(TestCase):
+    def test_uses_each_households_latest_bill(self):
+        _, first = make_household('first@example.com')
+        _, second = make_household('second@example.com')
+        ElectricityBill.objects.create(household=first, month=datetime.date(2020, 1, 1), amount=900,
+                                       units_consumed=120)
+        index = NeighbourIndex.build()
+        self.assertEqual(sorted(index.household_ids.tolist()), [first.id, second.id])
+        np.testing.assert_allclose(index.kwh, [300, 300])
+
+    def test_failed_rebuild_backs_off(self):
+        self.addCleanup(setattr, neighbours, '_retry_after', 0.0)
+        with mock.patch.object(NeighbourIndex, 'build', side_effect=RuntimeError('boom')), \
+                mock.patch.object(neighbours.connection, 'close'), self.assertLogs('dashboard.neighbours'):
+            neighbours._rebuild()
+        self.assertFalse(neighbours._rebuilding)
+        with mock.patch.object(neighbours.threading, 'Thread') as thread:
+            neighbours.start_rebuild()
+            thread.assert_not_called()
+            with mock.patch.object(neighbours.time, 'time', return_value=neighbours._retry_after + 1):
+                neighbours.start_rebuild()
+            thread.assert_called_once()
+        neighbours._rebuilding = False
+
+
+class AnomalyTests(TestCase):
+    def add_bills(self, household, units):
+        for month, kwh in enumerate(units, start=1):
+            ElectricityBill.objects.create(household=household, month=datetime.date(2023, month, 1),
+                                           amount=kwh * 7, units_consumed=kwh)
+
+    def test_robust_z_matches_a_per_group_loop(self):
+        rng = np.random.default_rng(0)
+        groups = rng.integers(0, 20, 500)
+        values = rng.gamma(4, 50, 500)
+        z, (keys, medians, mads, counts) = anomalies.robust_z(groups, values, min_count=20)
+        for key, median, mad, count in zip(keys, medians, mads, counts):
+            members = values[groups == key]
+            self.assertEqual(median, np.median(members))
+            self.assertEqual(mad, max(np.median(np.abs(members - median)), 0.05 * median, 1.0))
+            expected = 0.6745 * (members - median) / mad if count >= 20 else np.full(count, np.nan)
+            np.testing.assert_allclose(z[groups == key], expected)
+
+    def test_saving_a_bill_scores_it(self):
+        _, household = make_household(appliances=(), bill=False)
+        self.add_bills(household, [300, 310, 290, 305])
+        self.assertFalse(BillAnomaly.objects.exists())
+
+        spike = ElectricityBill.objects.create(household=household, month=datetime.date(2023, 5, 1),
+                                               amount=8400, units_consumed=1200)
+        self.assertEqual(BillAnomaly.objects.get(bill=spike).flags, 'spike')
+
+        spike.units_consumed = 300
+        spike.save()
+        self.assertFalse(BillAnomaly.objects.filter(bill=spike).exists())
+
+    def test_full_run_flags_outliers_and_stores_cohort_baselines(self):
+        _, household = make_household(appliances=(), bill=False)
+        self.add_bills(household, [300, 310, 290, 305, 1200])
+        _, other = make_household('other@example.com', appliances=(), bill=False)
+        self.add_bills(other, [280, 300, 320])
+        BillAnomaly.objects.all().delete()
+
+        summary = anomalies.detect_anomalies()
+        self.assertEqual((summary['bills'], summary['flagged']), (8, 1))
+        anomaly = BillAnomaly.objects.get()
+        self.assertEqual((anomaly.bill.units_consumed, anomaly.flags), (1200, 'spike'))
+        self.assertIsNone(anomaly.cohort_score)  # 8 bills: too few for a cohort
+        baseline = CohortBaseline.objects.get(members=4, rooms=3)
+        self.assertEqual((baseline.bills, baseline.median_kwh), (8, 302.5))
+
+
+class ForecastTests(TestCase):
+    def test_only_households_with_a_recent_bill_get_a_forecast(self):
+        _, recent = make_household('recent@example.com')
+        _, stale = make_household('stale@example.com', bill=False)
+        ElectricityBill.objects.create(household=stale, month=datetime.date(2020, 1, 1), amount=2000)
+        BillForecast.objects.create(household=stale, month=datetime.date(2020, 2, 1), kwh=1, kwh_lower=1,
+                                    kwh_upper=1, amount=1, method='last_value')
+
+        summary = fit_forecasts()
+        self.assertEqual((summary['households'], summary['skipped_stale']), (1, 1))
+        self.assertEqual(list(BillForecast.objects.values_list('household_id', 'month')),
+                         [(recent.id, current_month())])
+        self.assertEqual(current_forecasts().count(), 1)
+
+
+class LoadProfileTests(TestCase):
+    def test_spreading_keeps_the_daily_hours(self):
+        hours = np.array([1, 8, 15, 20, 24])
+        for code in ('WM', 'AC', 'LT'):
+            duty = spread_hours(hours.astype(float), TEMPLATES[[TYPE_INDEX[code]] * len(hours)])
+            np.testing.assert_allclose(duty.sum(axis=1), hours)
+            self.assertLessEqual(duty.max(), 1.0 + 1e-9)
+
+    def test_daily_kwh_matches_the_consumption_estimate(self):
+        appliances = [Appliance(appliance_type='LT', wattage=60, hours_used=12),
+                      Appliance(appliance_type='AC', wattage=1500, hours_used=20)]
+        profile = household_load_profile(appliances, flat_rate=7.0)
+        expected = sum(monthly_appliance_kwh(app.wattage, app.hours_used, 30) for app in appliances)
+        self.assertAlmostEqual(profile['daily_kwh'] * 30, expected, delta=0.5)
+
+
+class RecomputeRatingsTests(TestCase):
+    def setUp(self):
+        self.households = [make_household(f'user{i}@example.com')[1] for i in range(3)]
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.checkpoint = os.path.join(directory, 'checkpoint.json')
+        # Run the shards in this process: forked workers cannot see the test database
+        pool = mock.MagicMock()
+        pool.Pool.return_value.__enter__.return_value.imap_unordered.side_effect = map
+        self.enterContext(mock.patch.object(recompute_ratings.multiprocessing, 'get_context', return_value=pool))
+        self.enterContext(mock.patch.object(recompute_ratings.connections, 'close_all'))
+
+    def run_command(self, fingerprint):
+        with open(self.checkpoint, 'w') as f:
+            json.dump({'fingerprint': fingerprint, 'shard_size': 1, 'completed': [self.households[0].id]}, f)
+        out = StringIO()
+        call_command('recompute_ratings', shard_size=1, checkpoint=self.checkpoint, stdout=out)
+        self.assertFalse(os.path.exists(self.checkpoint))
+        rated = Household.objects.filter(rating__isnull=False).values_list('id', flat=True)
+        return sorted(rated), out.getvalue()
+
+    def test_resumes_a_checkpoint_with_the_same_fingerprint(self):
+        rated, out = self.run_command(recompute_ratings.ratings_fingerprint())
+        self.assertEqual(rated, [household.id for household in self.households[1:]])
+        self.assertIn('Resuming: 1 of 3 shards already done', out)
+
+    def test_starts_over_after_a_tariff_or_rating_change(self):
+        rated, out = self.run_command('stale')
+        self.assertEqual(rated, [household.id for household in self.households])
+        self.assertIn('starting over', out)
+
+    def test_fingerprint_follows_the_tariffs(self):
+        fingerprint = recompute_ratings.ratings_fingerprint()
+        self.assertEqual(recompute_ratings.ratings_fingerprint(), fingerprint)
+        with override_settings(DEFAULT_TARIFF='TN-TANGEDCO'):
+            self.assertNotEqual(recompute_ratings.ratings_fingerprint(), fingerprint)
+        with mock.patch.object(recompute_ratings, 'tariff_definitions', return_value={}):
+            self.assertNotEqual(recompute_ratings.ratings_fingerprint(), fingerprint)
+
+
+class TipJobTests(TestCase):
+    def setUp(self):
+        _, self.household = make_household()
+
+    def test_changes_coalesce_into_one_pending_job(self):
+        job = jobs.enqueue_tips(self.household)
+        Appliance.objects.create(household=self.household, appliance_type='FR', wattage=200, hours_used=24)
+        self.assertEqual(jobs.enqueue_tips(self.household).id, job.id)
+        job = TipJob.objects.get()
+        self.assertEqual(job.input_hash, jobs.payload_hash(jobs.household_payload(self.household)))
+
+    def test_a_job_is_claimed_once(self):
+        job = jobs.enqueue_tips(self.household)
+        self.assertEqual([claimed.id for claimed in jobs.claim_jobs(10)], [job.id])
+        self.assertEqual(jobs.claim_jobs(10), [])
+        TipJob.objects.filter(id=job.id).update(locked_at=timezone.now() - datetime.timedelta(hours=1))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual([claimed.id for claimed in jobs.claim_jobs(10)], [job.id])
+
+    def test_run_stores_the_tip_and_current_tips_are_not_requeued(self):
+        jobs.enqueue_tips(self.household)
+        [job] = jobs.claim_jobs(1)
+        with mock.patch.object(GeminiAPI, 'generate_response', return_value='Run the AC at 24C.') as generate:
+            self.assertEqual(jobs.run_job(job), TipJob.DONE)
+        generate.assert_called_once()
+        self.assertEqual(HouseholdTip.objects.get(household=self.household).text, 'Run the AC at 24C.')
+        self.assertIsNone(jobs.enqueue_tips(self.household))
+
+    def test_failures_back_off_then_fail(self):
+        jobs.enqueue_tips(self.household)
+        with mock.patch.object(GeminiAPI, 'generate_response', side_effect=RuntimeError('quota')):
+            [job] = jobs.claim_jobs(1)
+            self.assertEqual(jobs.run_job(job), TipJob.PENDING)
+            job = TipJob.objects.get()
+            self.assertEqual((job.attempts, job.last_error), (1, 'quota'))
+            self.assertGreater(job.run_after, timezone.now())
+            self.assertEqual(jobs.claim_jobs(1), [])
+
+            job.attempts = jobs.MAX_ATTEMPTS - 1
+            self.assertEqual(jobs.run_job(job), TipJob.FAILED)
+        self.assertEqual(TipJob.objects.get().status, TipJob.FAILED)
+
+
+class MetricsAccessTests(TestCase):
+    @override_settings(METRICS_TOKEN=None)
+    def test_staff_only_without_a_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        user, _ = make_household()
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        user.is_staff = True
+        user.save()
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_bearer_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer s3cret'})
+        self.assertEqual(response.status_code, 200)
+
+
+class SerializedWriteTests(TransactionTestCase):
+    def setUp(self):
+        self.sleep = self.enterContext(mock.patch.object(db.time, 'sleep'))
+
+    def test_retries_a_locked_write(self):
+        write = mock.Mock(side_effect=[OperationalError('database is locked')] * 2 + ['saved'])
+        with self.assertLogs('dashboard.db', 'WARNING'):
+            self.assertEqual(db.serialized_write(write, 1, flag=True), 'saved')
+        self.assertEqual(write.call_count, 3)
+        write.assert_called_with(1, flag=True)
+        self.assertEqual(self.sleep.call_count, 2)
+
+    @override_settings(DB_WRITE_RETRIES=3)
+    def test_gives_up_after_the_last_retry(self):
+        write = mock.Mock(side_effect=OperationalError('database is locked'))
+        with self.assertRaises(OperationalError), self.assertLogs('dashboard.db', 'WARNING'):
+            db.serialized_write(write)
+        self.assertEqual(write.call_count, 3)
+
+    def test_other_errors_and_outer_transactions_are_not_retried(self):
+        write = mock.Mock(side_effect=OperationalError('no such table: dashboard_appliance'))
+        with self.assertRaises(OperationalError):
+            db.serialized_write(write)
+        self.assertEqual(write.call_count, 1)
+
+        write = mock.Mock(side_effect=OperationalError('database is locked'))
+        with self.assertRaises(OperationalError), transaction.atomic():
+            db.serialized_write(write)
+        self.assertEqual(write.call_count, 1)
+        self.sleep.assert_not_called()
+
+
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.enterContext(mock.patch.object(routers, 'replica_aliases', return_value=['replica1']))
+        self.router = routers.PrimaryReplicaRouter()
+
+    def route(self, view, method='get', cookies=None, write=False, model=Appliance, namespace='', url_name='view'):
+        """Database the view's first read goes to, and the response"""
+        request = getattr(RequestFactory(), method)('/')
+        request.COOKIES.update(cookies or {})
+        request.resolver_match = mock.Mock(namespace=namespace, url_name=url_name)
+        reads = []
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            reads.append(self.router.db_for_read(model))
+            if write:
+                self.router.db_for_write(model)
+            return HttpResponse()
+
+        middleware = routers.ReplicaRoutingMiddleware(get_response)
+        response = middleware(request)
+        return reads[0], response
+
+    def test_only_marked_gets_and_admin_changelists_read_replicas(self):
+        marked = routers.replica_reads(lambda request: None)
+        self.assertEqual(self.route(marked)[0], 'replica1')
+        self.assertEqual(self.route(lambda request: None, namespace='admin',
+                                    url_name='dashboard_household_changelist')[0], 'replica1')
+        self.assertEqual(self.route(lambda request: None)[0], 'default')
+        self.assertEqual(self.route(marked, method='post')[0], 'default')
+        self.assertEqual(self.route(marked, model=Session)[0], 'default')
+        self.assertEqual(self.router.db_for_read(Appliance), 'default')  # Outside a request
+
+    def test_a_write_pins_the_clients_reads_to_the_primary(self):
+        marked = routers.replica_reads(lambda request: None)
+        _, response = self.route(marked, method='post', write=True)
+        cookie = response.cookies[routers.STICKY_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_STICKY_SECONDS)
+        self.assertEqual(self.route(marked, cookies={routers.STICKY_COOKIE: cookie.value})[0], 'default')
+        with mock.patch.object(routers.time, 'time', return_value=float(cookie.value) + 1):
+            self.assertEqual(self.route(marked, cookies={routers.STICKY_COOKIE: cookie.value})[0], 'replica1')
+        self.assertEqual(self.route(marked, cookies={routers.STICKY_COOKIE: 'junk'})[0], 'replica1')
+        self.assertNotIn(routers.STICKY_COOKIE, self.route(marked)[1].cookies)
+
+
+class CursorChangelistTests(TestCase):
+    def setUp(self):
+        for i in range(3):
+            _, household = make_household(f'user{i}@example.com', appliances=[('LT', 60, 1), ('FN', 75, 2)])
+            ElectricityBill.objects.create(household=household, month=datetime.date(2024, 1, 1), amount=900)
+        staff = User.objects.create_superuser(email='staff@example.com', password=PASSWORD)
+        self.client.force_login(staff)
+
+    def walk(self, model, query=''):
+        """Ids of every row, following the next links of the changelist 2 rows at a time"""
+        url = reverse(f'admin:dashboard_{model._meta.model_name}_changelist')
+        ids = []
+        with mock.patch.object(admin.site._registry[model], 'list_per_page', 2):
+            while query is not None:
+                changelist = self.client.get(url + query).context['cl']
+                self.assertNotIn('cursor', changelist.get_query_string())
+                self.assertLessEqual(len(changelist.result_list), 2)
+                ids.extend(row.pk for row in changelist.result_list)
+                query = changelist.next_page_query
+        return ids
+
+    def test_pages_follow_the_admin_ordering(self):
+        for model in (Appliance, ElectricityBill):
+            admin_ordering = admin.site._registry[model].ordering
+            expected = list(model.objects.order_by(*admin_ordering).values_list('id', flat=True))
+            self.assertEqual(self.walk(model), expected)
+            self.assertEqual(self.walk(model, '?cursor=junk')[:2], expected[:2])
+
+    def test_orderings_without_a_keyset_use_offset_pages(self):
+        url = reverse('admin:dashboard_appliance_changelist')
+        changelist = self.client.get(url, {'o': '3'}).context['cl']  # By household, a relation
+        self.assertIsNotNone(changelist.paginator)
+        self.assertEqual(changelist.result_count, 6)
+
+
+class SearchFallbackTests(TestCase):
+    def setUp(self):
+        _, self.household = make_household('ravi.kumar@example.com')
+        Appliance.objects.filter(household=self.household, appliance_type='TV').update(custom_name='Samsung QLED')
+        make_household('someone@example.com')
+        self.admin = ApplianceAdmin(Appliance, admin.site)
+        self.request = RequestFactory().get('/')
+
+    def search(self, term):
+        queryset, _ = self.admin.get_search_results(self.request, Appliance.objects.all(), term)
+        return set(queryset.values_list('id', flat=True))
+
+    def expected(self, **lookup):
+        return set(Appliance.objects.filter(**lookup).values_list('id', flat=True))
+
+    def test_index_and_like_search_agree(self):
+        if not search.is_installed():
+            self.skipTest("SQLite without FTS5 trigram support")
+        self.assertEqual(self.search('ravi.kumar'), self.expected(household=self.household))
+        self.assertEqual(self.search('qled'), self.expected(custom_name='Samsung QLED'))
+
+    def test_short_terms_use_the_like_search(self):
+        with mock.patch.object(search, 'search_filter') as search_filter:
+            self.assertEqual(self.search('ra'), self.expected(household=self.household))
+        search_filter.assert_not_called()
+
+    def test_without_the_index_the_like_search_is_used(self):
+        with mock.patch.object(search, 'is_installed', return_value=False):
+            self.assertEqual(self.search('qled'), self.expected(custom_name='Samsung QLED'))
+
+    def test_staff_search_endpoint(self):
+        staff = User.objects.create_user(email='staff@example.com', password=PASSWORD, is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(reverse('staff_search'), {'q': 'ra'}).status_code, 400)
+        with mock.patch.object(search, 'is_installed', return_value=False):
+            self.assertEqual(self.client.get(reverse('staff_search'), {'q': 'qled'}).status_code, 503)
+
+    def test_staff_search_limit_is_clamped(self):
+        staff = User.objects.create_user(email='staff@example.com', password=PASSWORD, is_staff=True)
+        self.client.force_login(staff)
+        with mock.patch.object(search, 'is_installed', return_value=True), \
+                mock.patch.object(search, 'search', return_value=[]) as run_search:
+            for given, used in (('-1', 1), ('0', 1), ('7', 7), ('500', 50), ('many', 20)):
+                self.client.get(reverse('staff_search'), {'q': 'qled', 'limit': given})
+                self.assertEqual(run_search.call_args.kwargs['limit'], used)
+
+
+class APITests(TestCase):
+    def setUp(self):
+        self.user, self.household = make_household(appliances=[('LT', 60, i) for i in range(1, 8)])
+        self.client.force_login(self.user)
+
+    def test_cursor_pages_cover_every_appliance_once(self):
+        ids, url = [], reverse('api_appliances') + '?limit=3'
+        while url:
+            page = self.client.get(url).json()
+            ids += [row['id'] for row in page['results']]
+            url = page['next_cursor'] and reverse('api_appliances') + f"?limit=3&cursor={page['next_cursor']}"
+        self.assertEqual(ids, list(Appliance.objects.filter(household=self.household).order_by('id')
+                                   .values_list('id', flat=True)))
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(reverse('api_appliances'), {'cursor': 'not-a-cursor'}).status_code, 400)
+
+    def test_etag_revalidation(self):
+        response = self.client.get(reverse('api_appliances'))
+        etag = response['ETag']
+        self.assertEqual(self.client.get(reverse('api_appliances'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Another representation of the same data has its own ETag
+        self.assertNotEqual(self.client.get(reverse('api_appliances'), {'limit': 2})['ETag'], etag)
+
+        Appliance.objects.create(household=self.household, appliance_type='FR', wattage=200, hours_used=24)
+        response = self.client.get(reverse('api_appliances'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class BatchAppliancesTests(TestCase):
+    def setUp(self):
+        self.user, self.household = make_household()
+        self.client.force_login(self.user)
+        self.ac = Appliance.objects.get(household=self.household, appliance_type='AC')
+        self.tv = Appliance.objects.get(household=self.household, appliance_type='TV')
+
+    def post(self, operations):
+        return self.client.post(reverse('batch_appliances'), json.dumps({'operations': operations}),
+                                content_type='application/json')
+
+    def state(self):
+        return list(Appliance.objects.filter(household=self.household).order_by('id')
+                    .values_list('appliance_type', 'wattage', 'hours_used'))
+
+    def test_applies_every_operation(self):
+        response = self.post([
+            {'op': 'create', 'ref': 'new', 'appliance_type': 'FR', 'wattage': 200, 'hours_used': 24},
+            {'op': 'update', 'id': self.ac.id, 'hours_used': 3},
+            {'op': 'delete', 'id': self.tv.id},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('new', response.json()['created'])
+        self.assertEqual(self.state(), [('AC', 1500, 3), ('FR', 200, 24)])
+
+    def test_saves_nothing_when_any_operation_is_invalid(self):
+        before = self.state()
+        response = self.post([
+            {'op': 'create', 'appliance_type': 'FR', 'wattage': 200, 'hours_used': 24},
+            {'op': 'update', 'id': self.ac.id, 'hours_used': 3},
+            {'op': 'update', 'id': self.tv.id, 'hours_used': -1},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [2])
+        self.assertEqual(self.state(), before)
+
+    def test_cannot_touch_another_households_appliances(self):
+        _, other = make_household('other@example.com')
+        theirs = Appliance.objects.filter(household=other).first()
+        self.assertEqual(self.post([{'op': 'delete', 'id': theirs.id}]).status_code, 400)
+        self.assertTrue(Appliance.objects.filter(id=theirs.id).exists())
+
+    def test_rejects_bad_and_duplicate_refs_before_saving(self):
+        before = self.state()
+        fridge = {'op': 'create', 'appliance_type': 'FR', 'wattage': 200, 'hours_used': 24}
+        response = self.post([
+            {**fridge, 'ref': ['x']},
+            {**fridge, 'ref': True},
+            {**fridge, 'ref': 1},
+            {**fridge, 'ref': '1'},
+            {**fridge, 'ref': 'ok'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [0, 1, 3])
+        self.assertEqual(self.state(), before)
+
+
+class SessionTests(TestCase):
+    def setUp(self):
+        self.user, _ = make_household()
+
+    def logged_in_clients(self):
+        """Two clients sharing one session, as two worker processes would see it"""
+        first = Client()
+        first.login(email=self.user.email, password=PASSWORD)
+        second = Client()
+        second.cookies = first.cookies
+        return first, second
+
+    def assert_signed_out(self, client):
+        response = client.get(reverse('results'))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith(reverse('login')))
+
+    def test_uses_database_sessions_without_a_shared_cache(self):
+        if not settings.SHARED_CACHE:
+            self.assertEqual(settings.SESSION_ENGINE, 'django.contrib.sessions.backends.db')
+            self.assertEqual(settings.AUTHENTICATION_BACKENDS, ['django.contrib.auth.backends.ModelBackend'])
+
+    def test_logout_ends_the_session_everywhere(self):
+        first, second = self.logged_in_clients()
+        self.assertEqual(second.get(reverse('results')).status_code, 200)
+        first.get(reverse('logout'))
+        self.assert_signed_out(second)
+
+    @override_settings(**CACHED_AUTH)
+    def test_cached_user_is_dropped_on_deactivation(self):
+        _, client = self.logged_in_clients()
+        self.assertEqual(client.get(reverse('results')).status_code, 200)  # Caches the user
+        self.user.is_active = False
+        self.user.save()
+        self.assert_signed_out(client)
+
+    @override_settings(**CACHED_AUTH)
+    def test_password_change_ends_cached_sessions(self):
+        _, client = self.logged_in_clients()
+        self.assertEqual(client.get(reverse('results')).status_code, 200)
+        self.user.set_password('Another-pass-2024')
+        self.user.save()
+        self.assert_signed_out(client)
+
+
+class StaticFilesTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.enterContext(override_settings(STATIC_ROOT=root))
+        self.client = Client()
+        data = b'body { color: #222; }\n' * 50
+        for name in ('styles.0123456789ab.css', 'styles.css'):
+            with open(os.path.join(root, name), 'wb') as f:
+                f.write(data)
+        for encoding, body in staticfiles.compress(data).items():
+            with open(os.path.join(root, 'styles.0123456789ab.css' + dict(staticfiles.ENCODINGS)[encoding]), 'wb') as f:
+                f.write(body)
+
+    def get(self, name, accept_encoding=''):
+        return self.client.get(f'/static/{name}', HTTP_ACCEPT_ENCODING=accept_encoding)
+
+    def test_serves_the_best_encoding_the_client_accepts(self):
+        for accept_encoding, expected in (('gzip, br', 'br'), ('gzip, br;q=0', 'gzip'), ('identity', None), ('', None)):
+            response = self.get('styles.0123456789ab.css', accept_encoding)
+            self.assertEqual(response.get('Content-Encoding'), expected)
+            self.assertEqual(response['Content-Type'], 'text/css')
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_cache_headers(self):
+        hashed = self.get('styles.0123456789ab.css', 'br')
+        self.assertEqual(hashed['Cache-Control'], f'public, max-age={staticfiles.IMMUTABLE_MAX_AGE}, immutable')
+        plain = self.get('styles.css', 'br')
+        self.assertEqual(plain['Cache-Control'], f'public, max-age={staticfiles.UNHASHED_MAX_AGE}')
+        self.assertNotIn('Content-Encoding', plain)
+
+    def test_static_responses_get_the_security_headers(self):
+        self.assertEqual(self.get('styles.css')['X-Content-Type-Options'], 'nosniff')
+
+    def test_only_get_and_head(self):
+        with self.assertLogs('django.request', 'WARNING'):
+            self.assertEqual(self.client.post('/static/styles.css').status_code, 405)
+            self.assertEqual(self.get('../settings.py').status_code, 404)
+
+
+class GeminiQuotaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        usage._pending.clear()
+        self.user, _ = make_household()
+        self.client = Client(enforce_csrf_checks=True)
+        self.client.force_login(self.user)
+        self.client.get(reverse('tips'))  # Sets the CSRF cookie, as the page does
+
+    def chat(self, csrf=True):
+        headers = {'X-CSRFToken': self.client.cookies['csrftoken'].value} if csrf else {}
+        with mock.patch.object(GeminiAPI, 'generate_response', return_value='Switch it off.'):
+            return self.client.post(reverse('gemini_chat'), json.dumps({'message': 'Tips?'}),
+                                    content_type='application/json', headers=headers)
+
+    def test_requires_the_csrf_token(self):
+        self.assertEqual(self.chat(csrf=False).status_code, 403)
+        self.assertEqual(self.chat().status_code, 200)
+
+    def test_requires_a_user(self):
+        response = Client().post(reverse('gemini_chat'), '{}', content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(GEMINI_DAILY_TOKEN_QUOTA=1000, USAGE_FLUSH_SECONDS=10 ** 9)
+    def test_blocks_users_over_the_daily_quota(self):
+        usage.record(self.user.pk, {'promptTokenCount': 600, 'candidatesTokenCount': 300})
+        self.assertEqual(self.chat().status_code, 200)
+        usage.record(self.user.pk, {'promptTokenCount': 100, 'candidatesTokenCount': 0})
+        self.assertEqual(self.chat().status_code, 429)
+
+    @override_settings(USAGE_FLUSH_SECONDS=10 ** 9)
+    def test_seeded_counter_counts_stored_and_pending_tokens(self):
+        usage.record(self.user.pk, {'promptTokenCount': 500, 'candidatesTokenCount': 100})
+        usage.flush()
+        usage.record(self.user.pk, {'promptTokenCount': 40, 'candidatesTokenCount': 2})
+        cache.clear()  # Evicted: the next read seeds from the row plus the pending counts
+        self.assertEqual(usage.used_tokens(self.user.pk), 642)
+        usage.flush()
+        row = GeminiUsage.objects.get(user=self.user)
+        self.assertEqual((row.requests, row.prompt_tokens, row.completion_tokens), (2, 540, 102))
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.user, household = make_household()
+        BillAnomaly.objects.update_or_create(bill=ElectricityBill.objects.get(household=household),
+                                             defaults={'history_score': 4.2, 'flags': 'spike'})
+        BillForecast.objects.create(household=household, month=current_month(), kwh=310, kwh_lower=280,
+                                    kwh_upper=340, amount=2600, method='trend')
+        HouseholdTip.objects.create(household=household, text='Run the AC at 24C.', input_hash='x')
+
+    def pages(self, user):
+        """results and tips as the user sees them, with the per-render CSRF token blanked"""
+        self.client.force_login(user)
+        pages = []
+        for name in ('results', 'tips'):
+            response = self.client.get(reverse(name))
+            content = re.sub(r'name="csrfmiddlewaretoken" value="\w+"', 'name="csrfmiddlewaretoken"',
+                             response.content.decode())
+            pages.append((response.status_code, response.get('Location'), content))
+        return pages
+
+    def async_pages(self, user):
+        for pattern in urls.urlpatterns:
+            if getattr(pattern, 'name', None) in ('results', 'tips'):
+                self.enterContext(mock.patch.object(pattern, 'callback', getattr(async_views, pattern.name)))
+        return self.pages(user)
+
+    def test_async_views_render_the_same_pages(self):
+        expected = self.pages(self.user)
+        self.assertIn('Run the AC at 24C.', expected[0][2])
+        self.assertIn('Expected Bill:</strong> ₹2600', expected[0][2])
+        self.assertEqual(self.async_pages(self.user), expected)
+
+    def test_async_views_redirect_the_same_way(self):
+        user, _ = make_household('new@example.com', appliances=(), bill=False)
+        expected = self.pages(user)
+        self.assertEqual(expected[0][:2], (302, reverse('bill')))
+        self.assertEqual(self.async_pages(user), expected)
@@ -1,5 +1,9 @@
+from django.conf import settings
 from django.urls import path
+from . import async_views
 from . import views
+from . import api
+from .metrics import metrics_view
 
 urlpatterns = [
     # Authentication routes
@@ -11,15 +15,26 @@ urlpatterns = [
     path('household/', views.data_entry_household, name='household'),
     path('appliances/', views.data_entry_appliances, name='appliances'),
     path('bill/', views.data_entry_bill, name='bill'),
+    path('appliances/catalog/', views.appliance_catalog, name='appliance_catalog'),
+    path('appliances/batch/', views.batch_appliances, name='batch_appliances'),
     
-    # Results and tips
-    path('results/', views.results, name='results'),
-    path('tips/', views.tips, name='tips'),
+    # Results and tips (async versions under ASGI, see async_views.py)
+    path('results/', async_views.results if settings.ASYNC_VIEWS else views.results, name='results'),
+    path('tips/', async_views.tips if settings.ASYNC_VIEWS else views.tips, name='tips'),
     
     # AJAX endpoints
     path('delete-appliance/<int:pk>/', views.delete_appliance, name='delete_appliance'),
+    path('simulate/', views.simulate, name='simulate'),
+    path('upgrades/', views.upgrades, name='upgrades'),
+    path('search/', views.staff_search, name='staff_search'),
     
+    # JSON API
+    path('api/appliances/', api.appliances, name='api_appliances'),
+    path('api/bills/', api.bills, name='api_bills'),
+    path('api/consumption/', api.consumption, name='api_consumption'),
+
     # Redirect root to login
     path('', views.login_view, name='login'),
     path('gemini_chat/', views.gemini_chat, name='gemini_chat'),
+    path('metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file
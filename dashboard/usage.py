@@ -0,0 +1,175 @@
+"""
+Per-user Gemini token and cost accounting, with daily token quotas.
+
+GeminiAPI hands the usageMetadata of every answered call to `record`, which
+only adds it to in-process counters, so nothing is written per message:
+- `flush` writes all pending counters to GeminiUsage (one row per user and
+  day) as one batched upsert that adds to the stored totals. `record` runs it
+  once USAGE_FLUSH_SECONDS have passed since the last flush or
+  USAGE_FLUSH_MAX_ROWS rows are pending, and it runs at process exit; counts
+  of a process that is killed outright are lost.
+- `record` also adds the tokens to a per-user, per-day counter in the cache,
+  so `over_quota` is one cache read before the upstream call however much
+  the user has used. A counter missing from the cache (first call of the
+  day, eviction, restart) is seeded from the stored row plus this process's
+  pending counts.
+With REDIS_URL the quota counters are shared by all workers; without it each
+process enforces the quota on its own.
+"""
+import atexit
+import logging
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router
+from django.utils import timezone
+
+from .db import serialized_write
+from .models import GeminiUsage, User
+
+logger = logging.getLogger(__name__)
+
+QUOTA_KEY_TIMEOUT = 2 * 24 * 3600  # Outlives the day it counts
+COST_PLACES = Decimal('0.000001')
+COLUMNS = ('user_id', 'day', 'requests', 'prompt_tokens', 'completion_tokens', 'cost', 'updated_at')
+SUMMED = ('requests', 'prompt_tokens', 'completion_tokens', 'cost')
+
+# {(user_id, day): [requests, prompt tokens, completion tokens, cost]} not yet written
+_pending = {}
+_pending_lock = threading.Lock()
+_flush_lock = threading.Lock()  # One flush at a time
+_last_flush = time.monotonic()
+
+
+def token_counts(usage_metadata):
+    """(prompt, completion) tokens of a generateContent response's usageMetadata"""
+    metadata = usage_metadata or {}
+    prompt = int(metadata.get('promptTokenCount') or 0)
+    # Thinking tokens are billed as output
+    completion = int(metadata.get('candidatesTokenCount') or 0) + int(metadata.get('thoughtsTokenCount') or 0)
+    return prompt, completion
+
+
+def token_cost(prompt, completion):
+    """USD cost of a call at the configured per-million-token prices"""
+    return (prompt * Decimal(str(getattr(settings, 'GEMINI_INPUT_PRICE_PER_MILLION', 0.075)))
+            + completion * Decimal(str(getattr(settings, 'GEMINI_OUTPUT_PRICE_PER_MILLION', 0.30)))) / 1_000_000
+
+
+def quota_key(user_id, day):
+    return f'gemini-tokens:{user_id}:{day.isoformat()}'
+
+
+def used_tokens(user_id, day=None):
+    """Tokens the user has used on `day` (default today), from the cache counter"""
+    day = day or timezone.localdate()
+    key = quota_key(user_id, day)
+    used = cache.get(key)
+    if used is None:
+        # No flush may move pending counts into the row between the two reads, or they would be missed
+        with _flush_lock:
+            stored = GeminiUsage.objects.filter(user_id=user_id, day=day).values_list(
+                'prompt_tokens', 'completion_tokens').first()
+            with _pending_lock:
+                pending = _pending.get((user_id, day))
+        used = sum(stored or ()) + (pending[1] + pending[2] if pending else 0)
+        if not cache.add(key, used, QUOTA_KEY_TIMEOUT):
+            used = cache.get(key, used)  # Seeded by another request meanwhile
+    return used
+
+
+def over_quota(user_id):
+    """Whether the user has used up today's GEMINI_DAILY_TOKEN_QUOTA (0: no quota)"""
+    quota = getattr(settings, 'GEMINI_DAILY_TOKEN_QUOTA', 0)
+    return bool(quota) and used_tokens(user_id) >= quota
+
+
+def record(user_id, usage_metadata):
+    """Count one answered call against the user; accounting errors are logged, never raised"""
+    if user_id is None:
+        return
+    prompt, completion = token_counts(usage_metadata)
+    day = timezone.localdate()
+    with _pending_lock:
+        counts = _pending.setdefault((user_id, day), [0, 0, 0, Decimal(0)])
+        counts[0] += 1
+        counts[1] += prompt
+        counts[2] += completion
+        counts[3] += token_cost(prompt, completion)
+        due = (len(_pending) >= getattr(settings, 'USAGE_FLUSH_MAX_ROWS', 500)
+               or time.monotonic() - _last_flush >= getattr(settings, 'USAGE_FLUSH_SECONDS', 30))
+
+    try:
+        try:
+            cache.incr(quota_key(user_id, day), prompt + completion)
+        except ValueError:  # Not cached: seeding counts the pending tokens, this call's included
+            used_tokens(user_id, day)
+    except Exception:
+        logger.exception("Updating the Gemini quota counter failed", extra={'user_id': user_id})
+    if due:
+        flush()
+
+
+def flush():
+    """Upsert the pending counts into GeminiUsage in one batch; returns the rows written"""
+    global _last_flush
+    if not _flush_lock.acquire(blocking=False):
+        return 0  # Another thread is flushing
+    try:
+        with _pending_lock:
+            batch = dict(_pending)
+            _pending.clear()
+            _last_flush = time.monotonic()
+        if not batch:
+            return 0
+        try:
+            using = router.db_for_write(GeminiUsage)
+            return serialized_write(_upsert, batch, using, using=using)
+        except Exception:
+            logger.exception("Flushing Gemini usage failed; keeping it for the next flush",
+                             extra={'rows': len(batch)})
+            with _pending_lock:
+                for key, counts in batch.items():
+                    current = _pending.setdefault(key, [0, 0, 0, Decimal(0)])
+                    for i, value in enumerate(counts):
+                        current[i] += value
+            return 0
+    finally:
+        _flush_lock.release()
+
+
+def _upsert(batch, using):
+    """INSERT ... ON CONFLICT DO UPDATE adding the batch to the stored rows (SQLite 3.24+, PostgreSQL)"""
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    table = qn(GeminiUsage._meta.db_table)
+    fields = {column: GeminiUsage._meta.get_field(column.removesuffix('_id')) for column in COLUMNS}
+    # Calls of users deleted since they were recorded have nowhere to go
+    users = set(User.objects.using(using).filter(pk__in={user_id for user_id, _ in batch})
+                .values_list('pk', flat=True))
+    now = timezone.now()
+    rows = []
+    for (user_id, day), (requests, prompt, completion, cost) in batch.items():
+        if user_id not in users:
+            continue
+        values = dict(zip(COLUMNS, (user_id, day, requests, prompt, completion, cost.quantize(COST_PLACES), now)))
+        rows.append([fields[column].get_db_prep_value(values[column], connection) for column in COLUMNS])
+    if not rows:
+        return 0
+
+    updates = [f'{qn(column)} = {table}.{qn(column)} + excluded.{qn(column)}' for column in SUMMED]
+    updates.append(f'{qn("updated_at")} = excluded.{qn("updated_at")}')
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {table} ({", ".join(qn(column) for column in COLUMNS)}) '
+            f'VALUES ({", ".join(["%s"] * len(COLUMNS))}) '
+            f'ON CONFLICT ({qn("user_id")}, {qn("day")}) DO UPDATE SET {", ".join(updates)}',
+            rows,
+        )
+    return len(rows)
+
+
+atexit.register(flush)
@@ -1,30 +1,41 @@
 from decimal import Decimal
 from calendar import monthrange
+from .tariffs import household_tariff, stored_tariff
+
+REAL_WORLD_USAGE_FACTOR = 0.4  # Factor to account for real-world usage patterns
+
+def days_in_bill_month(bill):
+    """Number of days in the bill's month, 30 when there is no bill"""
+    return monthrange(bill.month.year, bill.month.month)[1] if bill and bill.month else 30
+
+def monthly_appliance_kwh(wattage, hours_used, days_in_month):
+    """
+    Monthly kWh of an appliance with the real-world factor applied.
+    Works on plain numbers as well as NumPy arrays.
+    """
+    return (wattage * hours_used * days_in_month) / 1000 * REAL_WORLD_USAGE_FACTOR
 
 def calculate_consumption(household, appliances, bill):
     # Constants
-    avg_tariff = 11# Average electricity rate per kWh
-    real_world_usage_factor = 0.4  # Factor to account for real-world usage patterns
+    tariff = household_tariff(household)  # Slab tariff of the household's DISCOM
     
     # Step 1: Calculate appliance-based consumption with real-world factor
-    daily_wh = sum(app.wattage * app.hours_used for app in appliances)
-    daily_kwh = daily_wh / 1000
-    days_in_month = monthrange(bill.month.year, bill.month.month)[1] if bill and bill.month else 30
-    appliance_based_kwh = daily_kwh * days_in_month * real_world_usage_factor
+    days_in_month = days_in_bill_month(bill)
+    appliance_based_kwh = sum(monthly_appliance_kwh(app.wattage, app.hours_used, days_in_month) for app in appliances)
 
     # Step 2: Calculate bill-based consumption
     bill_based_kwh = None
     if bill and bill.units_consumed:
         bill_based_kwh = float(bill.units_consumed)
     elif bill and bill.amount:
-        bill_based_kwh = float(bill.amount) / avg_tariff
+        bill_based_kwh = tariff.amount_to_kwh(bill.amount)
 
     # Step 3: Determine primary consumption display
     if bill and bill.units_consumed:
         actual_kwh = float(bill.units_consumed)
         consumption_source = "Bill Units"
     elif bill and bill.amount:
-        actual_kwh = float(bill.amount) / avg_tariff
+        actual_kwh = tariff.amount_to_kwh(bill.amount)
         consumption_source = "Bill Amount Estimation"
     elif appliances:
         actual_kwh = appliance_based_kwh
@@ -60,7 +71,7 @@ def calculate_consumption(household, appliances, bill):
         
         # Calculate raw values with real-world factor
         for app in appliances:
-            monthly_kwh = (app.wattage * app.hours_used * days_in_month) / 1000 * real_world_usage_factor
+            monthly_kwh = monthly_appliance_kwh(app.wattage, app.hours_used, days_in_month)
             total_monthly_kwh += monthly_kwh
             
             appliance_name = app.custom_name if app.custom_name else app.get_appliance_type_display()
@@ -95,9 +106,10 @@ def calculate_consumption(household, appliances, bill):
         'usage_percentage': min(100, max(0, (actual_kwh / high_threshold) * 100)) if high_threshold > 0 else 0
     }
 
-def expected_bill_for_indian_household(members, rooms, avg_rate_per_unit=7.5):
+def expected_bill_for_indian_household(members, rooms, tariff=None):
     """
     Estimate expected monthly electricity usage and bill based on household size and rooms.
+    The bill is priced with the given slab tariff (or the default one).
     """
     if members <= 2 and rooms <= 2:
         expected_kwh = 100
@@ -108,7 +120,7 @@ def expected_bill_for_indian_household(members, rooms, avg_rate_per_unit=7.5):
     else:
         expected_kwh = 390
 
-    expected_bill = expected_kwh * avg_rate_per_unit
+    expected_bill = stored_tariff(tariff).kwh_to_amount(expected_kwh)
 
     return {
         'expected_kwh': expected_kwh,
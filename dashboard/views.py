@@ -14,11 +14,28 @@ from django.contrib.auth import get_user_model
 from .forms import EmailUserCreationForm, EmailAuthenticationForm
 
 import json
-from django.views.decorators.csrf import csrf_exempt
+import logging
+from decimal import Decimal
 from django.http import JsonResponse
 from .gemini_api import GeminiAPI
 
 from .utils import calculate_consumption, expected_bill_for_indian_household
+from .tariffs import household_tariff
+from .simulator import simulate_savings
+from .optimizer import recommend_upgrades
+from .catalog import get_catalog
+from .neighbours import compare_with_neighbours
+from .models import BillAnomaly, HouseholdTip
+from .forecasting import current_forecasts
+from .load_profile import household_load_profile
+from .db import serialized_write
+from .routers import replica_reads
+from .signals import household_changed
+from . import search as search_index
+from . import usage
+from django.contrib.admin.views.decorators import staff_member_required
+
+logger = logging.getLogger(__name__)
 # Add this to your views.py file
 
 from django.http import JsonResponse
@@ -41,7 +58,7 @@ def delete_appliance(request, pk):
         )
         
         # Delete the appliance
-        appliance.delete()
+        serialized_write(appliance.delete)
         
         return JsonResponse({
             'success': True,
@@ -60,11 +77,120 @@ def delete_appliance(request, pk):
             'error': str(e)
         }, status=500)
     
+MAX_BATCH_OPERATIONS = 200
+APPLIANCE_FIELDS = ['appliance_type', 'wattage', 'hours_used', 'custom_name']
+
+def appliance_list(household):
+    """
+    The household's appliances as plain dicts, in the order the appliances page lists them.
+    """
+    labels = dict(Appliance.HOUSEHOLD_APPLIANCES)
+    rows = (Appliance.objects.filter(household=household).order_by('id')
+            .values_list('id', 'appliance_type', 'custom_name', 'wattage', 'hours_used'))
+    return [
+        {'id': pk, 'appliance_type': code, 'name': custom_name or labels.get(code, code),
+         'custom_name': custom_name, 'wattage': wattage, 'hours_used': hours_used}
+        for pk, code, custom_name, wattage, hours_used in rows
+    ]
+
+@login_required
+@require_POST
+def batch_appliances(request):
+    """
+    Apply a list of appliance operations in one transaction and return the updated list.
+
+    Body: {"operations": [{"op": "create", "ref": ..., <fields>}, {"op": "update", "id": ..., <fields>},
+    {"op": "delete", "id": ...}]}. Nothing is saved unless every operation is valid.
+    """
+    household = request.household
+    if not household:
+        return JsonResponse({'error': 'Please enter your household information first.'}, status=400)
+
+    try:
+        data = json.loads(request.body or b'{}')
+    except json.JSONDecodeError as e:
+        return JsonResponse({'error': f'Invalid JSON: {str(e)}'}, status=400)
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return JsonResponse({'error': 'operations must be a non-empty list'}, status=400)
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return JsonResponse({'error': f'At most {MAX_BATCH_OPERATIONS} operations per batch'}, status=400)
+
+    # Step 1: Validate every operation before writing anything
+    ids = [op.get('id') for op in operations if isinstance(op, dict) and isinstance(op.get('id'), int)]
+    existing = Appliance.objects.filter(household=household).in_bulk(ids)
+    creates, refs, updates, deletes, errors = [], [], [], [], []
+    touched, seen_refs = set(), set()
+    for index, op in enumerate(operations):
+        kind = op.get('op') if isinstance(op, dict) else None
+        if kind not in ('create', 'update', 'delete'):
+            errors.append({'index': index, 'errors': {'op': ['Must be create, update or delete.']}})
+            continue
+        if kind == 'create':
+            ref = op.get('ref')
+            if ref is not None:
+                # Refs become the keys of "created", where 1 and "1" are the same key
+                if isinstance(ref, bool) or not isinstance(ref, (str, int)):
+                    errors.append({'index': index, 'errors': {'ref': ['Must be a string or an integer.']}})
+                    continue
+                if str(ref) in seen_refs:
+                    errors.append({'index': index, 'errors': {'ref': ['Ref is in more than one operation.']}})
+                    continue
+                seen_refs.add(str(ref))
+            form = ApplianceForm(op)
+        else:
+            appliance = existing.get(op.get('id'))
+            if appliance is None or appliance.id in touched:
+                message = 'Appliance not found.' if appliance is None else 'Appliance is in more than one operation.'
+                errors.append({'index': index, 'errors': {'id': [message]}})
+                continue
+            touched.add(appliance.id)
+            if kind == 'delete':
+                deletes.append(appliance.id)
+                continue
+            # Fields left out of an update keep their current values
+            fields = {name: getattr(appliance, name) for name in APPLIANCE_FIELDS}
+            form = ApplianceForm({**fields, **op}, instance=appliance)
+        if not form.is_valid():
+            errors.append({'index': index, 'errors': {
+                field: [error['message'] for error in field_errors]
+                for field, field_errors in form.errors.get_json_data().items()
+            }})
+            continue
+        appliance = form.save(commit=False)
+        if kind == 'create':
+            appliance.household = household
+            creates.append(appliance)
+            refs.append(ref)
+        else:
+            updates.append(appliance)
+    if errors:
+        return JsonResponse({'error': 'No changes were saved: some operations are invalid.', 'errors': errors},
+                            status=400)
+
+    # Step 2: One bulk statement per kind of change
+    def apply():
+        created = Appliance.objects.bulk_create(creates)
+        if updates:
+            Appliance.objects.bulk_update(updates, APPLIANCE_FIELDS)
+        if deletes:
+            Appliance.objects.filter(household=household, id__in=deletes).delete()
+        if creates or updates:
+            household_changed(household.id)  # Bulk writes send no post_save
+        return created
+
+    created = serialized_write(apply)
+    return JsonResponse({
+        'success': True,
+        'created': {ref: appliance.id for ref, appliance in zip(refs, created) if ref is not None},
+        'appliances': appliance_list(household),
+    })
+
 def register_view(request):
     if request.method == 'POST':
         form = EmailUserCreationForm(request.POST)
         if form.is_valid():
-            user = form.save()
+            user = serialized_write(form.save)
             login(request, user)
             return redirect('household')
         else:
@@ -96,7 +222,7 @@ def logout_view(request):
 
 @login_required
 def data_entry_household(request):
-    existing = Household.objects.filter(user=request.user).first()
+    existing = request.household or None  # A real None (not a lazy one) for the form and `is None` below
     
     if existing and not request.GET.get('edit'):  # Add ?edit=true to URL to edit
         messages.info(request, "Your household info is already set")
@@ -107,7 +233,7 @@ def data_entry_household(request):
         if form.is_valid():
             household = form.save(commit=False)
             household.user = request.user
-            household.save()
+            serialized_write(household.save)
             messages.success(request, "Household information saved!")
             return redirect('appliances')
     else:
@@ -120,7 +246,7 @@ def data_entry_household(request):
 
 @login_required
 def data_entry_appliances(request):
-    household = Household.objects.filter(user=request.user).first()
+    household = request.household
     if not household:
         messages.warning(request, "Please enter your household information first.")
         return redirect('household')
@@ -130,7 +256,7 @@ def data_entry_appliances(request):
         if form.is_valid():
             appliance = form.save(commit=False)
             appliance.household = household
-            appliance.save()
+            serialized_write(appliance.save)
             
             # Fix: Use get_appliance_type_display or custom_name instead of name
             appliance_name = appliance.custom_name if appliance.custom_name else appliance.get_appliance_type_display()
@@ -139,14 +265,13 @@ def data_entry_appliances(request):
             # Reset the form after submission to allow adding more appliances
             form = ApplianceForm()
         else:
-            # Debug form errors
-            print(f"Form errors: {form.errors}")
+            logger.info("Appliance form invalid", extra={'errors': form.errors.get_json_data()})
             messages.error(request, f"Form has errors: {form.errors}")
     else:
         form = ApplianceForm()
     
-    # Get all appliances for this household
-    appliances = Appliance.objects.filter(household=household)
+    # Get all appliances for this household; the page script keeps editing this list in place
+    appliances = appliance_list(household)
     return render(request, 'data_entry/appliances.html', {
         'form': form,
         'appliances': appliances
@@ -154,7 +279,7 @@ def data_entry_appliances(request):
 
 @login_required
 def data_entry_bill(request):
-    household = Household.objects.filter(user=request.user).first()
+    household = request.household
     if not household:
         messages.warning(request, "Please enter your household information first.")
         return redirect('household')
@@ -172,21 +297,20 @@ def data_entry_bill(request):
             
             # Calculate units consumed based on bill amount if not provided
             if not bill.units_consumed:
-                # Assuming a standard rate of Rs. 11 per unit
-                avg_rate_per_unit = 11.0
-                bill.units_consumed = float(bill.amount) / avg_rate_per_unit
+                # Invert the household's slab tariff
+                units = household_tariff(household).amount_to_kwh(bill.amount)
+                bill.units_consumed = Decimal(str(round(units, 2)))
             
-            bill.save()
+            serialized_write(bill.save)
             
             # Add debug message to check if this part executes
             messages.success(request, "Bill information saved successfully!")
-            print("Bill saved and redirecting to results...")
             
             # Force redirect to results page
             return redirect('results')
         else:
             # Display form errors in a more user-friendly way
-            print(f"Form errors: {form.errors}")
+            logger.info("Bill form invalid", extra={'errors': form.errors.get_json_data()})
             error_messages = []
             for field, errors in form.errors.items():
                 field_name = form[field].label or field
@@ -201,8 +325,9 @@ def data_entry_bill(request):
     return render(request, 'data_entry/bill.html', {'form': form})
 
 @login_required
+@replica_reads
 def results(request):
-    household = Household.objects.filter(user=request.user).first()
+    household = request.household
     if not household:
         messages.warning(request, "Please enter your household information first.")
         return redirect('household')
@@ -217,16 +342,27 @@ def results(request):
         messages.warning(request, "Please add some appliances to your household.")
         return redirect('appliances')
     
-    # Debug prints
-    print(f"Household: {household.id}, Members: {household.members}, Rooms: {household.rooms}")
-    print(f"Bill: {bill.id}, Amount: {bill.amount}, Units: {bill.units_consumed}")
-    print(f"Appliances count: {appliances.count()}")
-    
+    return render(request, 'results.html', {
+        'household': household,
+        'bill': bill,
+        **results_context(household, appliances, bill),
+        'anomaly': BillAnomaly.objects.filter(bill=bill).first(),
+        'forecast': current_forecasts().filter(household=household).first(),
+        'tip': HouseholdTip.objects.filter(household=household).first()
+    })
+
+def results_context(household, appliances, bill):
+    """
+    The computed part of the results page: consumption and rating, expected
+    bill, neighbour comparison and load profile. CPU-bound; async_views runs
+    it on a worker thread.
+    """
     # Calculate consumption and rating
     consumption_data = calculate_consumption(household, appliances, bill)
-    
-    # Debug print consumption data
-    print(f"Consumption data: {consumption_data}")
+    logger.debug("Consumption calculated", extra={
+        'household': household.id, 'bill': bill.id,
+        'total_kwh': consumption_data['total_kwh'], 'rating': consumption_data['rating'],
+    })
      # Calculate progress percentage safely
 
     try:
@@ -241,16 +377,21 @@ def results(request):
 
     # Add to context
     consumption_data['progress_percentage'] = round(progress, 1)
-    expected = expected_bill_for_indian_household(household.members, household.rooms)
+    expected = expected_bill_for_indian_household(household.members, household.rooms, household.tariff)
+    neighbours = compare_with_neighbours(household, appliances, consumption_data['total_kwh'])
+    flat_rate = household_tariff(household).average_rate(consumption_data['total_kwh'])
+    load_profile = household_load_profile(appliances, flat_rate)
 
-    return render(request, 'results.html', {
-        'household': household,
-        'bill': bill,
+    return {
         'consumption_data': consumption_data,
-        'expected':expected
-    })
+        'expected':expected,
+        'neighbours': neighbours,
+        'load_profile': load_profile,
+    }
+
 # Add the tips view function here
 @login_required
+@replica_reads
 def tips(request):
     """
     View function to display the energy-saving tips page with chat interface.
@@ -258,57 +399,134 @@ def tips(request):
     for more personalized tips.
     """
     # Get the user's household data if available
-    household = Household.objects.filter(user=request.user).first()
+    household = request.household
     appliances = []
+    tip = None
     
     if household:
         appliances = Appliance.objects.filter(household=household)
+        # Precomputed by the tip worker; None until the first job has run
+        tip = HouseholdTip.objects.filter(household=household).first()
     
     context = {
         'household': household,
-        'appliances': appliances
+        'appliances': appliances,
+        'tip': tip
     }
     
     return render(request, 'tips.html', context)
 
-@csrf_exempt
+@login_required
+def appliance_catalog(request):
+    """
+    Autocomplete appliance models by prefix (?q=) with their type, wattage and star rating.
+    """
+    try:
+        limit = min(int(request.GET.get('limit', 10)), 50)
+    except ValueError:
+        limit = 10
+    results = get_catalog().search(request.GET.get('q', ''), limit=limit)
+    return JsonResponse({'results': results})
+
+@staff_member_required
+def staff_search(request):
+    """
+    Internal search over users and appliances (?q=, ?limit=) for support staff, ranked by the FTS5 index.
+    """
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 20)), 50))
+    except ValueError:
+        limit = 20
+    if not search_index.is_installed():
+        return JsonResponse({'error': 'Search index is not available; run manage.py rebuild_search_index.'},
+                            status=503)
+    if not search_index.usable_terms(query):
+        return JsonResponse({'error': f'Enter search terms of at least {search_index.MIN_TERM_LENGTH} characters.'},
+                            status=400)
+    return JsonResponse({'query': query, 'results': search_index.search(query, limit=limit)})
+
+@login_required
+@require_POST
+def simulate(request):
+    """
+    Run a what-if grid of appliance and tariff changes and return the ranked savings.
+    """
+    household = request.household
+    if not household:
+        return JsonResponse({'error': 'Please enter your household information first.'}, status=400)
+
+    try:
+        data = json.loads(request.body or b'{}')
+    except json.JSONDecodeError as e:
+        return JsonResponse({'error': f'Invalid JSON: {str(e)}'}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'error': 'Expected a JSON object.'}, status=400)
+
+    bill = ElectricityBill.objects.filter(household=household).order_by('-month').first()
+    appliances = Appliance.objects.filter(household=household)
+
+    try:
+        result = simulate_savings(
+            household,
+            appliances,
+            bill,
+            options=data.get('appliances', {}),
+            tariffs=data.get('tariffs'),
+            limit=data.get('limit', 20)
+        )
+    except (ValueError, TypeError, OverflowError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse(result)
+
+@login_required
+def upgrades(request):
+    """
+    Recommend the appliance upgrades and habit changes that save the most within ?budget= rupees.
+    """
+    household = request.household
+    if not household:
+        return JsonResponse({'error': 'Please enter your household information first.'}, status=400)
+
+    try:
+        budget = float(request.GET.get('budget', 0))
+        bill = ElectricityBill.objects.filter(household=household).order_by('-month').first()
+        appliances = Appliance.objects.filter(household=household)
+        result = recommend_upgrades(household, appliances, bill, budget, solver=request.GET.get('solver'))
+    except (ValueError, OverflowError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse(result)
+
 def gemini_chat(request):
-    print(f"=== GEMINI CHAT VIEW CALLED ===")
-    print(f"Method: {request.method}")
-    print(f"Content-Type: {request.content_type}")
-    print(f"Headers: {dict(request.headers)}")
-    
     if request.method == 'POST':
+        # Tokens are accounted and limited per user (see usage.py), so the session-authenticated
+        # POST must carry the CSRF token (the tips page sends it as X-CSRFToken)
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required.'}, status=401)
+        if usage.over_quota(request.user.pk):
+            return JsonResponse({'error': "You've reached today's limit for the energy assistant. "
+                                          "Please try again tomorrow."}, status=429)
         try:
-            print(f"Request body: {request.body}")
-            
             # Parse JSON data
             data = json.loads(request.body)
             user_message = data.get('message', '')
             household_data = data.get('household_data', {})
             
-            print(f"Parsed message: {user_message}")
-            print(f"Parsed household_data: {household_data}")
-            
             if not user_message:
-                print("No message provided")
                 return JsonResponse({'error': 'No message provided'}, status=400)
             
             # Get response from Gemini API
-            print("Calling GeminiAPI.generate_response...")
-            response = GeminiAPI.generate_response(user_message, household_data)
-            print(f"Got response: {response}")
+            response = GeminiAPI.generate_response(user_message, household_data, user_id=request.user.pk)
+            logger.debug("Gemini chat answered", extra={'message_chars': len(user_message), 'response_chars': len(response)})
             
             return JsonResponse({'response': response})
             
         except json.JSONDecodeError as e:
-            print(f"JSON decode error: {str(e)}")
             return JsonResponse({'error': f'Invalid JSON: {str(e)}'}, status=400)
         except Exception as e:
-            print(f"General error: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Gemini chat failed")
             return JsonResponse({'error': f'Server error: {str(e)}'}, status=500)
     
-    print("Method not POST")
     return JsonResponse({'error': 'Method not allowed'}, status=405)
\ No newline at end of file
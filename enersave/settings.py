@@ -33,16 +33,38 @@ DEBUG = os.environ.get('DEBUG', 'True').lower() == 'true'
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'structured': {
+            '()': 'dashboard.log.StructuredFormatter',
+        },
+    },
+    'filters': {
+        # Keep this fraction of DEBUG/INFO app logs; warnings and errors are never dropped
+        'sampled': {
+            '()': 'dashboard.log.SampleFilter',
+            'rate': float(os.environ.get('LOG_SAMPLE_RATE', '1.0')),
+        },
+    },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
         },
+        'structured': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'structured',
+            'filters': ['sampled'],
+        },
     },
     'loggers': {
         'django': {
             'handlers': ['console'],
             'level': 'INFO',
         },
+        'dashboard': {
+            'handlers': ['structured'],
+            'level': os.environ.get('LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
     },
 }
 ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
@@ -63,17 +85,27 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'dashboard.metrics.MetricsMiddleware',  # First, so its timing covers the rest of the stack
+    'dashboard.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # After SecurityMiddleware so static files get its headers; answers /static/ before sessions and auth
+    'dashboard.staticfiles.PrecompressedStaticMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'dashboard.auth.HouseholdMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'enersave.urls'
 
+# Serve the results and tips pages from dashboard/async_views.py (async ORM, concurrent lookups).
+# Only worth it under an ASGI server, e.g. `uvicorn enersave.asgi:application`: under WSGI each
+# async view pays for an event loop round trip. `manage.py bench_asgi` compares the two.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'false').lower() == 'true'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -104,6 +136,68 @@ DATABASES = {
     }
 }
 
+# Production SQLite profile (on by default when DEBUG is off, or with SQLITE_PROFILE=production):
+# WAL lets readers run alongside the single writer, IMMEDIATE transactions take the write
+# lock up front so busy_timeout can queue writers instead of failing with "database is
+# locked", and connections are kept open across requests.
+SQLITE_INIT_COMMAND = (
+    'PRAGMA journal_mode=WAL;'
+    'PRAGMA synchronous=NORMAL;'
+    'PRAGMA busy_timeout=5000;'
+    'PRAGMA cache_size=-20000;'      # 20 MB page cache per connection
+    'PRAGMA mmap_size=268435456;'    # 256 MB memory-mapped reads
+    'PRAGMA temp_store=MEMORY;'
+)
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'default' if DEBUG else 'production')
+if SQLITE_PROFILE == 'production':
+    DATABASES['default'].update({
+        'OPTIONS': {
+            'init_command': SQLITE_INIT_COMMAND,
+            'transaction_mode': 'IMMEDIATE',
+            # No 'timeout': the busy_timeout PRAGMA above is the one lock wait (sqlite3's
+            # timeout sets the same busy handler, and whichever ran last would win)
+        },
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
+    })
+
+# Read replicas: SQLITE_REPLICAS=/path/a.sqlite3,/path/b.sqlite3 adds aliases replica1, replica2, ...
+# that the results/tips views and admin lists read from (see dashboard/routers.py).
+# Locally, `manage.py sync_replicas` copies the primary into them.
+for _i, _path in enumerate(filter(None, os.environ.get('SQLITE_REPLICAS', '').split(',')), start=1):
+    DATABASES[f'replica{_i}'] = {**DATABASES['default'], 'NAME': _path, 'TEST': {'MIRROR': 'default'}}
+DATABASE_ROUTERS = ['dashboard.routers.PrimaryReplicaRouter']
+REPLICA_STICKY_SECONDS = 5  # Reads stay on the primary this long after a client writes
+
+# Attempts and first backoff (seconds) of dashboard.db.serialized_write on "database is locked"
+DB_WRITE_RETRIES = 5
+DB_WRITE_RETRY_DELAY = 0.05
+
+# Cache: REDIS_URL (needs the redis package) shares it between worker processes.
+# Without it each process keeps its own in-memory cache.
+SHARED_CACHE = bool(os.environ.get('REDIS_URL'))
+if SHARED_CACHE:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                          'LOCATION': os.environ['REDIS_URL']}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                          'OPTIONS': {'MAX_ENTRIES': 10000}}}
+
+# With a shared cache, sessions are read from the cache and written through to the database, and
+# the signed-in user is cached for USER_CACHE_TIMEOUT seconds (see dashboard/auth.py). Both need
+# every worker to see the same cache: with per-process caches a logout, password change or
+# deactivation in one process would go unseen by the others, so they read the database instead.
+if SHARED_CACHE:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    AUTHENTICATION_BACKENDS = [
+        'dashboard.auth.CachedModelBackend',
+        'django.contrib.auth.backends.ModelBackend',  # Still resolves sessions started before the cached backend
+    ]
+else:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+    AUTHENTICATION_BACKENDS = ['django.contrib.auth.backends.ModelBackend']
+USER_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -141,6 +235,17 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'dashboard/static')]
+STATIC_ROOT = os.environ.get('STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles'))
+
+# Build step for production (on by default when DEBUG is off, or with STATIC_COMPRESSED=true):
+# `collectstatic` writes content-hashed names plus .gz/.br variants into STATIC_ROOT, and
+# dashboard.staticfiles.PrecompressedStaticMiddleware serves them as immutable (see that module)
+STATIC_COMPRESSED = os.environ.get('STATIC_COMPRESSED', str(not DEBUG)).lower() == 'true'
+if STATIC_COMPRESSED:
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'dashboard.staticfiles.CompressedManifestStaticFilesStorage'},
+    }
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -161,3 +266,17 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
 if not GEMINI_API_KEY:
     raise ValueError("GEMINI_API_KEY environment variable is not set. Please check your .env file.")
+# Override the generateContent endpoint, e.g. to point a load test at `manage.py loadtest --mock-upstream-port`
+GEMINI_API_URL = os.environ.get('GEMINI_API_URL')
+# Per-user accounting (see dashboard/usage.py): USD per million tokens (gemini-1.5-flash, prompts up to 128k)
+# and the daily tokens each user may spend through the chat (0 turns the quota off)
+GEMINI_INPUT_PRICE_PER_MILLION = float(os.environ.get('GEMINI_INPUT_PRICE_PER_MILLION', '0.075'))
+GEMINI_OUTPUT_PRICE_PER_MILLION = float(os.environ.get('GEMINI_OUTPUT_PRICE_PER_MILLION', '0.30'))
+GEMINI_DAILY_TOKEN_QUOTA = int(os.environ.get('GEMINI_DAILY_TOKEN_QUOTA', '50000'))
+# Token counts are kept in memory and written in one batch this often, or once this many user-days are pending
+USAGE_FLUSH_SECONDS = 30
+USAGE_FLUSH_MAX_ROWS = 500
+
+# Metrics: when set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>";
+# unset, only staff users can read it (anyone while DEBUG is on)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')